@@ -0,0 +1,238 @@
+"""
+artifacts.py
+
+This module manages output artifacts that are built on demand instead of
+during workbook processing (the Excel file, the per-graph files exported
+from a graph store, the PNG graph images and the zip file of the output 
+folder).
+
+When processing in deferred mode, `process_twb` only writes the files
+needed for interactive exploration and a manifest (`manifest.json` in the
+output folder) listing the artifacts that can still be built. The first
+request for an artifact builds it from the stored results, after which the
+manifest marks it as built and later requests reuse the file. The web apps
+build artifacts in a job process (`build_artifacts`, see `shared.jobs`),
+never in the web process itself.
+"""
+import os
+import json
+import threading
+from shared.logging import logger
+from shared.common import pd, progress_data, renderGraph, writeExcel, \
+    zip_folder
+from shared.graphstore import export_graphs
+
+MANIFEST_FILE = "manifest.json"
+ARTIFACT_KINDS = ["xlsx", "graphs", "png", "zip"]
+
+# one lock per (output folder, artifact kind) so an artifact is built once
+_locks = {}
+_locks_guard = threading.Lock()
+# serializes manifest updates by builds of different artifacts
+_manifest_lock = threading.Lock()
+
+def write_manifest(out_dir, manifest):
+    """Write the artifact manifest to an output folder."""
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def read_manifest(out_dir):
+    """Return the artifact manifest of an output folder (None if missing)."""
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    if not os.path.isfile(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def create_manifest(out_dir, xlsx_path, zip_path, png_graphs=None, 
+                    graph_store_path=None):
+    """
+    Create the manifest of the artifacts that are available but not built.
+
+    Args:
+        out_dir (str): Output folder of the processed workbook.
+        xlsx_path (str): Path of the Excel file to build.
+        zip_path (str): Path of the zip file to build.
+        png_graphs (list, optional): (.dot file path, render status) pairs
+            of the graphs to render as PNG. Defaults to None (no PNG images
+            available).
+        graph_store_path (str, optional): Path of the graph store from 
+            which the per-graph files are exported ("graphs" artifact, 
+            which also determines the graphs to render as PNG). Defaults 
+            to None.
+    """
+    rel = lambda x: os.path.relpath(x, out_dir)
+    artifacts = {
+        "xlsx": {"path": rel(xlsx_path), "built": False},
+        "zip": {"path": rel(zip_path), "built": False},
+    }
+    if png_graphs is not None:
+        artifacts["png"] = {"graphs": [[rel(p), s] for p, s in png_graphs],
+            "built": False}
+    if graph_store_path is not None:
+        artifacts["graphs"] = {"path": rel(os.path.dirname(graph_store_path)),
+            "built": False}
+    write_manifest(out_dir, {"artifacts": artifacts})
+
+def download_kinds(exts=None):
+    """
+    Return the artifact kinds needed for a download of the output folder.
+
+    Args:
+        exts (list, optional): File types of the download (e.g. ["svg"]).
+            Defaults to None (all files).
+
+    Returns:
+        list: Artifact kinds, in build order.
+    """
+    exts = set(exts or [])
+    kinds = []
+    if not exts or {"svg", "dot", "png"} & exts:
+        kinds.append("graphs")
+    kinds += [x for x in ("xlsx", "png") if not exts or x in exts]
+    return kinds
+
+def pending_artifacts(out_dir, kinds):
+    """Return the artifact kinds that are available but not built yet."""
+    manifest = read_manifest(out_dir)
+    if manifest is None:
+        return []
+    res = []
+    for kind in kinds:
+        entry = manifest["artifacts"].get(kind)
+        if entry is None:
+            continue
+        path = os.path.join(out_dir, entry.get("path", "."))
+        if not entry["built"] or not os.path.exists(path):
+            res.append(kind)
+    return res
+
+def build_artifacts(out_dir, kinds, user_id=None, stop_event=None):
+    """
+    Build artifacts in a job process (see `shared.jobs`).
+
+    Args:
+        out_dir (str): Output folder of the processed workbook.
+        kinds (list): Artifact kinds to build, see ARTIFACT_KINDS.
+        user_id (str, optional): Session ID whose progress entry receives
+            the build progress (see `ensure_artifact`). Defaults to None.
+        stop_event (optional): Cancellation signal, checked between
+            artifacts. Defaults to None.
+
+    Returns:
+        str: "Cancelled" if cancelled, None otherwise.
+    """
+    pdict = None
+    if user_id is not None:
+        if user_id not in progress_data:
+            # job state of this process only, relayed to the web process
+            progress_data[user_id] = {}
+        pdict = progress_data[user_id]
+    for kind in kinds:
+        if stop_event and stop_event.is_set():
+            return "Cancelled"
+        ensure_artifact(out_dir, kind, pdict)
+    return None
+
+def _lock(out_dir, kind):
+    key = (os.path.abspath(out_dir), kind)
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+def _set_progress(pdict, kind, pct):
+    if pdict is not None:
+        # assign the whole dict so that the write reaches the job state
+        pdict["artifacts"] = {**pdict.get("artifacts", {}), kind: pct}
+
+def ensure_artifact(out_dir, kind, pdict=None):
+    """
+    Return the path of an artifact, building it first if needed.
+
+    Concurrent requests for the same artifact wait for a single build.
+
+    Args:
+        out_dir (str): Output folder of the processed workbook.
+        kind (str): Artifact kind, one of ARTIFACT_KINDS.
+        pdict (dict, optional): Progress entry in which the build progress
+            (0-100) is stored under ["artifacts"][kind]. Defaults to None.
+
+    Returns:
+        str: Path of the artifact (the output folder for "png", the graphs
+        folder for "graphs"), or None if the artifact is not available for 
+        this output folder.
+    """
+    if kind not in ARTIFACT_KINDS:
+        raise ValueError(f"Unknown artifact kind: {kind}")
+
+    with _lock(out_dir, kind):
+        manifest = read_manifest(out_dir)
+        if manifest is None or kind not in manifest["artifacts"]:
+            return None
+        entry = manifest["artifacts"][kind]
+        path = os.path.normpath(os.path.join(out_dir, entry.get("path", ".")))
+        if entry["built"] and os.path.exists(path):
+            _set_progress(pdict, kind, 100)
+            return path
+
+        logger.info(f"Building {kind} artifact for {out_dir}")
+        _set_progress(pdict, kind, 0)
+        if kind == "xlsx":
+            _build_xlsx(out_dir, path)
+        elif kind == "graphs":
+            _build_graphs(out_dir, path, pdict)
+        elif kind == "png":
+            # graphs in a graph store are only known once exported
+            if ensure_artifact(out_dir, "graphs", pdict):
+                entry = read_manifest(out_dir)["artifacts"][kind]
+            _build_png(out_dir, entry["graphs"], pdict)
+        else:
+            # the zip file includes the other artifacts
+            for x in ("xlsx", "graphs", "png"): ensure_artifact(out_dir, x)
+            zip_folder(out_dir, path)
+        _set_progress(pdict, kind, 100)
+
+        _update_manifest(out_dir, lambda m: m["artifacts"][kind].update(
+            built=True))
+        return path
+
+def _update_manifest(out_dir, update):
+    """Apply an update function to the current manifest and save it."""
+    with _manifest_lock:
+        manifest = read_manifest(out_dir)
+        update(manifest)
+        write_manifest(out_dir, manifest)
+
+def _build_xlsx(out_dir, path):
+    """Write the Excel file from the stored field and dependency tables."""
+    folder = os.path.dirname(path)
+    df = pd.read_parquet(os.path.join(folder, "fields.parquet"))
+    df = df.drop(columns=["graph_render_status"], errors="ignore")
+    df2 = pd.read_parquet(os.path.join(folder, "dependencies.parquet"))
+    writeExcel({"fields": df, "dependencies": df2}, path)
+
+def _build_graphs(out_dir, path, pdict):
+    """Export the per-graph files from the graph store."""
+    res = export_graphs(path, 
+        progress=lambda x: _set_progress(pdict, "graphs", int(100 * x)))
+
+    # list the exported graphs to render as PNG
+    graphs = [[os.path.relpath(f, out_dir), x["status"]] for x in res.values()
+        for f in x["files"] 
+        if f.endswith(".dot") and x["status"] != "placeholder"]
+    def update(manifest):
+        if "png" in manifest["artifacts"]:
+            manifest["artifacts"]["png"]["graphs"] = graphs
+    _update_manifest(out_dir, update)
+
+def _build_png(out_dir, graphs, pdict):
+    """Render the PNG images from the stored .dot files."""
+    for i, (dot_path, status) in enumerate(graphs):
+        dot_path = os.path.join(out_dir, dot_path)
+        with open(dot_path, encoding="utf-8") as f:
+            data = f.read()
+        renderGraph(data, os.path.splitext(dot_path)[0] + ".png", "png",
+            fallback=(status == "fallback"))
+        _set_progress(pdict, "png", int(100 * (i + 1) / len(graphs)))
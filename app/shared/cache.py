@@ -0,0 +1,194 @@
+"""
+cache.py
+
+This module provides a process-level cache of the workbook result tables
+(`fields.parquet` and `dependencies.parquet`) and of the calculations
+stored once per graphs folder (CALCULATIONS_FILE) for the Dash callbacks.
+
+Tables are cached per output folder and file modification time, so that a
+folder that is replaced by a new run is reloaded (and its old entry
+evicted). Entries are evicted in least recently used order once the total
+memory of the cached tables exceeds TABLE_CACHE_BUDGET. Rows are looked up
+through dict indexes (value -> row positions) built once per column.
+
+Only the columns used by the Dash app (TABLE_COLUMNS) are read. Tables
+too large for the budget are not loaded: their rows are looked up on disk
+with the indexed readers of `shared.database` instead, i.e. from SQLite or
+with filtered parquet reads, which skip the row groups of other fields
+using the row group statistics of the sorted files.
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+import pyarrow.parquet as pq
+from shared.common import pd
+from shared.database import read_dependencies, read_field
+from shared.utils import CALCULATIONS_FILE, read_calculations
+
+TABLE_CACHE_BUDGET = 256 * 1024**2 # bytes of cached data frames
+TABLE_FILES = {"fields": "fields.parquet",
+    "dependencies": "dependencies.parquet"}
+# columns used by the Dash app (column projection)
+TABLE_COLUMNS = {
+    "fields": ["source_field_repl_id", "source_label", "field_category",
+        "field_datatype", "field_role", "n_worksheet_dependencies"],
+    "dependencies": ["source_field_repl_id", "dependency_from",
+        "dependency_to", "dependency_level", "dependency_category"],
+}
+
+class CachedTables:
+    """
+    Result tables of one output folder with lazily built row indexes.
+
+    Args:
+        df_root (str): Folder containing the parquet files.
+    """
+    def __init__(self, df_root):
+        self.tables = {k: pd.read_parquet(os.path.join(df_root, v),
+            columns=TABLE_COLUMNS[k]) for k, v in TABLE_FILES.items()}
+        self.nbytes = sum(int(df.memory_usage(deep=True).sum())
+            for df in self.tables.values())
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def table(self, table, columns=None):
+        """Return a whole table (or the given columns of it)."""
+        df = self.tables[table]
+        return df if columns is None else df[columns]
+
+    def rows(self, table, col, value):
+        """Return the rows of a table where a column equals a value."""
+        df = self.tables[table]
+        with self._lock:
+            if (table, col) not in self._indexes:
+                self._indexes[(table, col)] = \
+                    df.groupby(col, sort=False, observed=True).indices
+            pos = self._indexes[(table, col)].get(value)
+        return df.iloc[pos] if pos is not None else df.iloc[:0]
+
+class StoredTables:
+    """
+    Result tables of one output folder that are looked up on disk (with
+    the same interface as `CachedTables`).
+
+    Rows are read with `read_field` and `read_dependencies`, i.e. from the
+    indexed SQLite database or with filtered parquet reads.
+
+    Args:
+        df_root (str): Folder containing the output tables.
+    """
+    nbytes = 0
+
+    def __init__(self, df_root):
+        self.df_root = df_root
+
+    def table(self, table, columns=None):
+        """Return a whole table (or the given columns of it) read from disk."""
+        return pd.read_parquet(os.path.join(self.df_root, TABLE_FILES[table]),
+            columns=columns or TABLE_COLUMNS[table])
+
+    def rows(self, table, col, value):
+        """Return the rows of a table where a column equals a value."""
+        if table == "fields":
+            if col != "source_field_repl_id":
+                raise ValueError(f"Unsupported field lookup column: {col}")
+            return read_field(self.df_root, value, TABLE_COLUMNS[table])
+        return read_dependencies(self.df_root, col, value, 
+            TABLE_COLUMNS[table])
+
+class CachedCalculations:
+    """
+    Calculations per node ID of one graphs folder.
+
+    Args:
+        base_dir (str): Graphs folder (see `read_calculations`).
+    """
+    def __init__(self, base_dir):
+        self.calculations = read_calculations(base_dir)
+        self.nbytes = sys.getsizeof(self.calculations) + sum(
+            sys.getsizeof(k) + sys.getsizeof(v)
+            for k, v in self.calculations.items())
+
+def table_size(df_root):
+    """Return the uncompressed size in bytes of the used table columns."""
+    size = 0
+    for k, f in TABLE_FILES.items():
+        meta = pq.read_metadata(os.path.join(df_root, f))
+        for i in range(meta.num_row_groups):
+            group = meta.row_group(i)
+            size += sum(group.column(j).total_uncompressed_size
+                for j in range(group.num_columns)
+                if group.column(j).path_in_schema in TABLE_COLUMNS[k])
+    return size
+
+class TableCache:
+    """
+    LRU cache of `CachedTables` per output folder and `CachedCalculations`
+    per graphs folder within a memory budget.
+
+    Args:
+        budget (int, optional): Maximum number of bytes of cached tables.
+            Defaults to TABLE_CACHE_BUDGET.
+    """
+    def __init__(self, budget=TABLE_CACHE_BUDGET):
+        self.budget = budget
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, df_root):
+        """
+        Return the (cached) tables of an output folder.
+
+        Tables larger than the budget are returned as `StoredTables`, which
+        are not cached.
+        """
+        path = os.path.abspath(df_root)
+        mtime = max(os.path.getmtime(os.path.join(path, f))
+            for f in TABLE_FILES.values())
+        key = (path, mtime)
+        entry = self._lookup(key)
+        if entry is not None:
+            return entry
+
+        if table_size(path) > self.budget:
+            return StoredTables(path)
+        return self._store(key, CachedTables(path))
+
+    def calculations(self, base_dir):
+        """Return the (cached) calculations per node ID of a graphs folder."""
+        path = os.path.abspath(os.path.join(base_dir, CALCULATIONS_FILE))
+        if not os.path.exists(path):
+            return {}
+        key = (path, os.path.getmtime(path))
+        entry = self._lookup(key) or self._store(key, 
+            CachedCalculations(base_dir))
+        return entry.calculations
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        return None
+
+    def _store(self, key, entry):
+        with self._lock:
+            # drop entries of replaced versions of the folder (or file)
+            for k in [k for k in self._entries if k[0] == key[0]]:
+                del self._entries[k]
+            self._entries[key] = entry
+            while len(self._entries) > 1 and sum(x.nbytes
+                for x in self._entries.values()) > self.budget:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, folder):
+        """Evict all entries of output (or graphs) folders within a folder."""
+        folder = os.path.abspath(folder)
+        with self._lock:
+            for k in [k for k in self._entries
+                if os.path.commonpath([k[0], folder]) == folder]:
+                del self._entries[k]
+
+table_cache = TableCache()
@@ -11,6 +11,7 @@ the shared `progress_data`.
 """
 
 import os
+import io
 import sys
 import numpy as np
 import pandas as pd
@@ -21,15 +22,28 @@ import pydot
 import random
 import string
 import zipfile
+import subprocess
+import time
+import queue
+import threading
+import contextvars
+from xml.sax.saxutils import escape
 from shared.logging import logger
+from shared.tracing import trace_span
 from shared.utils import sanitize_filename
+from shared.jobstate import ProgressData
+
+try:
+    import xlsxwriter
+except ImportError: # fall back to pandas/openpyxl for the Excel output
+    xlsxwriter = None
 
 # Script parameters
 fDepFields = True # create field dependency graphs?
 fDepSheets = True # create sheet dependency graphs?
 
-# Keep track of progress and file name
-progress_data = {}
+# Keep track of progress and file name (backend selectable, see jobstate)
+progress_data = ProgressData()
 
 # Constants
 MAXPATHSIZE = 260
@@ -40,6 +54,29 @@ COL_BORDER_SHEET = "#A64D79"
 GRAPH_FONT_MAIN = "Segoe UI"
 GRAPH_RANK_DIR = "LR" # alternative: TB (default)
 GRAPH_ARROWHEAD = "normal" # "open" is better but not when bumped in app
+COL_FILL_SUMMARY = "#FFFFFF"
+COL_BORDER_SUMMARY = "#999999"
+
+# Graph size guardrails (None: no limit)
+GRAPH_MAX_LEVEL = None # max. dependency level shown relative to the main node
+GRAPH_MAX_NODES = None # max. number of nodes per graph (e.g. 500)
+GRAPH_HUB_FANOUT = None # collapse neighbours of nodes with a larger fan-out (e.g. 50)
+
+# Graph rendering budget
+GRAPH_RENDER_TIMEOUT = 60 # max. seconds per layout attempt (None: no limit)
+GRAPH_FALLBACK_PROG = "sfdp" # cheaper layout engine used after a timeout
+RENDER_STATUSES = ["ok", "fallback", "placeholder"] # from best to worst
+ZIP_STORED_EXTS = ["png"] # already compressed, stored as-is in zip files
+ZIP_CHUNK_SIZE = 1024 * 1024 # bytes read per step when streaming zip files
+EXCEL_MAX_ROWS = 1048576 # Excel row limit per sheet (including header)
+PARQUET_CATEGORY_COLS = ["source_label", "field_category", "dependency_category", 
+    "field_datatype", "field_role"] # repetitive columns stored as dictionaries
+PARQUET_SORT_COL = "source_field_repl_id" # lookup key, enables row group skipping
+PARQUET_ROW_GROUP_SIZE = 10000 # rows per row group (unit of predicate pushdown)
+
+# Transitive reduction of field dependency graphs (drops implied edges)
+GRAPH_TRANSITIVE_REDUCTION = False
+GRAPH_REDUCTION_BENCHMARK = False # also time the unreduced render (slower)
 
 def show_exception_and_exit(exc_type, exc_value, tb):
     """
@@ -59,7 +96,7 @@ def prepare_progress_entry(user_id, file_path, out_folder, flag_exe):
     - For Flask/CLI: uses a single shared progress_data dict
 
     Determines and returns both the sanitized file name and output folder path.
-    The returned dict is the live reference inside progress_data, not a copy.
+    The returned entry writes through to progress_data, it is not a copy.
 
     Args:
         user_id (str | None): Unique user/session ID for Dash; None for Flask/CLI.
@@ -69,7 +106,7 @@ def prepare_progress_entry(user_id, file_path, out_folder, flag_exe):
 
     Returns:
         tuple: (progress_entry, file_name, out_dir)
-            progress_entry (dict): Live reference to the progress_data entry.
+            progress_entry (dict): Write-through proxy of the progress_data entry.
             file_name (str): Sanitized file name derived from the input path.
             out_dir (str): Path to the corresponding output folder.
     """
@@ -641,14 +678,415 @@ def deduplicate_graph(G: pydot.Dot) -> pydot.Dot:
 
     return clean
 
-def visualizeFieldDependencies(df, sf, l, g, dout_root, svg = False):
+def fieldEdgeIndex(df):
+    """
+    Build a columnar field -> field edge table sorted by source field, 
+    together with the position of each source field's edges in it.
+
+    Args:
+        df (pandas.DataFrame): Input data frame containing backward and 
+        forward dependencies (one row per dependency).
+
+    Returns:
+        dict: Edge columns "parent", "child" and "level" (lists sorted by 
+        source field, backward before forward dependencies) and "offsets",
+        a mapping of source field ID -> (start, end) positions of its edges.
+    """
+    dfEdge = df[df.dependency_category != "Sheet"]
+    dfEdge = dfEdge.sort_values("source_field_repl_id", kind = "stable")
+    ids = dfEdge["source_field_repl_id"].to_numpy()
+    bounds = (np.flatnonzero(ids[1:] != ids[:-1]) + 1).tolist()
+    starts = [0] + bounds if len(ids) > 0 else []
+    ends = bounds + [len(ids)] if len(ids) > 0 else []
+    return {
+        "parent": dfEdge["dependency_from"].tolist(),
+        "child": dfEdge["dependency_to"].tolist(),
+        "level": dfEdge["dependency_level"].tolist(),
+        "offsets": {ids[i]: (i, j) for i, j in zip(starts, ends)},
+    }
+
+def getNodeCopy(g, name, cache):
+    """
+    Get a copy of a master graph node that can be modified without 
+    affecting the master graph.
+
+    Args:
+        g (Graph): Master graph containing all node objects.
+        name (str): Quoted node name.
+        cache (dict): Node copies made so far for the current graph
+            (name -> node), so that each node is copied only once.
+
+    Returns:
+        pydot.Node: Copy of the node (attributes are not shared).
+    """
+    if name not in cache:
+        obj = dict(g.get_node(name)[0].obj_dict)
+        obj["attributes"] = dict(obj["attributes"])
+        cache[name] = pydot.Node(obj_dict = obj)
+    return cache[name]
+
+def graphDepths(edges, root):
+    """
+    Calculate the distance of every node to the main node of a graph.
+
+    Nodes are reached either downstream (following parent -> child edges
+    from the main node) or upstream (following them in reverse).
+
+    Args:
+        edges (list): List of (parent, child) tuples.
+        root (str): Main node ID.
+
+    Returns:
+        dict: Mapping of node ID -> (depth, direction) with direction equal
+        to "downstream" or "upstream" (the main node has depth 0).
+    """
+    children, parents = {}, {}
+    for p, c in edges:
+        children.setdefault(p, []).append(c)
+        parents.setdefault(c, []).append(p)
+
+    res = {root: (0, None)}
+    for direction, adj in [("downstream", children), ("upstream", parents)]:
+        frontier = [root]
+        depth = 0
+        while frontier:
+            depth += 1
+            nxt = []
+            for n in frontier:
+                for m in adj.get(n, []):
+                    if m not in res:
+                        res[m] = (depth, direction)
+                        nxt.append(m)
+            frontier = nxt
+    return res
+
+def limitGraphEdges(edges, root, max_level=None, max_nodes=None,
+                    hub_fanout=None):
+    """
+    Apply size guardrails to the edges of a single dependency graph.
+
+    The following limits are applied in order (None disables a limit):
+    - nodes further than `max_level` levels from the main node are removed,
+    - neighbours of a node with a fan-out larger than `hub_fanout` are
+      collapsed into a single summary node (the first `hub_fanout`
+      neighbours with dependencies of their own are kept), counting the
+      collapsed neighbours and the nodes only reached through them,
+    - only the `max_nodes` nodes closest to the main node are kept.
+
+    Args:
+        edges (list): List of (parent, child) tuples.
+        root (str): Main node ID.
+        max_level (int, optional): Maximum dependency level. Defaults to None.
+        max_nodes (int, optional): Maximum number of nodes. Defaults to None.
+        hub_fanout (int, optional): Maximum fan-out per node. Defaults to None.
+
+    Returns:
+        tuple: A tuple containing:
+            - list: Remaining (parent, child) edges in their original order.
+            - list: Summary nodes as (node ID, direction, count) tuples.
+            - list: Notes describing what was truncated.
+    """
+    edges = list(dict.fromkeys(edges))
+    summaries = []
+    notes = []
+    hubNotes = [] # (node ID, note) of collapsed hubs
+    nodeNotes = []
+
+    def nodeSet(lst):
+        return set([root] + [n for e in lst for n in e])
+
+    nAll = len(nodeSet(edges))
+    depths = graphDepths(edges, root)
+
+    if max_level is not None:
+        kept = set(n for n, (d, _) in depths.items() if d <= max_level)
+        edges = [e for e in edges if e[0] in kept and e[1] in kept]
+        nDropped = nAll - len(nodeSet(edges))
+        if nDropped > 0:
+            notes.append(f"max. dependency level {max_level}: "
+                f"{nDropped} nodes omitted")
+
+    if hub_fanout is not None:
+        children, parents = {}, {}
+        for p, c in edges:
+            children.setdefault(p, []).append(c)
+            parents.setdefault(c, []).append(p)
+        hidden = set()
+        hubs = []
+        for direction, adj in [("downstream", children), ("upstream", parents)]:
+            for n in sorted(adj):
+                # only collapse neighbours pointing away from the main node
+                lst = [m for m in adj[n] if m != root and
+                       depths.get(m, (0, None))[1] == direction]
+                if len(lst) <= hub_fanout:
+                    continue
+                # keep neighbours with dependencies of their own first
+                lst.sort(key=lambda m: (len(adj.get(m, [])) == 0, m))
+                lstHidden = lst[hub_fanout:]
+                for m in lstHidden:
+                    hidden.add((n, m) if direction == "downstream" else (m, n))
+                hubs.append((n, direction, adj, lstHidden))
+        if hidden:
+            edges = [e for e in edges if e not in hidden]
+            # drop whatever is no longer connected to the main node
+            depths = graphDepths(edges, root)
+            edges = [e for e in edges if e[0] in depths and e[1] in depths]
+
+        for n, direction, adj, lstHidden in hubs:
+            if n not in depths:
+                continue # collapsed into the summary of another hub
+            # count the hidden neighbours and the nodes only reached via them
+            omitted = set()
+            todo = [m for m in lstHidden if m not in depths]
+            while todo:
+                m = todo.pop()
+                if m not in omitted:
+                    omitted.add(m)
+                    todo.extend(x for x in adj.get(m, []) if x not in depths)
+            if omitted:
+                summaries.append((n, direction, len(omitted)))
+                hubNotes.append((n, f"{n}: {len(lstHidden)} {direction} "
+                    f"neighbours collapsed, {len(omitted)} nodes omitted "
+                    f"(fan-out > {hub_fanout})"))
+
+    if max_nodes is not None:
+        nodes = nodeSet(edges)
+        if len(nodes) > max_nodes:
+            ranked = sorted(nodes, key=lambda n: (depths[n][0], n))
+            kept = set(ranked[:max_nodes])
+            edges = [e for e in edges if e[0] in kept and e[1] in kept]
+            summaries = [s for s in summaries if s[0] in kept]
+            hubNotes = [x for x in hubNotes if x[0] in kept]
+            nodeNotes.append(f"max. number of nodes {max_nodes}: "
+                f"{len(nodes) - max_nodes} nodes omitted")
+
+    notes += [x[1] for x in hubNotes] + nodeNotes
+    if notes:
+        notes.insert(0, f"Graph truncated: {len(nodeSet(edges))} of "
+            f"{nAll} nodes shown")
+    return edges, summaries, notes
+
+def transitiveReduction(edges):
+    """
+    Remove edges that are implied by a longer path between the same nodes.
+
+    The reduction is computed on the condensation of the graph, in which 
+    each cycle (strongly connected component) is a single node. An edge 
+    (u, v) between different components is dropped if the component of v 
+    can also be reached from another successor of the component of u, so 
+    reachability between all nodes is preserved. Edges within a component
+    (i.e. part of a cycle) are kept.
+
+    Args:
+        edges (list): List of (parent, child) tuples.
+
+    Returns:
+        list: Remaining (parent, child) edges in their original order.
+    """
+    edges = list(dict.fromkeys(edges))
+    children = {}
+    for p, c in edges:
+        children.setdefault(p, []).append(c)
+        children.setdefault(c, [])
+
+    # strongly connected components (iterative Tarjan), which are found in
+    # reverse topological order (components without successors first)
+    comp = {}
+    index = {}
+    low = {}
+    stack = []
+    onStack = set()
+    order = []
+    for start in children:
+        if start in index:
+            continue
+        index[start] = low[start] = len(index)
+        stack.append(start)
+        onStack.add(start)
+        work = [(start, iter(children[start]))]
+        while work:
+            n, it = work[-1]
+            m = next(it, None)
+            if m is None:
+                work.pop()
+                if work:
+                    low[work[-1][0]] = min(low[work[-1][0]], low[n])
+                if low[n] == index[n]:
+                    k = len(order)
+                    while True:
+                        w = stack.pop()
+                        onStack.discard(w)
+                        comp[w] = k
+                        if w == n:
+                            break
+                    order.append(k)
+            elif m not in index:
+                index[m] = low[m] = len(index)
+                stack.append(m)
+                onStack.add(m)
+                work.append((m, iter(children[m])))
+            elif m in onStack:
+                low[n] = min(low[n], index[m])
+
+    # successors and reachable components of each component
+    succ = {k: set() for k in order}
+    for p, c in edges:
+        if comp[p] != comp[c]:
+            succ[comp[p]].add(comp[c])
+    reach = {}
+    for k in order:
+        res = set()
+        for w in succ[k]:
+            res.add(w)
+            res |= reach[w]
+        reach[k] = res
+
+    res = []
+    for p, c in edges:
+        cp, cc = comp[p], comp[c]
+        implied = cp != cc and \
+            any(cc in reach[w] for w in succ[cp] if w != cc)
+        if not implied:
+            res.append((p, c))
+    return res
+
+def addSummaryNodes(G, summaries):
+    """
+    Add collapsed neighbour summary nodes (e.g. "+312 downstream fields")
+    to a graph.
+
+    Args:
+        G (pydot.Dot): Graph to add the summary nodes to.
+        summaries (list): Summary nodes as (node ID, direction, count) tuples
+            as returned by `limitGraphEdges`.
+    """
+    for n, direction, count in summaries:
+        name = f"{n}+{direction}"
+        label = f"+{count} {direction} fields"
+        node = pydot.Node(name=name, label=label, shape="note",
+            color=COL_BORDER_SUMMARY, fillcolor=COL_FILL_SUMMARY, tooltip=" ")
+        G.add_node(node)
+        if direction == "downstream":
+            edge = pydot.Edge(n, name, style="dashed", tooltip=" ")
+        else:
+            edge = pydot.Edge(name, n, style="dashed", tooltip=" ")
+        G.add_edge(edge)
+
+def writeDotFile(G, path, notes=None):
+    """
+    Write the raw DOT source of a graph preceded by optional comment lines.
+
+    Args:
+        G (pydot.Dot): Graph to write.
+        path (str): Output file path.
+        notes (list, optional): Lines written as `//` comments at the top
+            of the file. Defaults to None.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        for note in notes or []:
+            f.write(f"// {note}\n")
+        f.write(G.to_string())
+
+def graphSidecar(G, root):
+    """
+    Collect the node attributes, main node and adjacency of a graph, so
+    that apps do not need to parse the DOT source.
+
+    Args:
+        G (pydot.Dot): Graph to describe.
+        root (str): Quoted name of the main node (field or sheet).
+
+    Returns:
+        dict: "main_node" ([ID, label, fill color]), "nodes" (node ID -> 
+        attributes as strings with normalized line breaks) and "adjacency" (parent ID -> child IDs), 
+        with unquoted node IDs.
+    """
+    nodes = {}
+    for node in G.get_nodes():
+        name = node.get_name()
+        if name in ("node", "edge", "graph"): continue
+        nodes[name.strip('"')] = {k: str(v).replace("\r\n", "\n") 
+            for k, v in node.get_attributes().items()}
+    adjacency = {}
+    for edge in G.get_edges():
+        adjacency.setdefault(edge.get_source().strip('"'), [])\
+            .append(edge.get_destination().strip('"'))
+    main = root.strip('"')
+    attrs = nodes.get(main, {})
+    return {"main_node": [main, attrs.get("label", main), 
+        attrs.get("fillcolor", "")], "nodes": nodes, "adjacency": adjacency}
+
+def writeGraphSidecar(G, root, path):
+    """Write the `graphSidecar` info of a graph to a JSON file."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(graphSidecar(G, root), f, ensure_ascii=False)
+
+def renderGraph(G, path, fmt, timeout=GRAPH_RENDER_TIMEOUT, fallback=False):
+    """
+    Render a graph to an output file within a wall-clock budget.
+
+    The graph is laid out with `dot` first. If that exceeds the budget, the
+    layout is retried with the cheaper GRAPH_FALLBACK_PROG engine without 
+    spline routing. If that also times out, an SVG placeholder referring to
+    the .dot file is written instead (other formats are skipped).
+
+    Args:
+        G (pydot.Dot or str): Graph to render or its DOT source.
+        path (str): Output file path.
+        fmt (str): Graphviz output format (e.g. "svg" or "png").
+        timeout (float, optional): Maximum number of seconds per layout 
+            attempt. Defaults to GRAPH_RENDER_TIMEOUT.
+        fallback (bool, optional): Start with the fallback engine right away
+            (e.g. when the graph already timed out for another format). 
+            Defaults to False.
+
+    Returns:
+        str: Render status, one of RENDER_STATUSES.
+    """
+    data = (G if isinstance(G, str) else G.to_string()).encode("utf-8")
+    attempts = [("dot", []), (GRAPH_FALLBACK_PROG, ["-Gsplines=false"])]
+    if fallback: attempts = attempts[1:]
+
+    for prog, args in attempts:
+        cmd = [prog, f"-T{fmt}"] + args + ["-o", path]
+        try:
+            with trace_span(f"{prog} -T{fmt}", "render", 
+                file=os.path.basename(path), bytes=len(data)):
+                subprocess.run(cmd, input=data, capture_output=True, 
+                    timeout=timeout, check=True)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"\tLayout of {os.path.basename(path)} with "
+                f"{prog} exceeded {timeout}s")
+            continue
+        except subprocess.CalledProcessError as e:
+            raise Exception(f"{prog} failed to render {path}: "
+                f"{e.stderr.decode('utf-8', errors='replace')}")
+        return "ok" if prog == "dot" else "fallback"
+
+    if fmt == "svg":
+        name = os.path.splitext(os.path.basename(path))[0]
+        msg = escape(f"Graph too large to render within {timeout}s, "
+            f"see {name}.dot")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('<svg xmlns="http://www.w3.org/2000/svg" '
+                'width="600" height="40">'
+                f'<text x="10" y="25" font-family="{GRAPH_FONT_MAIN}">'
+                f'{msg}</text></svg>')
+    return "placeholder"
+
+def visualizeFieldDependencies(df, sf, l, g, dout_root, svg = False,
+                               max_level=GRAPH_MAX_LEVEL,
+                               max_nodes=GRAPH_MAX_NODES,
+                               hub_fanout=GRAPH_HUB_FANOUT,
+                               reduce=GRAPH_TRANSITIVE_REDUCTION,
+                               benchmark=GRAPH_REDUCTION_BENCHMARK,
+                               store=None):
     """
     Creates output PNG/SVG files containing all dependencies for a 
     given source field.
 
     Args:
-        df (DataFrame): Input data frame containing backward and forward 
-        dependencies.
+        df (dict): Field edge index as returned by `fieldEdgeIndex`.
         sf (str): Input source field replacement ID.
         l (str): Input source field label.
         g (Graph): Master graph containing all source field and field node 
@@ -656,25 +1094,38 @@ def visualizeFieldDependencies(df, sf, l, g, dout_root, svg = False):
         dout_root (str): Full path to root directory where graphs will be saved.
         png (bool, optional): Indicator (True/False) whether or not to 
         generate PNG as well. Defaults to False.
+        max_level (int, optional): Maximum dependency level shown. 
+        Defaults to GRAPH_MAX_LEVEL.
+        max_nodes (int, optional): Maximum number of nodes shown. 
+        Defaults to GRAPH_MAX_NODES.
+        hub_fanout (int, optional): Fan-out above which neighbours are 
+        collapsed into a summary node. Defaults to GRAPH_HUB_FANOUT.
+        reduce (bool, optional): Remove edges implied by longer paths 
+        (transitive reduction). Defaults to GRAPH_TRANSITIVE_REDUCTION.
+        benchmark (bool, optional): Also time the SVG render of the 
+        unreduced graph (without saving it). Defaults to 
+        GRAPH_REDUCTION_BENCHMARK.
+        store (GraphStore, optional): Graph store to add the graph to 
+        instead of writing output files. Defaults to None.
 
     Returns:
-        None: SVG file is saved in 
-        "<workbook path> Files\Graphs\<source field name>.png" and 
-        additional PNG file (with extra attributes) if png is True.
+        dict: Graph info with the render status ("status", one of 
+        RENDER_STATUSES or None if not rendered), the number of edges before and after the 
+        transitive reduction ("n_edges", "n_edges_reduced") and the SVG 
+        render time in seconds of the saved and, if benchmarked, the 
+        unreduced graph ("render_time", "render_time_full") and the paths 
+        of the written files ("files"). SVG file is 
+        saved in "<workbook path> Files\Graphs\<source field name>.png" 
+        and additional PNG file (with extra attributes) if png is True.
     """
     s = l.split(".")[0]
     f = l.split(".")[1]
 
-    dictBackward = \
-        list(df[df.source_field_repl_id == sf]\
-            ["field_backward_dependencies"])[0]
-    dictForward = \
-        list(df[df.source_field_repl_id == sf]\
-            ["field_forward_dependencies"])[0]
-    dictDependency = copy.deepcopy(dictBackward + dictForward)
+    # backward and forward (parent -> child) edges of the source field
+    start, end = df["offsets"].get(sf, (0, 0))
 
-    # create a copy of the master node list in order to not modify it
-    MGCopy = copy.deepcopy(g)
+    # copies of master nodes used in this graph (master is not modified)
+    dictNodes = {}
 
     # set properties for main node
     G = pydot.Dot(
@@ -690,41 +1141,56 @@ def visualizeFieldDependencies(df, sf, l, g, dout_root, svg = False):
         arrowhead=GRAPH_ARROWHEAD,
     )
     subject = '"' + sf + '"'
-    root = MGCopy.get_node(subject)[0]
+    root = getNodeCopy(g, subject, dictNodes)
     root.set("fillcolor", COL_FILL_MAIN_FIELD)
     root.set("color", COL_BORDER_MAIN_FIELD)
     root.set("label", f)
     root.set("penwidth", 3)
     G.add_node(root)
 
+    lstEdges = list(dict.fromkeys(zip(df["parent"][start:end], 
+        df["child"][start:end])))
+    nEdges = len(lstEdges)
+    lstImplied = []
+    if reduce:
+        lstReduced = transitiveReduction(lstEdges)
+        lstImplied = list(set(lstEdges) - set(lstReduced))
+        lstEdges = lstReduced
+    nEdgesReduced = len(lstEdges)
+    lstEdges, lstSummary, notes = limitGraphEdges(lstEdges, sf, 
+        max_level, max_nodes, hub_fanout)
+    if notes: logger.info(f"\t{l}: {notes[0]}")
+    if lstImplied:
+        notes.append(f"Transitive reduction: {nEdges - nEdgesReduced} of "
+            f"{nEdges} implied edges omitted")
+
     # add (parent -> child) edges to graph
-    for d in dictDependency:
-        # don't visualize sheet dependencies
-        if d["category"] != "Sheet":
-            parent = '"' + d["parent"] + '"'
-            child = '"' + d["child"] + '"'
-            nodeParent = MGCopy.get_node(parent)[0]
-            nodeChild = MGCopy.get_node(child)[0]
-            sourceParent = nodeParent.get("label").split(".")
-            # replace [s].[f] label by [f] if internal reference
-            if (sourceParent[0] in [s, "[Parameters]"]) & \
-                (len(sourceParent) == 2):
-                nodeParent.set("label", sourceParent[1])
-            sourceChild = nodeChild.get("label").split(".")
-            if (sourceChild[0] in [s, "[Parameters]"]) & \
-                (len(sourceChild) == 2):
-                nodeChild.set("label", sourceChild[1])
-            G.add_node(nodeParent)
-            G.add_node(nodeChild)
-            edge = pydot.Edge(nodeParent, nodeChild, tooltip = " ")
-            G.add_edge(edge)
+    for p, c in lstEdges:
+        parent = '"' + p + '"'
+        child = '"' + c + '"'
+        nodeParent = getNodeCopy(g, parent, dictNodes)
+        nodeChild = getNodeCopy(g, child, dictNodes)
+        sourceParent = nodeParent.get("label").split(".")
+        # replace [s].[f] label by [f] if internal reference
+        if (sourceParent[0] in [s, "[Parameters]"]) & \
+            (len(sourceParent) == 2):
+            nodeParent.set("label", sourceParent[1])
+        sourceChild = nodeChild.get("label").split(".")
+        if (sourceChild[0] in [s, "[Parameters]"]) & \
+            (len(sourceChild) == 2):
+            nodeChild.set("label", sourceChild[1])
+        G.add_node(nodeParent)
+        G.add_node(nodeChild)
+        edge = pydot.Edge(nodeParent, nodeChild, tooltip = " ")
+        G.add_edge(edge)
+    addSummaryNodes(G, lstSummary)
 
     # create output graphs folder if it doesn't exist yet
     specialChar = "[^A-Za-z0-9]+"
     sout = re.sub(specialChar, '', s)
     fout = re.sub(specialChar, '', f)
     dout = os.path.join(dout_root, sout)
-    if not os.path.isdir(dout):
+    if store is None and not os.path.isdir(dout):
         os.makedirs(dout)
     
     # write output files with forced UTF-8 encoding to avoid errors
@@ -765,13 +1231,43 @@ def visualizeFieldDependencies(df, sf, l, g, dout_root, svg = False):
     # deduplicate before saving
     G = deduplicate_graph(G)
 
-    # save svg and raw dot
-    G.write_svg(outFile, encoding = "utf-8")
+    if store is not None:
+        store.add(sout, fout, sf, G, notes)
+        return {"status": None, "n_edges": nEdges, 
+            "n_edges_reduced": nEdgesReduced, "render_time": 0.0, 
+            "render_time_full": None, "files": []}
+
+    # time render of unreduced graph (implied edges between shown nodes)
+    tFull = None
+    if benchmark and lstImplied:
+        GFull = copy.deepcopy(G)
+        lstNodes = set(n for e in lstEdges for n in e)
+        for p, c in lstImplied:
+            if p in lstNodes and c in lstNodes:
+                GFull.add_edge(pydot.Edge(p, c, tooltip = " "))
+        tFull = time.perf_counter()
+        renderGraph(GFull, os.devnull, "svg")
+        tFull = time.perf_counter() - tFull
+
+    # save svg and raw dot (including truncation notes)
+    t = time.perf_counter()
+    status = renderGraph(G, outFile, "svg")
+    t = time.perf_counter() - t
+    lstFiles = [outFile]
     outFile = os.path.join(dout, f"{fout}.dot")
-    G.write_raw(outFile, encoding="utf-8")
-    if svg:
+    writeDotFile(G, outFile, notes)
+    lstFiles.append(outFile)
+    outFile = os.path.join(dout, f"{fout}.json")
+    writeGraphSidecar(G, subject, outFile)
+    lstFiles.append(outFile)
+    if svg and status != "placeholder":
         outFile = os.path.join(dout, f"{fout}.png")
-        G.write_png(outFile, encoding = "utf-8")
+        if renderGraph(G, outFile, "png", 
+            fallback=(status == "fallback")) != "placeholder":
+            lstFiles.append(outFile)
+    return {"status": status, "n_edges": nEdges, 
+        "n_edges_reduced": nEdgesReduced, "render_time": t, 
+        "render_time_full": tFull, "files": lstFiles}
 
 def appendFieldsToDicts(l, k, v):
     """
@@ -791,59 +1287,91 @@ def appendFieldsToDicts(l, k, v):
             for i in range(len(k)): d[k[i]] = v[i]
     return l
 
-def visualizeSheetDependencies(df, sh, g, dout, png=False):
+def sheetEdgeTable(df):
+    """
+    Split the dependency table into the edges to visualize per sheet.
+
+    For each sheet, the field -> sheet edges are combined with the 
+    field -> field edges between fields of that sheet, after pruning the 
+    field -> sheet edges of fields that are parents of other sheet fields.
+    The table is grouped once so that the cost per sheet only depends on 
+    the dependencies of its own fields.
+
+    Args:
+        df (pandas.DataFrame): Input data frame containing backward and 
+        forward dependencies.
+
+    Returns:
+        dict: Mapping of sheet ID -> data frame with columns 
+        "dependency_from", "dependency_to", "dependency_category" and 
+        "source_field_label".
+    """
+    cols = ["dependency_from", "dependency_to", "dependency_category", 
+        "source_field_label"]
+    dfSheet = df[df.dependency_category == "Sheet"]
+    # remove field -> field edge duplicates
+    dfField = df[df.dependency_category != "Sheet"]
+    dfField = dfField.drop_duplicates(subset = ["dependency_from", 
+        "dependency_to"]).reset_index(drop = True)
+    dfField["dependency_category"] = "Field"
+    # row positions of field -> field edges per parent field
+    dictFrom = dfField.groupby("dependency_from", sort = False).indices
+
+    res = {}
+    for sh, depSheet in dfSheet.groupby("dependency_to", sort = False):
+        setFields = set(depSheet["source_field_repl_id"])
+
+        # get field -> field edges between fields of the sheet
+        lstPos = [dictFrom[x] for x in setFields if x in dictFrom]
+        pos = np.sort(np.concatenate(lstPos)) if lstPos else []
+        depField = dfField.iloc[pos]
+        depField = depField[depField["dependency_to"].isin(setFields)]
+
+        # prune all fields that are parents of other fields
+        setParents = set(depField["dependency_from"])
+        depSheet = depSheet[~depSheet["dependency_from"].isin(setParents)]
+
+        res[sh] = pd.concat([depSheet[cols], depField[cols]], 
+            ignore_index = True)
+    return res
+
+def visualizeSheetDependencies(df, sh, g, dout, png=False,
+                               max_level=GRAPH_MAX_LEVEL,
+                               max_nodes=GRAPH_MAX_NODES,
+                               hub_fanout=GRAPH_HUB_FANOUT,
+                               store=None):
     """
     Create output PNG/SVG files containing all dependencies for a given 
     source field.
 
     Args:
-        df (pandas.DataFrame): Input data frame containing backward and forward 
-        dependencies.
+        df (dict): Edges to visualize per sheet ID as returned by 
+        `sheetEdgeTable`.
         sh (str): Input sheet ID for which dependencies are visualized.
         g (Graph): Master graph containing all source field and field node 
         objects.
         dout (str): Full path to the root directory where graphs will be saved.
         png (bool, optional): Indicator (True/False) to generate PNG as well. 
         Defaults to False.
+        max_level (int, optional): Maximum dependency level shown. 
+        Defaults to GRAPH_MAX_LEVEL.
+        max_nodes (int, optional): Maximum number of nodes shown. 
+        Defaults to GRAPH_MAX_NODES.
+        hub_fanout (int, optional): Fan-out above which neighbours are 
+        collapsed into a summary node. Defaults to GRAPH_HUB_FANOUT.
+        store (GraphStore, optional): Graph store to add the graph to 
+        instead of writing output files. Defaults to None.
 
     Returns:
-        None: PNG file is saved in 
+        dict: Graph info with the same keys as `visualizeFieldDependencies`
+        (no transitive reduction is applied). PNG file is saved in 
         "<workbook path> Files\Graphs\Sheets\<sheet name>.svg" and an 
         additional PNG file (with extra attributes) if png is True.
     """
-    # --- get field -> sheet edges ---
-    depSheet = df[
-        (df.dependency_category == "Sheet")
-        & (df.dependency_to == sh)
-    ][[
-        "dependency_from",
-        "dependency_to",
-        "dependency_category",
-        "source_field_label",
-        "source_field_repl_id",
-    ]]
-
-    # get field -> field edges
-    lstFields = list(depSheet["source_field_repl_id"])
-    depField = df[(df.dependency_category != "Sheet")]
-    flag = depField.apply(lambda x: 
-         (x.dependency_from in lstFields) & (x.dependency_to in lstFields), 
-         axis = 1)
-    depField = depField.loc[flag]
-    depField["dependency_category"] = "Field"
-    # remove field -> field edge duplicates
-    depField = depField.drop_duplicates(subset = ["dependency_from", "dependency_to"])
+    depSheet = df[sh]
 
-    # prune all fields that are parents of other fields
-    lstParents = list(depField["dependency_from"].unique())
-    flag = depSheet["dependency_from"].apply(lambda x: x not in lstParents)
-    depSheet = depSheet.loc[flag]
-
-    depSheet = depSheet[["dependency_from", "dependency_to", 
-        "dependency_category", "source_field_label"]]
-    depSheet = depSheet.append(depField)
-    
-    MGCopy = copy.deepcopy(g)
+    # copies of master nodes used in this graph (master is not modified)
+    dictNodes = {}
 
     # set properties for main node
     G = pydot.Dot(
@@ -859,18 +1387,23 @@ def visualizeSheetDependencies(df, sh, g, dout, png=False):
         arrowhead=GRAPH_ARROWHEAD,
     )
     subject = '"' + sh + '"'
-    root = MGCopy.get_node(subject)[0]
+    root = getNodeCopy(g, subject, dictNodes)
     l = root.get("label")
     root.set("fillcolor", COL_FILL_SHEET)
     root.set("color", COL_BORDER_SHEET)
     G.add_node(root)
     
+    lstEdges = list(zip(depSheet.dependency_from, depSheet.dependency_to))
+    lstEdges, lstSummary, notes = limitGraphEdges(lstEdges, sh, 
+        max_level, max_nodes, hub_fanout)
+    if notes: logger.info(f"\t{l}: {notes[0]}")
+
     # add (parent -> child) edges to graph
-    for _, row in depSheet.iterrows():
-        parent = '"' + row.dependency_from + '"'
-        child = '"' + row.dependency_to + '"'
-        nodeParent = MGCopy.get_node(parent)[0]
-        nodeChild = MGCopy.get_node(child)[0]
+    for p, c in lstEdges:
+        parent = '"' + p + '"'
+        child = '"' + c + '"'
+        nodeParent = getNodeCopy(g, parent, dictNodes)
+        nodeChild = getNodeCopy(g, child, dictNodes)
         sourceParent = nodeParent.get("label").split(".")
         # replace [s].[f] label by [f] if internal reference
         if len(sourceParent) == 2: nodeParent.set("label", sourceParent[1])
@@ -880,6 +1413,7 @@ def visualizeSheetDependencies(df, sh, g, dout, png=False):
         G.add_node(nodeChild)
         edge = pydot.Edge(nodeParent, nodeChild, tooltip = " ")
         G.add_edge(edge)
+    addSummaryNodes(G, lstSummary)
 
     # write output files with forced UTF-8 encoding to avoid errors
     # see https://github.com/pydot/pydot/issues/142
@@ -897,12 +1431,116 @@ def visualizeSheetDependencies(df, sh, g, dout, png=False):
     # deduplicate before saving
     G = deduplicate_graph(G)
 
-    G.write_svg(outFile, encoding = "utf-8")
+    if store is not None:
+        store.add(os.path.basename(dout), fout, sh, G, notes)
+        return {"status": None, "n_edges": len(lstEdges), 
+            "n_edges_reduced": len(lstEdges), "render_time": 0.0, 
+            "render_time_full": None, "files": []}
+
+    t = time.perf_counter()
+    status = renderGraph(G, outFile, "svg")
+    t = time.perf_counter() - t
+    lstFiles = [outFile]
     outFile = os.path.join(dout, f"{fout}.dot")
-    G.write_raw(outFile, encoding="utf-8")
-    if png:
+    writeDotFile(G, outFile, notes)
+    lstFiles.append(outFile)
+    outFile = os.path.join(dout, f"{fout}.json")
+    writeGraphSidecar(G, subject, outFile)
+    lstFiles.append(outFile)
+    if png and status != "placeholder":
         outFile = os.path.join(dout, f"{fout}.png")
-        G.write_png(outFile, encoding = "utf-8")
+        if renderGraph(G, outFile, "png", 
+            fallback=(status == "fallback")) != "placeholder":
+            lstFiles.append(outFile)
+    return {"status": status, "n_edges": len(lstEdges), 
+        "n_edges_reduced": len(lstEdges), "render_time": t, 
+        "render_time_full": None, "files": lstFiles}
+
+def excelSheetParts(name, df):
+    """
+    Split a data frame into parts that fit within Excel's row limit.
+
+    Args:
+        name (str): Sheet name.
+        df (pandas.DataFrame): Sheet data.
+
+    Returns:
+        list: (sheet name, data frame part) tuples, with "_2", "_3", ... 
+        appended to the names of additional sheets.
+    """
+    nRows = EXCEL_MAX_ROWS - 1
+    res = []
+    for i, start in enumerate(range(0, max(len(df), 1), nRows)):
+        sheet = name if i == 0 else f"{name[:28]}_{i + 1}"
+        res.append((sheet, df.iloc[start:start + nRows]))
+    if len(res) > 1:
+        logger.info(f"\tSheet '{name}' split into {len(res)} sheets "
+            f"({len(df)} rows)")
+    return res
+
+def writeExcel(sheets, path):
+    """
+    Write data frames to an Excel file, one or more sheets per data frame.
+
+    Uses xlsxwriter in constant memory mode (rows are streamed to disk as 
+    they are written) if available, else pandas with its default engine. 
+    Sheets exceeding Excel's row limit are split over multiple sheets.
+
+    Args:
+        sheets (dict): Mapping of sheet name -> data frame.
+        path (str): Output Excel file path.
+    """
+    parts = [p for name, df in sheets.items() for p in excelSheetParts(name, df)]
+
+    if xlsxwriter is None:
+        with pd.ExcelWriter(path) as writer:
+            for name, df in parts:
+                df.to_excel(writer, sheet_name = name, index = False)
+        return
+
+    wb = xlsxwriter.Workbook(path, {"constant_memory": True})
+    fmtHeader = wb.add_format({"bold": True, "border": 1, 
+        "align": "center", "valign": "top"})
+    for name, df in parts:
+        ws = wb.add_worksheet(name)
+        ws.write_row(0, 0, [str(c) for c in df.columns], fmtHeader)
+        for r, row in enumerate(df.itertuples(index = False, name = None), 1):
+            for c, v in enumerate(row):
+                if isinstance(v, (np.generic, np.ndarray)):
+                    # e.g. lists read back from parquet files
+                    v = v.item() if np.ndim(v) == 0 else v.tolist()
+                if v is None:
+                    continue
+                elif isinstance(v, str):
+                    ws.write_string(r, c, v)
+                elif isinstance(v, bool):
+                    ws.write_boolean(r, c, v)
+                elif isinstance(v, (int, float)):
+                    if not np.isnan(v) and not np.isinf(v):
+                        ws.write_number(r, c, v)
+                else:
+                    ws.write_string(r, c, str(v))
+    wb.close()
+
+def writeParquet(df, path):
+    """
+    Write a data frame to a parquet file optimized for lookups.
+
+    Repetitive columns (PARQUET_CATEGORY_COLS) are stored as categoricals
+    (dictionary encoded) and rows are sorted by PARQUET_SORT_COL so that 
+    the min/max statistics per row group allow readers to skip row groups 
+    when filtering on that column.
+
+    Args:
+        df (pandas.DataFrame): Data frame to write.
+        path (str): Output parquet file path.
+    """
+    if PARQUET_SORT_COL in df.columns:
+        df = df.sort_values(PARQUET_SORT_COL, kind = "stable")
+    cols = [x for x in PARQUET_CATEGORY_COLS if x in df.columns]
+    df = df.astype({x: "category" for x in cols})
+    df.to_parquet(path, engine = "pyarrow", index = False, 
+        row_group_size = PARQUET_ROW_GROUP_SIZE, write_statistics = True)
 
 def zip_folder(folder_path, output_zip_path, skip_exts=["parquet"]):
     """
@@ -912,6 +1550,9 @@ def zip_folder(folder_path, output_zip_path, skip_exts=["parquet"]):
       - The output zip file itself if it's inside the folder.
       - Any files with extensions listed in `skip_exts`.
 
+    Files with extensions listed in ZIP_STORED_EXTS (already compressed)
+    are stored without compression.
+
     Args:
         folder_path (str): Folder to zip.
         output_zip_path (str): Path of the zip file to create.
@@ -935,5 +1576,150 @@ def zip_folder(folder_path, output_zip_path, skip_exts=["parquet"]):
                     continue
 
                 arcname = os.path.relpath(file_path, folder_path)
-                zipf.write(file_path, arcname)
+                zipf.write(file_path, arcname, compress_type=zipCompression(ext))
+
+def zipCompression(ext):
+    """Return the zip compression type for a file extension (without dot)."""
+    if ext in ZIP_STORED_EXTS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+class ZipArchiver:
+    """
+    Append files to a zip archive in a background thread while they are 
+    being produced, so that the archive is ready shortly after the last 
+    file is written.
+
+    Files are added with `add` once they are complete. Compression happens
+    in the archiver thread (zlib releases the GIL), files with extensions 
+    in ZIP_STORED_EXTS are stored without compression. `close` adds any 
+    remaining files of the folder (e.g. the log file) and finalizes the 
+    archive, the result being equivalent to `zip_folder`.
 
+    Args:
+        folder_path (str): Folder whose files are archived (used for the 
+            relative paths inside the archive).
+        output_zip_path (str): Path of the zip file to create.
+        skip_exts (list[str], optional): File extensions to skip (without dots).
+            Defaults to ["parquet"].
+    """
+    def __init__(self, folder_path, output_zip_path, skip_exts=["parquet"]):
+        self.folder_path = os.path.abspath(folder_path)
+        self.output_zip_path = os.path.abspath(output_zip_path)
+        self.skip_exts = skip_exts
+        self._queue = queue.Queue()
+        self._added = set()
+        self._error = None
+        self._zip = zipfile.ZipFile(self.output_zip_path, "w", 
+            zipfile.ZIP_DEFLATED)
+        # run in the job's context (job log and trace, see shared.tracing)
+        self._thread = threading.Thread(target=contextvars.copy_context().run,
+            args=(self._run,), daemon=True, name="zip-archiver")
+        self._thread.start()
+
+    def add(self, file_path):
+        """Queue a complete file for archiving."""
+        self._queue.put(file_path)
+
+    def close(self):
+        """Add the remaining files of the folder and finalize the archive."""
+        for root, _, files in os.walk(self.folder_path):
+            for file in files:
+                self._queue.put(os.path.join(root, file))
+        self._finish()
+        if self._error:
+            raise self._error
+
+    def abort(self):
+        """Stop archiving and remove the incomplete archive."""
+        self._finish()
+        if os.path.exists(self.output_zip_path):
+            os.remove(self.output_zip_path)
+
+    def _finish(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._zip.close()
+
+    def _run(self):
+        while True:
+            file_path = self._queue.get()
+            if file_path is None:
+                break
+            if self._error:
+                continue
+            try:
+                self._write(file_path)
+            except Exception as e:
+                self._error = e
+
+    def _write(self, file_path):
+        file_path = os.path.abspath(file_path)
+        ext = os.path.splitext(file_path)[1].lower().lstrip(".")
+        if file_path in self._added or file_path == self.output_zip_path \
+            or ext in self.skip_exts:
+            return
+        arcname = os.path.relpath(file_path, self.folder_path)
+        with trace_span(arcname, "zip"):
+            self._zip.write(file_path, arcname, 
+                compress_type=zipCompression(ext))
+        self._added.add(file_path)
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """Write-only, unseekable buffer collecting the bytes written by zipfile."""
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def pop(self):
+        """Return and clear the bytes written so far."""
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def stream_zip(folder_path, exts=None, skip_exts=["parquet", "zip"], 
+               chunk_size=ZIP_CHUNK_SIZE):
+    """
+    Generate a zip archive of a folder chunk by chunk, without writing it to
+    disk or holding it in memory.
+
+    Args:
+        folder_path (str): Folder to zip.
+        exts (list[str], optional): Only include files with these extensions
+            (without dots). Defaults to None (all files).
+        skip_exts (list[str], optional): File extensions to skip (without 
+            dots). Defaults to ["parquet", "zip"].
+        chunk_size (int, optional): Number of bytes read from a file at a 
+            time. Defaults to ZIP_CHUNK_SIZE.
+
+    Yields:
+        bytes: Consecutive parts of the zip archive.
+    """
+    buffer = _ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
+        for root, _, files in os.walk(folder_path):
+            for file in sorted(files):
+                ext = os.path.splitext(file)[1].lower().lstrip(".")
+                if ext in skip_exts or (exts and ext not in exts):
+                    continue
+
+                file_path = os.path.join(root, file)
+                arcname = os.path.relpath(file_path, folder_path)
+                zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+                zinfo.compress_type = zipCompression(ext)
+                with open(file_path, "rb") as src, zipf.open(zinfo, "w") as dst:
+                    while True:
+                        chunk = src.read(chunk_size)
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+                        yield buffer.pop()
+                yield buffer.pop()
+    # central directory
+    yield buffer.pop()
@@ -0,0 +1,118 @@
+"""
+database.py
+
+This module writes the processed workbook metadata to an embedded SQLite
+database and provides indexed lookups on it (used by `shared.cache` for
+tables too large to keep in memory, and by downstream tools).
+
+The database (`Fields/workbook.sqlite`) contains the tables `fields` (one
+row per field), `edges` (one row per field dependency, with both the
+labels and IDs of the connected fields/sheets) and `sheets` (one row per
+sheet). Readers fall back to filtered reads of the parquet files for output 
+folders created before the database was introduced.
+"""
+import os
+import sqlite3
+from contextlib import closing
+from urllib.request import pathname2url
+from shared.common import np, pd
+
+DATABASE_FILE = "workbook.sqlite"
+
+# columns that can be used to look up dependencies
+EDGE_KEYS = ["source_field_repl_id", "dependency_from", "dependency_to",
+    "dependency_from_id", "dependency_to_id"]
+
+INDEXES = {
+    "fields": ["source_field_repl_id"],
+    "edges": ["source_field_repl_id", "dependency_from_id",
+        "dependency_to_id", "dependency_to"],
+    "sheets": ["sheet_id"],
+}
+
+def _sql_value(v):
+    """Convert a data frame value to a type supported by SQLite."""
+    if isinstance(v, (np.generic, np.ndarray)):
+        v = v.item() if np.ndim(v) == 0 else v.tolist()
+    if isinstance(v, (list, dict, tuple)):
+        return str(v)
+    return v
+
+def write_database(path, df_fields, df_edges, df_sheets):
+    """
+    Write the field, edge and sheet tables to a new SQLite database.
+
+    Args:
+        path (str): Database file path (replaced if it exists).
+        df_fields (pandas.DataFrame): Field table.
+        df_edges (pandas.DataFrame): Dependency table including the
+            "dependency_from_id" and "dependency_to_id" columns.
+        df_sheets (pandas.DataFrame): Sheet table with a "sheet_id" column.
+    """
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path): os.remove(tmp_path)
+
+    with closing(sqlite3.connect(tmp_path)) as con:
+        for table, df in (("fields", df_fields), ("edges", df_edges),
+            ("sheets", df_sheets)):
+            df = df.copy()
+            for col in df.columns[df.dtypes == object]:
+                df[col] = df[col].map(_sql_value)
+            df.to_sql(table, con, index=False)
+            for col in INDEXES[table]:
+                con.execute(f'CREATE INDEX "ix_{table}_{col}" '
+                    f'ON "{table}" ("{col}")')
+        con.commit()
+    os.replace(tmp_path, path)
+
+def query(path, sql, params=()):
+    """Run a read-only query on a database and return a data frame."""
+    uri = "file:{0}?mode=ro".format(pathname2url(os.path.abspath(path)))
+    with closing(sqlite3.connect(uri, uri=True)) as con:
+        return pd.read_sql_query(sql, con, params=params)
+
+def _select(columns):
+    """Return the SELECT list of the given columns (all if None)."""
+    return ", ".join(f'"{c}"' for c in columns) if columns else "*"
+
+def read_field(df_root, field_id, columns=None):
+    """
+    Return the field table rows of a field.
+
+    Args:
+        df_root (str): Folder containing the output tables.
+        field_id (str): Field replacement ID (source_field_repl_id).
+        columns (list, optional): Columns to read. Defaults to None (all).
+
+    Returns:
+        pandas.DataFrame: Matching rows (empty if the ID is not a field).
+    """
+    path = os.path.join(df_root, DATABASE_FILE)
+    if os.path.isfile(path):
+        return query(path, f"SELECT {_select(columns)} FROM fields "
+            "WHERE source_field_repl_id = ?", [field_id])
+    return pd.read_parquet(os.path.join(df_root, "fields.parquet"),
+        columns=columns, filters=[("source_field_repl_id", "==", field_id)])
+
+def read_dependencies(df_root, key, value, columns=None):
+    """
+    Return the dependency table rows matching a value of a key column.
+
+    Args:
+        df_root (str): Folder containing the output tables.
+        key (str): Lookup column, one of EDGE_KEYS.
+        value (str): Value to look up.
+        columns (list, optional): Columns to read. Defaults to None (all).
+
+    Returns:
+        pandas.DataFrame: Matching rows.
+    """
+    if key not in EDGE_KEYS:
+        raise ValueError(f"Unsupported dependency lookup column: {key}")
+
+    path = os.path.join(df_root, DATABASE_FILE)
+    if os.path.isfile(path):
+        return query(path, f'SELECT {_select(columns)} FROM edges '
+            f'WHERE "{key}" = ?', [value])
+    return pd.read_parquet(os.path.join(df_root, "dependencies.parquet"),
+        columns=columns, filters=[(key, "==", value)])
@@ -0,0 +1,222 @@
+"""
+graphstore.py
+
+This module stores all dependency graphs of a workbook in a single SQLite
+file (`Graphs/graphs.sqlite`) instead of one .dot file per graph.
+
+Node attributes of the master graph (labels, colors, calculation tooltips)
+are stored once in the `nodes` table. Per graph, the `graphs` table holds
+the graph attributes, truncation notes and sidecar info (node attributes,
+main node and adjacency, see `graphSidecar`), `graph_nodes` the nodes in
+order with only the attributes that differ from the master node, and
+`edges` the edges, indexed by graph. The DOT source of a graph is generated
+on demand, and the classic per-file layout (.dot/.svg/.png files per data
+source folder) can still be exported from the store.
+"""
+import os
+import json
+import sqlite3
+from contextlib import closing
+from urllib.request import pathname2url
+from shared.common import pydot, graphSidecar, renderGraph, writeDotFile
+
+GRAPH_STORE_FILE = "graphs.sqlite"
+
+SCHEMA = """
+CREATE TABLE nodes (node_id TEXT PRIMARY KEY, attrs TEXT);
+CREATE TABLE graphs (graph_id INTEGER PRIMARY KEY, folder TEXT, name TEXT,
+    main_node TEXT, graph_type TEXT, attrs TEXT, notes TEXT, sidecar TEXT);
+CREATE TABLE graph_nodes (graph_id INTEGER, seq INTEGER, node_id TEXT,
+    attrs TEXT);
+CREATE TABLE edges (graph_id INTEGER, seq INTEGER, parent TEXT, child TEXT,
+    attrs TEXT);
+CREATE INDEX ix_graphs_folder_name ON graphs (folder, name);
+CREATE INDEX ix_graph_nodes_graph_id ON graph_nodes (graph_id, seq);
+CREATE INDEX ix_edges_graph_id ON edges (graph_id, seq);
+"""
+
+def has_graph_store(graphs_dir):
+    """Return True if a graphs folder contains a graph store."""
+    return bool(graphs_dir) and \
+        os.path.isfile(os.path.join(graphs_dir, GRAPH_STORE_FILE))
+
+class GraphStore:
+    """
+    Write graphs to a new graph store.
+
+    Args:
+        path (str): Graph store file path (replaced if it exists).
+        g (pydot.Dot): Master graph containing all field and sheet nodes.
+    """
+    def __init__(self, path, g):
+        self.path = path
+        if os.path.exists(path): os.remove(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._con = sqlite3.connect(path)
+        self._con.executescript(SCHEMA)
+        self._master = {n.get_name(): n.get_attributes() for n in g.get_nodes()}
+        self._con.executemany("INSERT INTO nodes VALUES (?, ?)",
+            [(k, json.dumps(v)) for k, v in self._master.items()])
+
+    def add(self, folder, name, main_node, G, notes=None):
+        """
+        Add a graph to the store.
+
+        Args:
+            folder (str): Folder of the graph in the classic layout.
+            name (str): File name of the graph (without extension).
+            main_node (str): ID of the field or sheet the graph is about.
+            G (pydot.Dot): Graph with nodes copied from the master graph.
+            notes (list, optional): Comment lines (e.g. truncation notes).
+                Defaults to None.
+        """
+        cur = self._con.execute(
+            "INSERT INTO graphs (folder, name, main_node, graph_type, attrs, "
+            "notes, sidecar) VALUES (?, ?, ?, ?, ?, ?, ?)", (folder, name, 
+            main_node, G.get_type(), json.dumps(G.get_attributes()),
+            json.dumps(notes or []), json.dumps(graphSidecar(G, 
+            f'"{main_node}"'), ensure_ascii=False)))
+        graph_id = cur.lastrowid
+
+        rows = []
+        for i, node in enumerate(G.get_nodes()):
+            node_id = node.get_name()
+            attrs = node.get_attributes()
+            if node_id in self._master:
+                # only keep the attributes that differ from the master node
+                base = self._master[node_id]
+                attrs = {k: v for k, v in attrs.items()
+                    if k not in base or base[k] != v}
+            rows.append((graph_id, i, node_id, json.dumps(attrs)))
+        self._con.executemany("INSERT INTO graph_nodes VALUES (?, ?, ?, ?)",
+            rows)
+
+        self._con.executemany("INSERT INTO edges VALUES (?, ?, ?, ?, ?)",
+            [(graph_id, i, e.get_source(), e.get_destination(),
+            json.dumps(e.get_attributes()))
+            for i, e in enumerate(G.get_edges())])
+
+    def close(self):
+        """Commit all graphs and close the store."""
+        self._con.commit()
+        self._con.close()
+
+def _connect(path):
+    uri = "file:{0}?mode=ro".format(pathname2url(os.path.abspath(path)))
+    return closing(sqlite3.connect(uri, uri=True))
+
+def list_folders(graphs_dir):
+    """Return the folders of all graphs in a store."""
+    with _connect(os.path.join(graphs_dir, GRAPH_STORE_FILE)) as con:
+        return [r[0] for r in con.execute("SELECT DISTINCT folder FROM graphs")]
+
+def list_graphs(graphs_dir, folder):
+    """Return the graph names within a folder of a store."""
+    with _connect(os.path.join(graphs_dir, GRAPH_STORE_FILE)) as con:
+        return [r[0] for r in con.execute(
+            "SELECT DISTINCT name FROM graphs WHERE folder = ?", (folder,))]
+
+def _graph(con, graph_id):
+    """Rebuild a graph and its notes from the store."""
+    graph_type, attrs, notes = con.execute("SELECT graph_type, attrs, notes "
+        "FROM graphs WHERE graph_id = ?", (graph_id,)).fetchone()
+    G = pydot.Dot(graph_type=graph_type)
+    for k, v in json.loads(attrs).items():
+        G.set(k, v)
+
+    for node_id, base, attrs in con.execute(
+        "SELECT gn.node_id, n.attrs, gn.attrs FROM graph_nodes gn "
+        "LEFT JOIN nodes n ON n.node_id = gn.node_id "
+        "WHERE gn.graph_id = ? ORDER BY gn.seq", (graph_id,)):
+        attrs = {**json.loads(base or "{}"), **json.loads(attrs)}
+        G.add_node(pydot.Node(node_id, **attrs))
+
+    for parent, child, attrs in con.execute(
+        "SELECT parent, child, attrs FROM edges "
+        "WHERE graph_id = ? ORDER BY seq", (graph_id,)):
+        G.add_edge(pydot.Edge(parent, child, **json.loads(attrs)))
+    return G, json.loads(notes)
+
+def _dot_text(G, notes):
+    """Return the DOT source of a graph preceded by `//` comment lines."""
+    return "".join(f"// {note}\n" for note in notes) + G.to_string()
+
+def _last_graph_id(con, folder, name):
+    """Return the ID of the last graph with a folder and name (or None)."""
+    return con.execute("SELECT MAX(graph_id) FROM graphs "
+        "WHERE folder = ? AND name = ?", (folder, name)).fetchone()[0]
+
+def read_sidecar(graphs_dir, folder, name):
+    """Return the sidecar info of a graph in a store (None if missing)."""
+    with _connect(os.path.join(graphs_dir, GRAPH_STORE_FILE)) as con:
+        graph_id = _last_graph_id(con, folder, name)
+        if graph_id is None:
+            return None
+        return json.loads(con.execute("SELECT sidecar FROM graphs "
+            "WHERE graph_id = ?", (graph_id,)).fetchone()[0])
+
+def read_dot_source(graphs_dir, folder, name):
+    """
+    Generate the DOT source of a graph in a store.
+
+    If several graphs share the same folder and name, the last one is used
+    (as its file would overwrite the others in the classic layout).
+
+    Args:
+        graphs_dir (str): Graphs folder containing the store.
+        folder (str): Folder of the graph.
+        name (str): Name of the graph.
+
+    Returns:
+        str: DOT source including the notes as comments, or None if the
+        graph does not exist.
+    """
+    with _connect(os.path.join(graphs_dir, GRAPH_STORE_FILE)) as con:
+        graph_id = _last_graph_id(con, folder, name)
+        if graph_id is None:
+            return None
+        return _dot_text(*_graph(con, graph_id))
+
+def export_graphs(graphs_dir, png=False, progress=None):
+    """
+    Export the classic per-file layout (.dot, .json and .svg files, and 
+    optionally .png files, per folder) from a store.
+
+    Args:
+        graphs_dir (str): Graphs folder containing the store, to which the
+            files are written.
+        png (bool, optional): Whether to generate PNG images as well.
+            Defaults to False.
+        progress (callable, optional): Called with the fraction (0-1) of
+            exported graphs after each graph. Defaults to None.
+
+    Returns:
+        dict: Mapping of main node ID -> graph info with the render status
+        ("status") and the paths of the written files ("files").
+    """
+    res = {}
+    with _connect(os.path.join(graphs_dir, GRAPH_STORE_FILE)) as con:
+        rows = con.execute("SELECT graph_id, folder, name, main_node, sidecar "
+            "FROM graphs ORDER BY graph_id").fetchall()
+        for i, (graph_id, folder, name, main_node, sidecar) in enumerate(rows):
+            G, notes = _graph(con, graph_id)
+            dout = os.path.join(graphs_dir, folder)
+            os.makedirs(dout, exist_ok=True)
+            outFile = os.path.join(dout, f"{name}.svg")
+            status = renderGraph(G, outFile, "svg")
+            lstFiles = [outFile]
+            outFile = os.path.join(dout, f"{name}.dot")
+            writeDotFile(G, outFile, notes)
+            lstFiles.append(outFile)
+            outFile = os.path.join(dout, f"{name}.json")
+            with open(outFile, "w", encoding="utf-8") as f:
+                f.write(sidecar)
+            lstFiles.append(outFile)
+            if png and status != "placeholder":
+                outFile = os.path.join(dout, f"{name}.png")
+                if renderGraph(G, outFile, "png",
+                    fallback=(status == "fallback")) != "placeholder":
+                    lstFiles.append(outFile)
+            res[main_node] = {"status": status, "files": lstFiles}
+            if progress: progress((i + 1) / len(rows))
+    return res
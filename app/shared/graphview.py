@@ -0,0 +1,169 @@
+"""
+graphview.py
+
+This module keeps a parsed view of the graph shown in the Dash app, so
+that path highlighting does not need to parse the DOT source on every
+click.
+
+A `GraphView` holds the adjacency of the nodes, taken from the graph's
+sidecar info (see `graphSidecar`), so paths are found with a breadth-first
+search in memory without parsing the DOT source. The DOT source is only
+scanned (once) for the position of the attribute list of every node and
+edge statement when a path is highlighted, after which the highlighted
+source is produced in a single pass over the text. Graphs without sidecar
+info take the adjacency from the same scan. Views are cached per DOT
+source (least recently used first out).
+"""
+import re
+import hashlib
+import threading
+from collections import OrderedDict, deque
+
+GRAPH_VIEW_CACHE_SIZE = 32 # number of graphs kept in memory
+
+# node ("a" [...];) or edge ("a" -> "b" [...];) statement
+STATEMENT_PATTERN = re.compile(
+    r'^\s*"([^"]+)"(?:\s*->\s*"([^"]+)")?\s*\[(.*?)\]\s*;',
+    re.MULTILINE | re.DOTALL)
+PENWIDTH_PATTERN = re.compile(r'\bpenwidth\s*=\s*[0-9]+(?:\.[0-9]+)?')
+
+class GraphView:
+    """
+    Adjacency and (lazily indexed) node/edge statements of a DOT source.
+
+    Args:
+        dot_text (str): DOT source of the graph.
+        adjacency (dict, optional): Parent ID -> child IDs (the sidecar
+            "adjacency"). Defaults to None (taken from the DOT source).
+    """
+    def __init__(self, dot_text, adjacency=None):
+        self.dot_text = dot_text
+        self._spans = None # ("node", id) or ("edge", src, dst) -> attr span
+        if adjacency is None:
+            self._spans, adjacency = scan_statements(dot_text)
+        self.children = adjacency
+        self.parents = {}
+        for src, lst in adjacency.items():
+            for dst in lst:
+                self.parents.setdefault(dst, []).append(src)
+
+    @property
+    def spans(self):
+        """Attribute list span per node/edge statement (scanned once)."""
+        if self._spans is None:
+            self._spans = scan_statements(self.dot_text)[0]
+        return self._spans
+
+    def _bfs(self, adjacency, source, target):
+        """Return a shortest path from source to target (None if none)."""
+        prev = {source: None}
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            if node == target:
+                path = []
+                while node is not None:
+                    path.append(node)
+                    node = prev[node]
+                return path[::-1]
+            for x in adjacency.get(node, []):
+                if x not in prev:
+                    prev[x] = node
+                    queue.append(x)
+        return None
+
+    def find_path(self, main, selected):
+        """
+        Find the shortest dependency path between the main and a selected
+        node.
+
+        Args:
+            main (str): Main node ID.
+            selected (str): Selected node ID.
+
+        Returns:
+            tuple: Path as a list of node IDs from parent to child and its
+            direction relative to the main node ("Downstream", "Upstream"
+            or None if the nodes are not connected, with path [selected]).
+        """
+        path = self._bfs(self.children, main, selected)
+        if path:
+            return path, "Downstream"
+        path = self._bfs(self.parents, main, selected)
+        if path:
+            return path[::-1], "Upstream"
+        return [selected], None
+
+    def highlight(self, path, node_penwidth, edge_penwidth):
+        """
+        Return the DOT source with the nodes and edges of a path widened.
+
+        Args:
+            path (list): Node IDs of the path.
+            node_penwidth (int): Pen width of the path nodes.
+            edge_penwidth (int): Pen width of the path edges.
+
+        Returns:
+            str: Updated DOT source.
+        """
+        targets = {("node", x): node_penwidth for x in path}
+        for src, dst in zip(path, path[1:]):
+            targets[("edge", src, dst)] = edge_penwidth
+        spans = sorted((self.spans[k], w) for k, w in targets.items()
+            if k in self.spans)
+
+        pieces, pos = [], 0
+        text = self.dot_text
+        for (start, end), width in spans:
+            pieces.append(text[pos:start])
+            pieces.append(set_penwidth(text[start:end], width))
+            pos = end
+        pieces.append(text[pos:])
+        return "".join(pieces)
+
+def scan_statements(dot_text):
+    """
+    Index the node and edge statements of a DOT source.
+
+    Args:
+        dot_text (str): DOT source of the graph.
+
+    Returns:
+        tuple: Span of the attribute list per statement (key ("node", id)
+        or ("edge", src, dst)) and the adjacency (parent ID -> child IDs).
+    """
+    spans, adjacency = {}, {}
+    for m in STATEMENT_PATTERN.finditer(dot_text):
+        src, dst = m.group(1), m.group(2)
+        key = ("node", src) if dst is None else ("edge", src, dst)
+        spans.setdefault(key, m.span(3))
+        if dst is not None:
+            adjacency.setdefault(src, []).append(dst)
+    return spans, adjacency
+
+def set_penwidth(attrs, width):
+    """Set or add the penwidth in a DOT attribute list."""
+    if PENWIDTH_PATTERN.search(attrs):
+        return PENWIDTH_PATTERN.sub(f"penwidth={width}", attrs, count=1)
+    attrs = attrs.strip()
+    if attrs and not attrs.endswith(","):
+        attrs += ", "
+    return attrs + f"penwidth={width}"
+
+_views = OrderedDict()
+_views_lock = threading.Lock()
+
+def get_graph_view(dot_text, adjacency=None):
+    """Return the (cached) view of a DOT source (see `GraphView`)."""
+    key = hashlib.sha1(dot_text.encode("utf-8")).hexdigest()
+    with _views_lock:
+        if key in _views:
+            _views.move_to_end(key)
+            return _views[key]
+
+    view = GraphView(dot_text, adjacency)
+    with _views_lock:
+        _views[key] = view
+        while len(_views) > GRAPH_VIEW_CACHE_SIZE:
+            _views.popitem(last=False)
+    return view
@@ -0,0 +1,441 @@
+"""
+jobs.py
+
+This module runs workbook processing jobs in worker processes, so that the
+web server process never runs the heavy (GIL-bound) work itself and jobs
+can actually be cancelled.
+
+Every job runs in its own process (started with the "spawn" method). Jobs
+are admitted by a scheduler: at most JOB_MAX_WORKERS jobs run at the same
+time and at most one per owner (user session), waiting jobs are admitted
+round-robin across owners, and admission is held back while the projected
+memory of the running jobs and the next job (estimated from the workbook
+size, see `estimate_job_memory`) exceeds JOB_MEMORY_BUDGET or the available
+memory. The queue position of waiting jobs is stored in their progress
+entry ("queue_position", 0 once running). The waiting and running jobs are
+kept in the job state backend, so that with a shared backend these limits
+hold across all web processes (e.g. gunicorn workers).
+
+Job processes use the job state backend of the web process (see
+`shared.jobstate`). With a shared backend, a job process writes its
+progress entry (see `prepare_progress_entry`) directly; otherwise it sends
+snapshots of it through a queue. Results are sent through the queue, from
+which a relay thread in the web process calls the job's completion
+callback. Cancelling a job sets its cancel flag in the job state (so that
+any web process can cancel it) and its stop event (cooperative
+cancellation), and terminates the job process together with its child
+processes (such as Graphviz) if it has not stopped after JOB_CANCEL_GRACE
+seconds.
+"""
+import os
+import time
+import queue
+import zipfile
+import threading
+import multiprocessing as mp
+from collections import OrderedDict
+import psutil
+from shared.common import progress_data
+from shared.jobstate import make_backend
+
+JOB_MAX_WORKERS = max(1, (os.cpu_count() or 2) // 2) # concurrent job processes
+JOB_CANCEL_GRACE = 2 # seconds before a cancelled job process is terminated
+JOB_PROGRESS_INTERVAL = 0.25 # seconds between progress snapshots of a job
+JOB_MEMORY_BUDGET = 2 * 1024**3 # bytes of projected memory of running jobs
+JOB_MEMORY_BASE = 160 * 1024**2 # bytes of a job process before processing
+JOB_MEMORY_FACTOR = 25 # bytes of job memory per byte of workbook XML
+
+def estimate_job_memory(filepath):
+    """
+    Estimate the peak memory of processing a workbook in a job process.
+
+    The estimate grows linearly with the size of the workbook XML (the
+    uncompressed .twb file within a .twbx file).
+
+    Args:
+        filepath (str): Path to the TWB/TWBX file.
+
+    Returns:
+        int: Estimated memory in bytes.
+    """
+    size = os.path.getsize(filepath)
+    if zipfile.is_zipfile(filepath):
+        with zipfile.ZipFile(filepath) as z:
+            size = sum(x.file_size for x in z.infolist()
+                if x.filename.lower().endswith(".twb"))
+    return JOB_MEMORY_BASE + JOB_MEMORY_FACTOR * size
+
+class _StopSignal:
+    """Stop event of a job process that also checks the job's cancel flag."""
+    def __init__(self, event, job_id):
+        self._event = event
+        self._job_id = job_id
+
+    def is_set(self):
+        return self._event.is_set() or progress_data.cancel_requested(self._job_id)
+
+def _run_job(job_id, target, kwargs, stop_event, q, state_spec):
+    """
+    Run a job in a worker process and send its progress and result.
+
+    Args:
+        job_id (str): Job identifier.
+        target (callable): Module-level job function (e.g. `process_twb`),
+            returning an error message or None on success.
+        kwargs (dict): Keyword arguments of the job function.
+        stop_event (multiprocessing.Event): Cooperative cancellation signal,
+            passed to the job function as `stop_event`.
+        q (multiprocessing.Queue): Queue to the web process.
+        state_spec (tuple): Job state backend of the web process (see 
+            `make_backend`).
+    """
+    progress_data.use(make_backend(state_spec))
+    user_id = kwargs.get("user_id")
+    done = threading.Event()
+
+    def snapshot():
+        entry = progress_data.get(user_id) if user_id is not None \
+            else progress_data
+        return dict(entry or {})
+
+    def send_progress():
+        last = None
+        # progress is written directly to a shared backend
+        while not progress_data.backend.shared and \
+            not done.wait(JOB_PROGRESS_INTERVAL):
+            data = snapshot()
+            if data != last:
+                q.put((job_id, "progress", data))
+                last = data
+
+    sender = threading.Thread(target=send_progress, daemon=True)
+    sender.start()
+    try:
+        result = target(stop_event=_StopSignal(stop_event, job_id), **kwargs)
+    except Exception as e:
+        result = f"{type(e).__name__}: {e}"
+    finally:
+        done.set()
+        sender.join()
+    if not progress_data.backend.shared:
+        q.put((job_id, "progress", snapshot()))
+    q.put((job_id, "done", result))
+
+def kill_process_tree(pid, timeout=3):
+    """Terminate a process and all of its child processes (killed after timeout)."""
+    try:
+        parent = psutil.Process(pid)
+    except psutil.NoSuchProcess:
+        return
+    procs = parent.children(recursive=True) + [parent]
+    for p in procs:
+        try:
+            p.terminate()
+        except psutil.NoSuchProcess:
+            pass
+    _, alive = psutil.wait_procs(procs, timeout=timeout)
+    for p in alive:
+        try:
+            p.kill()
+        except psutil.NoSuchProcess:
+            pass
+
+def _host_id():
+    """Return an identifier of the current process (PID and start time)."""
+    return f"{os.getpid()}:{psutil.Process().create_time()}"
+
+def _host_alive(host):
+    """Return True if the process of a host identifier is still running."""
+    pid, created = host.split(":")
+    try:
+        return psutil.Process(int(pid)).create_time() == float(created)
+    except (psutil.Error, ValueError):
+        return False
+
+class JobExecutor:
+    """
+    Scheduler and bounded pool of job processes with progress relayed to
+    the web process.
+
+    The waiting and running jobs are kept in the job table of the job state
+    backend, so that with a shared backend the limits, the round-robin 
+    order and the single running job per owner apply to the jobs of all 
+    web processes. Each web process starts its own jobs once they are the
+    next to be admitted.
+
+    Args:
+        max_workers (int, optional): Maximum number of concurrently running
+            job processes. Defaults to JOB_MAX_WORKERS.
+        memory_budget (int, optional): Maximum projected memory in bytes of
+            the running jobs. Defaults to JOB_MEMORY_BUDGET.
+    """
+    def __init__(self, max_workers=JOB_MAX_WORKERS, 
+                 memory_budget=JOB_MEMORY_BUDGET):
+        self.max_workers = max_workers
+        self.memory_budget = memory_budget
+        self._ctx = mp.get_context("spawn")
+        self._host = _host_id()
+        self._jobs = {} # jobs submitted by this process
+        self._lock = threading.Lock()
+        self._queue = None # created on first submit (not in job processes)
+
+    def submit(self, job_id, target, kwargs, progress, on_done=None, 
+               owner=None, memory=0):
+        """
+        Submit a job, which starts once the scheduler admits it.
+
+        Args:
+            job_id (str): Job identifier (e.g. the session ID), unique among
+                active jobs.
+            target (callable): Module-level job function accepting a
+                `stop_event` argument and returning an error message (None
+                on success), e.g. `process_twb`.
+            kwargs (dict): Keyword arguments of the job function.
+            progress (dict): Progress entry of the job in `progress_data`, 
+                updated with the progress entry of the job process.
+            on_done (callable, optional): Called in the web process with the
+                job result once the job has ended ("Cancelled" if cancelled,
+                an error message if the job process failed). Defaults to None.
+            owner (str, optional): Owner of the job (e.g. the session ID), 
+                of which at most one job runs at a time. Defaults to the 
+                job ID.
+            memory (int, optional): Estimated peak memory of the job in
+                bytes (see `estimate_job_memory`). Defaults to 0.
+
+        Raises:
+            ValueError: If a job with the same ID is still active (in any
+                web process).
+        """
+        backend = progress_data.backend
+        with self._lock, backend.transaction():
+            self._remove_stale()
+            if any(x["job_id"] == job_id for x in backend.jobs()):
+                raise ValueError(f"Job {job_id} is still active")
+            if self._queue is None:
+                self._queue = self._ctx.Queue()
+                threading.Thread(target=self._relay, daemon=True).start()
+            progress_data.clear_cancel(job_id)
+            owner = job_id if owner is None else owner
+            self._jobs[job_id] = {"target": target, "kwargs": kwargs,
+                "progress": progress, "on_done": on_done, "process": None,
+                "stop_event": self._ctx.Event(), "cancelled": False,
+                "owner": owner}
+            backend.add_job(job_id, owner, memory, self._host)
+            self._start_pending()
+            self._publish_positions()
+
+    def is_active(self, job_id):
+        """Return True if a job is waiting or running (in any web process)."""
+        return any(x["job_id"] == job_id for x in progress_data.backend.jobs())
+
+    def queue_position(self, job_id):
+        """
+        Return the position of a job in the queue.
+
+        Returns:
+            int: 0 if the job is running, its 1-based position in the 
+            (round-robin) admission order if waiting, or None if the job is 
+            not active.
+        """
+        backend = progress_data.backend
+        with backend.transaction():
+            jobs = backend.jobs()
+            job = next((x for x in jobs if x["job_id"] == job_id), None)
+            if job is None:
+                return None
+            if job["running"]:
+                return 0
+            order = self._admission_order(jobs, backend.served())
+            return [x["job_id"] for x in order].index(job_id) + 1
+
+    def cancel(self, job_id):
+        """
+        Cancel a job: a waiting job is removed, a running job is asked to
+        stop and terminated (with its child processes) after JOB_CANCEL_GRACE
+        seconds. The completion callback receives "Cancelled".
+
+        The cancel flag of the job is set in the job state, so that a job
+        submitted by another web process is cancelled by that process.
+
+        Returns:
+            bool: True if the job was active in this process.
+        """
+        progress_data.request_cancel(job_id)
+        backend = progress_data.backend
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            job["cancelled"] = True
+            job["stop_event"].set()
+            proc = job["process"]
+            if proc is None:
+                del self._jobs[job_id]
+                with backend.transaction():
+                    self._remove_job(job_id, job["owner"])
+                    self._publish_positions()
+        if proc is None:
+            self._finish(job, "Cancelled")
+        else:
+            timer = threading.Timer(JOB_CANCEL_GRACE,
+                lambda: proc.is_alive() and kill_process_tree(proc.pid))
+            timer.daemon = True
+            timer.start()
+        return True
+
+    @staticmethod
+    def _admission_order(jobs, served):
+        """
+        Return the waiting jobs in round-robin order: the jobs of the owners
+        admitted least recently first, owners with a running job last.
+        """
+        busy = {x["owner"] for x in jobs if x["running"]}
+        pending = OrderedDict()
+        for x in jobs:
+            if not x["running"]:
+                pending.setdefault(x["owner"], []).append(x)
+        owners = sorted(pending, key=lambda k: (k in busy, served.get(k, -1)))
+        queues = [pending[k] for k in owners]
+        return [q[i] for i in range(max(map(len, queues), default=0))
+            for q in queues if i < len(q)]
+
+    def _remove_job(self, job_id, owner):
+        """Remove a job from the job table (in a transaction)."""
+        backend = progress_data.backend
+        backend.remove_job(job_id)
+        if not any(x["owner"] == owner for x in backend.jobs()):
+            backend.remove_served(owner)
+
+    def _remove_stale(self):
+        """Remove the jobs of web processes that no longer run (in a 
+        transaction)."""
+        hosts = {x["host"] for x in progress_data.backend.jobs()}
+        for host in hosts - {self._host}:
+            if not _host_alive(host):
+                for x in progress_data.backend.jobs():
+                    if x["host"] == host:
+                        self._remove_job(x["job_id"], x["owner"])
+
+    def _start_pending(self):
+        """
+        Admit waiting jobs while the limits allow it (lock held, in a 
+        transaction). Admission stops at a job of another web process,
+        which starts it itself.
+        """
+        backend = progress_data.backend
+        while True:
+            jobs = backend.jobs()
+            running = [x for x in jobs if x["running"]]
+            if len(running) >= self.max_workers:
+                return
+            busy = {x["owner"] for x in running}
+            served = backend.served()
+            job = next((x for x in self._admission_order(jobs, served)
+                if x["owner"] not in busy), None)
+            if job is None:
+                return
+
+            # hold back admission while the projected memory is too high
+            # (a single job is always admitted to avoid blocking forever)
+            if running:
+                projected = sum(x["memory"] for x in running) + job["memory"]
+                if projected > self.memory_budget or \
+                    job["memory"] > psutil.virtual_memory().available:
+                    return
+            if job["host"] != self._host:
+                return
+
+            job_id = job["job_id"]
+            backend.start_job(job_id)
+            backend.set_served(job["owner"], 
+                max(served.values(), default=-1) + 1)
+            job = self._jobs[job_id]
+            job["process"] = self._ctx.Process(target=_run_job,
+                args=(job_id, job["target"], job["kwargs"], job["stop_event"],
+                self._queue, backend.spec()), daemon=True)
+            job["process"].start()
+            job["progress"]["queue_position"] = 0
+
+    def _publish_positions(self):
+        """Store the queue position of the waiting jobs of this process 
+        (lock held, in a transaction)."""
+        backend = progress_data.backend
+        order = self._admission_order(backend.jobs(), backend.served())
+        for i, x in enumerate(order):
+            if x["job_id"] in self._jobs:
+                self._jobs[x["job_id"]]["progress"]["queue_position"] = i + 1
+
+    def _relay(self):
+        """Apply the messages of job processes and detect exited processes."""
+        last_reap = time.monotonic()
+        while True:
+            try:
+                self._handle(*self._queue.get(timeout=1))
+            except queue.Empty:
+                pass
+            if time.monotonic() - last_reap >= 1:
+                self._reap()
+                last_reap = time.monotonic()
+
+    def _handle(self, job_id, kind, data):
+        """Apply a progress snapshot or result message of a job."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return
+        if kind == "progress":
+            job["progress"].update(data)
+        else:
+            self._end(job_id, "Cancelled" if job["cancelled"] else data)
+
+    def _reap(self):
+        """End the jobs whose process exited without sending a result."""
+        with self._lock:
+            exited = [k for k, x in self._jobs.items()
+                if x["process"] and not x["process"].is_alive()]
+        # re-check admission (available memory, jobs of other web processes)
+        with self._lock:
+            if self._jobs:
+                with progress_data.backend.transaction():
+                    self._remove_stale()
+                    self._start_pending()
+                    self._publish_positions()
+            local = [k for k, x in self._jobs.items() if not x["cancelled"]]
+        # cancel flags set by other web processes
+        for job_id in local:
+            if progress_data.cancel_requested(job_id):
+                self.cancel(job_id)
+        # results are sent before a job process exits
+        while True:
+            try:
+                self._handle(*self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for job_id in exited:
+            with self._lock:
+                job = self._jobs.get(job_id)
+            if job is not None:
+                self._end(job_id, "Cancelled" if job["cancelled"] else
+                    f"Worker process exited with code {job['process'].exitcode}")
+
+    def _end(self, job_id, result):
+        """Remove an ended job, start waiting jobs and call its callback."""
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+            if job is None:
+                return
+            job["process"].join(timeout=JOB_CANCEL_GRACE)
+            with progress_data.backend.transaction():
+                self._remove_job(job_id, job["owner"])
+                self._start_pending()
+                self._publish_positions()
+        self._finish(job, result)
+
+    def _finish(self, job, result):
+        if job["on_done"]:
+            try:
+                job["on_done"](result)
+            except Exception as e:
+                print(f"Job completion callback failed: {e}")
+
+job_executor = JobExecutor()
@@ -0,0 +1,415 @@
+"""
+jobstate.py
+
+This module provides the job state shared by the web processes and job
+processes: the progress entries (`progress_data`), including job status and
+output paths, the cancel flags of jobs, and the job table of the scheduler
+(waiting and running jobs of all web processes, see `shared.jobs`).
+
+`progress_data` is a dict-like view on a pluggable backend. Entries that
+are dicts are returned as write-through proxies, so that code can keep
+updating them in place (e.g. `progress_data[user_id]["progress"] = 50`)
+while every write goes to the backend. Two backends are available:
+
+- `MemoryJobState` (default): state within the current process, e.g. for
+  the CLI. Job processes relay their progress to the web process.
+- `SQLiteJobState`: state in a SQLite file in WAL mode, shared by all
+  processes on the machine, so that any gunicorn worker can serve the
+  progress of a job started by another worker, and job processes write
+  their progress directly.
+
+Use `progress_data.use(backend)` to select the backend of a process.
+`progress_data.events(key)` streams the changes of a progress entry as
+server-sent events (see the /progress/stream routes of the web apps).
+"""
+import os
+import copy
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from collections.abc import Mapping, MutableMapping
+
+JOB_STATE_MAX_AGE = 24 * 3600 # seconds after which unchanged entries are removed
+PROGRESS_EVENT_FIELDS = ["progress", "current_task", "status", "queue_position",
+    "filename", "metrics"] # fields sent as progress events
+PROGRESS_EVENT_INTERVAL = 0.25 # seconds between checks for progress changes
+PROGRESS_EVENT_HEARTBEAT = 15 # seconds between keep-alive comments
+PROGRESS_EVENT_TIMEOUT = 3600 # seconds after which a progress stream ends
+FINAL_STATUSES = ["finished", "cancelled", "exited"]
+
+class MemoryJobState:
+    """Job state within the memory of the current process."""
+    shared = False
+
+    def __init__(self):
+        self._values = {}
+        self._cancel = set()
+        self._jobs = OrderedDict()
+        self._served = {}
+        self._lock = threading.RLock()
+
+    def spec(self):
+        """Return the arguments to recreate the backend in another process."""
+        return ("memory",)
+
+    def get(self, key):
+        """Return the value of a key (None if missing)."""
+        with self._lock:
+            return copy.deepcopy(self._values.get(key))
+
+    def set(self, key, value):
+        """Set the value of a key."""
+        with self._lock:
+            self._values[key] = copy.deepcopy(value)
+
+    def update(self, key, fields):
+        """Update the fields of a dict value (created if missing)."""
+        with self._lock:
+            self._values.setdefault(key, {}).update(copy.deepcopy(fields))
+
+    def delete(self, key):
+        """Remove a key."""
+        with self._lock:
+            self._values.pop(key, None)
+
+    def keys(self):
+        """Return all keys."""
+        with self._lock:
+            return list(self._values)
+
+    def request_cancel(self, job_id):
+        """Set the cancel flag of a job."""
+        with self._lock:
+            self._cancel.add(job_id)
+
+    def clear_cancel(self, job_id):
+        """Clear the cancel flag of a job."""
+        with self._lock:
+            self._cancel.discard(job_id)
+
+    def cancel_requested(self, job_id):
+        """Return True if the cancel flag of a job is set."""
+        with self._lock:
+            return job_id in self._cancel
+
+    @contextmanager
+    def transaction(self):
+        """Make the job table operations within the block atomic."""
+        with self._lock:
+            yield
+
+    def jobs(self):
+        """Return the waiting and running jobs in submission order."""
+        with self._lock:
+            return [dict(x) for x in self._jobs.values()]
+
+    def add_job(self, job_id, owner, memory, host):
+        """Add a waiting job of a web process (host)."""
+        with self._lock:
+            self._jobs[job_id] = {"job_id": job_id, "owner": owner,
+                "memory": memory, "host": host, "running": False}
+
+    def start_job(self, job_id):
+        """Mark a job as running."""
+        with self._lock:
+            self._jobs[job_id]["running"] = True
+
+    def remove_job(self, job_id):
+        """Remove a job."""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def served(self):
+        """Return the admission number of the last admitted job per owner."""
+        with self._lock:
+            return dict(self._served)
+
+    def set_served(self, owner, n):
+        """Set the admission number of the last admitted job of an owner."""
+        with self._lock:
+            self._served[owner] = n
+
+    def remove_served(self, owner):
+        """Forget the admissions of an owner."""
+        with self._lock:
+            self._served.pop(owner, None)
+
+class SQLiteJobState:
+    """
+    Job state in a SQLite file (WAL mode) shared by processes.
+
+    Entries that have not changed for JOB_STATE_MAX_AGE seconds are removed
+    when the backend is opened.
+
+    Args:
+        path (str): Path of the SQLite file (created if missing).
+    """
+    shared = True
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        con = self._con()
+        con.execute("CREATE TABLE IF NOT EXISTS job_state (key TEXT PRIMARY KEY, "
+            "value TEXT, updated REAL)")
+        con.execute("CREATE TABLE IF NOT EXISTS job_cancel (job_id TEXT PRIMARY KEY)")
+        con.execute("CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, "
+            "owner TEXT, memory INTEGER, host TEXT, running INTEGER)")
+        con.execute("CREATE TABLE IF NOT EXISTS job_owners (owner TEXT PRIMARY KEY, "
+            "served INTEGER)")
+        con.execute("DELETE FROM job_state WHERE updated < ?",
+            (time.time() - JOB_STATE_MAX_AGE,))
+
+    def spec(self):
+        """Return the arguments to recreate the backend in another process."""
+        return ("sqlite", self.path)
+
+    def _con(self):
+        """Return the connection of the current thread."""
+        con = getattr(self._local, "con", None)
+        if con is None:
+            # autocommit mode, transactions are opened explicitly
+            con = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def get(self, key):
+        """Return the value of a key (None if missing)."""
+        row = self._con().execute("SELECT value FROM job_state WHERE key = ?",
+            (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value):
+        """Set the value of a key."""
+        self._con().execute("INSERT OR REPLACE INTO job_state VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time()))
+
+    def update(self, key, fields):
+        """Update the fields of a dict value (created if missing)."""
+        with self.transaction():
+            con = self._con()
+            row = con.execute("SELECT value FROM job_state WHERE key = ?",
+                (key,)).fetchone()
+            value = json.loads(row[0]) if row else {}
+            value.update(fields)
+            con.execute("INSERT OR REPLACE INTO job_state VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time()))
+
+    def delete(self, key):
+        """Remove a key."""
+        self._con().execute("DELETE FROM job_state WHERE key = ?", (key,))
+
+    def keys(self):
+        """Return all keys."""
+        return [r[0] for r in self._con().execute("SELECT key FROM job_state")]
+
+    def request_cancel(self, job_id):
+        """Set the cancel flag of a job."""
+        self._con().execute("INSERT OR IGNORE INTO job_cancel VALUES (?)",
+            (job_id,))
+
+    def clear_cancel(self, job_id):
+        """Clear the cancel flag of a job."""
+        self._con().execute("DELETE FROM job_cancel WHERE job_id = ?", (job_id,))
+
+    def cancel_requested(self, job_id):
+        """Return True if the cancel flag of a job is set."""
+        return self._con().execute("SELECT 1 FROM job_cancel WHERE job_id = ?",
+            (job_id,)).fetchone() is not None
+
+    @contextmanager
+    def transaction(self):
+        """
+        Make the operations of the current thread within the block atomic
+        (a write transaction, which serializes the processes). Nested blocks
+        join the outer transaction.
+        """
+        con = self._con()
+        if con.in_transaction:
+            yield
+            return
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        con.execute("COMMIT")
+
+    def jobs(self):
+        """Return the waiting and running jobs in submission order."""
+        rows = self._con().execute("SELECT job_id, owner, memory, host, "
+            "running FROM jobs ORDER BY rowid").fetchall()
+        return [{"job_id": r[0], "owner": r[1], "memory": r[2], "host": r[3],
+            "running": bool(r[4])} for r in rows]
+
+    def add_job(self, job_id, owner, memory, host):
+        """Add a waiting job of a web process (host)."""
+        self._con().execute("INSERT INTO jobs VALUES (?, ?, ?, ?, 0)",
+            (job_id, owner, memory, host))
+
+    def start_job(self, job_id):
+        """Mark a job as running."""
+        self._con().execute("UPDATE jobs SET running = 1 WHERE job_id = ?",
+            (job_id,))
+
+    def remove_job(self, job_id):
+        """Remove a job."""
+        self._con().execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def served(self):
+        """Return the admission number of the last admitted job per owner."""
+        return dict(self._con().execute("SELECT owner, served FROM job_owners"))
+
+    def set_served(self, owner, n):
+        """Set the admission number of the last admitted job of an owner."""
+        self._con().execute("INSERT OR REPLACE INTO job_owners VALUES (?, ?)",
+            (owner, n))
+
+    def remove_served(self, owner):
+        """Forget the admissions of an owner."""
+        self._con().execute("DELETE FROM job_owners WHERE owner = ?", (owner,))
+
+def make_backend(spec):
+    """Create a backend from the arguments returned by its `spec` method."""
+    if spec[0] == "sqlite":
+        return SQLiteJobState(*spec[1:])
+    return MemoryJobState()
+
+class ProgressEntry(MutableMapping):
+    """
+    Write-through proxy of a progress entry (a dict value) in a backend.
+
+    Reads return the current state of the entry, writes update the backend
+    (values equal to the stored value are not written again).
+
+    Args:
+        backend: Job state backend.
+        key (str): Key of the entry.
+    """
+    def __init__(self, backend, key):
+        self._backend = backend
+        self._key = key
+
+    def _data(self):
+        return self._backend.get(self._key) or {}
+
+    def __getitem__(self, k):
+        return self._data()[k]
+
+    def __setitem__(self, k, v):
+        # compare with the stored entry, which other processes may change
+        data = self._data()
+        if k in data and data[k] == v:
+            return
+        self._backend.update(self._key, {k: v})
+
+    def __delitem__(self, k):
+        data = self._data()
+        del data[k]
+        self._backend.set(self._key, data)
+
+    def __iter__(self):
+        return iter(self._data())
+
+    def __len__(self):
+        return len(self._data())
+
+    def update(self, *args, **kwargs):
+        """Update several fields in a single write."""
+        fields = dict(*args, **kwargs)
+        self._backend.update(self._key, fields)
+
+class ProgressData(MutableMapping):
+    """
+    Dict-like view on the progress entries in a job state backend.
+
+    Dict values are returned as write-through `ProgressEntry` proxies.
+
+    Args:
+        backend (optional): Job state backend. Defaults to a new
+            `MemoryJobState`.
+    """
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryJobState()
+
+    def use(self, backend):
+        """Select the backend (e.g. a `SQLiteJobState` in web apps)."""
+        self.backend = backend
+
+    def __getitem__(self, key):
+        value = self.backend.get(key)
+        if value is None:
+            raise KeyError(key)
+        return ProgressEntry(self.backend, key) \
+            if isinstance(value, dict) else value
+
+    def __setitem__(self, key, value):
+        self.backend.set(key, dict(value)
+            if isinstance(value, Mapping) else value)
+
+    def __delitem__(self, key):
+        self.backend.delete(key)
+
+    def __iter__(self):
+        return iter(self.backend.keys())
+
+    def __len__(self):
+        return len(self.backend.keys())
+
+    def request_cancel(self, job_id):
+        """Set the cancel flag of a job (see `shared.jobs`)."""
+        self.backend.request_cancel(job_id)
+
+    def clear_cancel(self, job_id):
+        """Clear the cancel flag of a job."""
+        self.backend.clear_cancel(job_id)
+
+    def cancel_requested(self, job_id):
+        """Return True if the cancel flag of a job is set."""
+        return self.backend.cancel_requested(job_id)
+
+    def events(self, key=None, fields=PROGRESS_EVENT_FIELDS):
+        """
+        Yield server-sent events with the fields of a progress entry, only
+        when they change.
+
+        The stream ends after an event with a final status (FINAL_STATUSES),
+        or for entries without a status once the progress reaches 100, and
+        at the latest after PROGRESS_EVENT_TIMEOUT seconds.
+
+        Args:
+            key (str, optional): Key of the progress entry (e.g. the session
+                ID). Defaults to None (fields at the top level, as used by 
+                the Flask app and CLI).
+            fields (list, optional): Fields to send. Defaults to
+                PROGRESS_EVENT_FIELDS.
+
+        Yields:
+            str: "data: <JSON>" events and keep-alive comments.
+        """
+        start = last_sent = time.monotonic()
+        last = None
+        while time.monotonic() - start < PROGRESS_EVENT_TIMEOUT:
+            if key is None:
+                entry = {k: self.backend.get(k) for k in fields + ["status"]}
+            else:
+                entry = self.backend.get(key) or {}
+            data = {k: entry.get(k) for k in fields}
+            if entry and data != last:
+                yield f"data: {json.dumps(data)}\n\n"
+                last, last_sent = data, time.monotonic()
+                if entry.get("status") in FINAL_STATUSES or \
+                    (entry.get("status") is None and (data.get("progress") or 0) >= 100):
+                    return
+            elif time.monotonic() - last_sent >= PROGRESS_EVENT_HEARTBEAT:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            time.sleep(PROGRESS_EVENT_INTERVAL)
@@ -2,58 +2,143 @@
 logging.py
 
 This module sets up logging for different environments based on whether
-the application is executed as a standalone program or as a Flask app. 
+the application is executed as a standalone program or as a Flask app.
+
+Logging is scoped per job: `setup_logging` returns a `JobLog`, which is the
+active log of the current context (thread or task) until it is closed.
+Records sent to `logger` are passed without blocking to the queue of the
+active job log, from which a background listener writes them to the job's
+own log file, and `stepLog` counts steps per job log. Concurrent jobs
+therefore neither write into each other's log file nor close each other's
+handlers.
 """
 import os
 import sys
+import queue
 import logging
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
 
 logger = logging.getLogger("TWE_LOGGER")
 
+# job log of the current context (see JobLog)
+_current_log = contextvars.ContextVar("job_log", default=None)
+
+class _JobQueueHandler(QueueHandler):
+    """Queue handler passing records to the active job log of the context."""
+    def __init__(self):
+        super().__init__(None)
+
+    def enqueue(self, record):
+        job_log = _current_log.get()
+        if job_log is not None:
+            job_log.put(record)
+        elif record.levelno >= logging.WARNING:
+            # no job log: report problems like an unconfigured logger would
+            logging.lastResort.handle(record)
+
+# Prevent the logger from propagating log messages to the root logger
+logger.propagate = False
+logger.setLevel(logging.DEBUG)
+logger.addHandler(_JobQueueHandler())
+
+class JobLog:
+    """
+    Log and step counter of a single job (or CLI run).
+
+    Creating a job log makes it the active log of the current context.
+    Records are written by a `QueueListener` thread (file logging) or
+    directly (console logging, to keep the order with console prompts).
+
+    Args:
+        is_executable (bool): True to log to the console, False to log to
+            a file.
+        out_folder (str, optional): The directory where the log file is
+            saved. If not provided, the log is saved in a 'temp' directory
+            adjacent to this module.
+    """
+    def __init__(self, is_executable, out_folder=None):
+        if is_executable:
+            # Log to console
+            self.handler = logging.StreamHandler(sys.stdout)
+        else:
+            # Log to file
+            log_directory = out_folder or os.path.join(os.path.dirname(__file__), 'temp')
+            log_file = os.path.join(log_directory, 'log_file.log')
+            os.makedirs(log_directory, exist_ok=True)
+            self.handler = logging.FileHandler(log_file)
+
+        # Set the formatter
+        formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+        self.handler.setFormatter(formatter)
+
+        self.counter = 1
+        self.queue = None
+        self.listener = None
+        if not is_executable:
+            self.queue = queue.SimpleQueue()
+            self.listener = QueueListener(self.queue, self.handler)
+            self.listener.start()
+        self._token = _current_log.set(self)
+
+    def put(self, record):
+        """Pass a log record to the job's handler (without blocking)."""
+        if self.listener:
+            self.queue.put_nowait(record)
+        else:
+            self.handler.handle(record)
+
+    def step(self, message):
+        """Log a message with the job's incremental step counter."""
+        logger.info(f" STEP {self.counter}: {message}...")
+        self.counter += 1
+        return message
+
+    def close(self):
+        """Write the remaining records, close the handler and deactivate."""
+        if self._token is not None:
+            try:
+                _current_log.reset(self._token)
+            except ValueError: # closed in another context
+                pass
+            self._token = None
+        if self.listener:
+            self.listener.stop()
+            self.listener = None
+        self.handler.close()
+
 def setup_logging(is_executable, out_folder=None):
     """
     Set up conditional logging based on type
 
     Args:
         is_executable: True if Flask app is run, False otherwise
-        uploadfolder (str): The directory where log files should be saved. 
-                    If not provided, logs will be saved in a 'temp' 
+        uploadfolder (str): The directory where log files should be saved.
+                    If not provided, logs will be saved in a 'temp'
                     directory adjacent to this module.
+
+    Returns:
+        JobLog: Job log, active in the current context until it is closed.
     """
-    # Prevent the logger from propagating log messages to the root logger
-    logger.propagate = False
-
-    # Create a custom logger
-    logger.setLevel(logging.DEBUG)
-
-    # Check if logging should go to console or file
-    if is_executable:
-        # Log to console
-        handler = logging.StreamHandler(sys.stdout)
-    else:
-        # Log to file
-        log_directory = out_folder or os.path.join(os.path.dirname(__file__), 'temp')
-        log_file = os.path.join(log_directory, 'log_file.log')
-        os.makedirs(log_directory, exist_ok=True)
-        handler = logging.FileHandler(log_file)
-
-    # Set the formatter
-    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-    handler.setFormatter(formatter)
-
-    # Add the handler to the logger
-    logger.addHandler(handler)
+    return JobLog(is_executable, out_folder)
 
 def stepLog(message):
     """
     Log a message that includes an incremental step counter in a main script
 
+    The step counter of the active job log is used (see `JobLog`), or a
+    global counter if no job log is active.
+
     Parameters:
         message: message text to
 
     Returns:
         Log message containing incremental step count
     """
+    job_log = _current_log.get()
+    if job_log is not None:
+        return job_log.step(message)
+
     # Initialize the counter if it hasn't been set yet
     if not hasattr(stepLog, 'counter'):
         stepLog.counter = 1
@@ -66,4 +151,4 @@ def stepLog(message):
     stepLog.counter += 1
 
     # Return message (for Dash app)
-    return message
\ No newline at end of file
+    return message
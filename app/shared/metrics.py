@@ -0,0 +1,188 @@
+"""
+metrics.py
+
+This module measures the stages of a processing job (see `process_twb`), so
+that slow jobs can be traced to a stage, e.g. field extraction, calculation
+cleanup, dependency closure, the Excel export or the Graphviz rendering.
+
+For every stage, the wall time, the CPU time (including finished child
+processes such as Graphviz) and the peak resident memory (RSS) of the job
+process and its child processes are recorded, the latter sampled in a
+background thread with psutil. Counts and sizes of the tables and graphs
+created are added by the job. The metrics are published in the job's
+progress entry (field "metrics") at every stage, shown as a stage breakdown
+in the Dash app, and written to METRICS_FILE in the output folder. If a
+trace is active (see `shared.tracing`), the stages are recorded as spans
+and the memory samples as a counter in the trace.
+"""
+import os
+import json
+import time
+import threading
+import psutil
+from shared.tracing import current_trace
+
+METRICS_FILE = "metrics.json"
+METRICS_SAMPLE_INTERVAL = 0.1 # seconds between memory samples
+
+def _cpu_time():
+    """Return the CPU time of the process and its finished child processes."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+class JobMetrics:
+    """
+    Timing, memory and size metrics of a job, recorded per stage.
+
+    Args:
+        pdict (dict, optional): Progress entry of the job, in which the
+            metrics are published (field "metrics"). Defaults to None.
+    """
+    def __init__(self, pdict=None):
+        self.stages = []
+        self.counts = {}
+        self._pdict = pdict
+        self._trace = current_trace()
+        self._current = None
+        self._process = psutil.Process()
+        self._start = (time.perf_counter(), _cpu_time())
+        self._peak = self._peak_stage = self._rss()
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True,
+            name="metrics-sampler")
+        self._sampler.start()
+
+    def _rss(self):
+        """Return the RSS in bytes of the process and its child processes."""
+        try:
+            rss = self._process.memory_info().rss
+            for child in self._process.children(recursive=True):
+                try:
+                    rss += child.memory_info().rss
+                except psutil.Error: # child finished in the meantime
+                    pass
+            return rss
+        except psutil.Error:
+            return 0
+
+    def _sample(self):
+        while not self._done.wait(METRICS_SAMPLE_INTERVAL):
+            rss = self._rss()
+            self._record(rss)
+            if self._trace:
+                self._trace.counter("Memory", rss_mb=round(rss / 1024**2, 1))
+
+    def _record(self, rss):
+        with self._lock:
+            self._peak = max(self._peak, rss)
+            self._peak_stage = max(self._peak_stage, rss)
+
+    def _end_stage(self):
+        if self._current is None:
+            return
+        self._record(self._rss())
+        name, wall, cpu, _ = self._current
+        with self._lock:
+            peak = self._peak_stage
+        end = time.perf_counter()
+        self.stages.append({"stage": name,
+            "wall_time": round(end - wall, 3),
+            "cpu_time": round(_cpu_time() - cpu, 3),
+            "peak_rss_mb": round(peak / 1024**2, 1)})
+        self._current = None
+        if self._trace:
+            self._trace.add(name, "stage", wall, end, **self.stages[-1])
+
+    def stage(self, name):
+        """
+        End the current stage and start a new one.
+
+        Args:
+            name (str): Name of the stage.
+
+        Returns:
+            str: Name of the stage (e.g. for `stepLog`).
+        """
+        self._end_stage()
+        rss = self._rss()
+        with self._lock:
+            self._peak_stage = rss
+        self._current = (name, time.perf_counter(), _cpu_time(), time.time())
+        self.publish()
+        return name
+
+    def add_counts(self, **counts):
+        """Add counts or sizes (e.g. number of fields) to the metrics."""
+        self.counts.update(counts)
+
+    def add_graphs(self, graphs):
+        """
+        Add the counts and file sizes of the graphs created.
+
+        Args:
+            graphs (dict): Graph info per graph (render status, edge counts,
+                render time and files, see `visualizeFieldDependencies`).
+        """
+        statuses = {}
+        sizes = {}
+        for info in graphs.values():
+            status = info.get("status") or "none"
+            statuses[status] = statuses.get(status, 0) + 1
+            for f in info.get("files", []):
+                ext = os.path.splitext(f)[1].lstrip(".")
+                if os.path.isfile(f):
+                    sizes[ext] = sizes.get(ext, 0) + os.path.getsize(f)
+        self.add_counts(
+            graphs=len(graphs),
+            graph_status=statuses,
+            graph_edges=sum(x.get("n_edges", 0) for x in graphs.values()),
+            graph_edges_reduced=sum(x.get("n_edges_reduced", 0)
+                for x in graphs.values()),
+            graph_render_time=round(sum(x.get("render_time", 0.0)
+                for x in graphs.values()), 3),
+            graph_file_bytes=sizes)
+
+    def summary(self):
+        """Return the metrics as a JSON-serializable dict."""
+        with self._lock:
+            peak = self._peak
+        return {
+            "stages": list(self.stages),
+            "current_stage": self._current[0] if self._current else None,
+            "current_stage_started": self._current[3] if self._current else None,
+            "wall_time": round(time.perf_counter() - self._start[0], 3),
+            "cpu_time": round(_cpu_time() - self._start[1], 3),
+            "peak_rss_mb": round(peak / 1024**2, 1),
+            "counts": dict(self.counts),
+        }
+
+    def publish(self):
+        """Write the metrics to the progress entry of the job."""
+        if self._pdict is not None:
+            self._pdict["metrics"] = self.summary()
+
+    def finish(self, out_folder=None):
+        """
+        End the current stage, stop sampling and write the metrics.
+
+        Args:
+            out_folder (str, optional): Folder to write METRICS_FILE to.
+                Defaults to None (not written).
+
+        Returns:
+            str: Path of the metrics file (None if not written or already
+            finished).
+        """
+        if self._done.is_set():
+            return None
+        self._end_stage()
+        self._done.set()
+        self._sampler.join()
+        self.publish()
+        if not out_folder or not os.path.isdir(out_folder):
+            return None
+        path = os.path.join(out_folder, METRICS_FILE)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+        return path
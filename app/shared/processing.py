@@ -20,8 +20,13 @@ import warnings
 import shutil
 from tqdm import tqdm
 from shared.logging import setup_logging, stepLog, logger
+from shared.metrics import JobMetrics
+from shared.tracing import TRACE_FILE, Trace, trace_span, trace_call
 from shared.common import *
-from shared.utils import UPLOAD_FOLDER
+from shared.artifacts import create_manifest
+from shared.database import DATABASE_FILE, write_database
+from shared.graphstore import GRAPH_STORE_FILE, GraphStore, export_graphs
+from shared.utils import CALCULATIONS_FILE, UPLOAD_FOLDER
 from contextlib import contextmanager
 from tableaudocumentapi import Workbook
 
@@ -47,7 +52,8 @@ def suppress_stdout():
 
 
 def process_twb(filepath, output_folder=None, is_executable=True, fPNG=True, 
-                stop_event=None, user_id=None):
+                stop_event=None, user_id=None, fZip=True, deferred=False,
+                fGraphStore=False, fTooltips=True, fTrace=False):
     """
     Process a Tableau Workbook (TWB/TWBX) file to extract and analyze data sources,
     fields, and their dependencies.
@@ -69,10 +75,37 @@ def process_twb(filepath, output_folder=None, is_executable=True, fPNG=True,
         user_id (str, optional): Unique session or user identifier used to isolate
             per-user processing state, progress tracking, and output paths when 
             running in a multi-user environment. Defaults to None.
+        fZip (bool, optional): Whether to write a zip file of the output 
+            folder to disk when not running as an executable (the Dash app 
+            streams downloads instead). Defaults to True.
+        deferred (bool, optional): Whether to defer building the Excel file, 
+            PNG images and zip file until they are requested (see 
+            `shared.artifacts`). Only applies when not running as an 
+            executable. Defaults to False.
+        fGraphStore (bool, optional): Whether to store all graphs in a 
+            single graph store file (see `shared.graphstore`) from which 
+            the per-graph files are exported (on request if deferred). 
+            Defaults to False.
+        fTooltips (bool, optional): Whether to show field calculations as
+            node tooltips in every graph. If False, the calculations are
+            stored once per node ID in Graphs/calculations.json instead. 
+            Defaults to True.
+        fTrace (bool, optional): Whether to write a Chrome trace of the run
+            (TRACE_FILE in the output folder, see shared.tracing) with spans 
+            per stage, cleanup batch, dependency closure and graph render. 
+            Defaults to False.
 
     Returns:
         None: Generates output files and updates per-user progress tracking data.
     """
+    # Background zip archiver (web apps only) and optional graph store
+    archiver = None
+    store = None
+    # Log of this job (web apps only), stage metrics and optional trace
+    job_log = None
+    metrics = None
+    trace = None
+
     try:
         # Helper to exit early if user pressed Cancel
         def check_cancel():
@@ -90,14 +123,19 @@ def process_twb(filepath, output_folder=None, is_executable=True, fPNG=True,
         os.makedirs(outFileDirectory, exist_ok=True)
 
         # Initialize logging for app
-        if not is_executable: setup_logging(is_executable, outFileDirectory)
+        if not is_executable: job_log = setup_logging(is_executable, outFileDirectory)
+
+        # Time and measure the stages (published in the progress entry)
+        if fTrace: trace = Trace(inpFileName)
+        metrics = JobMetrics(pdict)
 
         # Ignore future warnings when reading field attributes (not applicable)
         warnings.simplefilter(action='ignore', category=FutureWarning)
 
         # Get initial data frame with nested data source and field objects
         pdict["progress"] = 3
-        pdict['task'] = stepLog("Extract data sources and fields from workbook")
+        pdict['task'] = stepLog(
+            metrics.stage("Extract data sources and fields from workbook"))
         if check_cancel(): return "Cancelled"
 
         with suppress_stdout():
@@ -126,7 +164,7 @@ def process_twb(filepath, output_folder=None, is_executable=True, fPNG=True,
             df["field_" + attr] = df.apply(lambda x: getattr(x.value, attr), axis = 1)
 
         pdict["progress"] = 6
-        pdict["current_task"] = stepLog("Processing fields")
+        pdict["current_task"] = stepLog(metrics.stage("Processing fields"))
         if check_cancel(): return "Cancelled"
 
         # Additional transformations
@@ -143,16 +181,17 @@ def process_twb(filepath, output_folder=None, is_executable=True, fPNG=True,
         df["source_field_id"] = df["data_source_name"] + "." + df["field_id"]
 
         # Process data source, field and sheet labels
-        df[["field_label_orig", "field_label"]] = df.apply(lambda x: \
-            processCaptions(x.field_id, x.field_caption), axis = 1, 
-            result_type = "expand")
-        df[["source_label_orig", "source_label"]] = df.apply(lambda x: \
-            processCaptions(x.data_source_name, x.data_source_caption), axis = 1, 
-            result_type = "expand")
-        df["source_field_label"] = df["source_label"] + "." + df["field_label"]
-        df["field_worksheets_orig"] = df["field_worksheets"]
-        df["field_worksheets"] = df["field_worksheets_orig"].apply(lambda x: \
-            processSheetNames(x))
+        with trace_span("Process labels", "cleanup"):
+            df[["field_label_orig", "field_label"]] = df.apply(lambda x: \
+                processCaptions(x.field_id, x.field_caption), axis = 1, 
+                result_type = "expand")
+            df[["source_label_orig", "source_label"]] = df.apply(lambda x: \
+                processCaptions(x.data_source_name, x.data_source_caption), axis = 1, 
+                result_type = "expand")
+            df["source_field_label"] = df["source_label"] + "." + df["field_label"]
+            df["field_worksheets_orig"] = df["field_worksheets"]
+            df["field_worksheets"] = df["field_worksheets_orig"].apply(lambda x: \
+                processSheetNames(x))
 
         # Print out unique field renamings
         df["f_field"] = df["field_label_orig"] != df["field_label"]
@@ -169,18 +208,20 @@ def process_twb(filepath, output_folder=None, is_executable=True, fPNG=True,
         for fld in fldModified: logger.info("\tRenamed source: {}".format(fld))
 
         # Remove duplicate rows based on source field ID
-        df, nDupl = removeDuplicatesByRowLength(df, "source_field_id")
-        logger.info("\t{0} duplicate fields removed".format(nDupl))
+        with trace_span("Remove duplicate fields", "cleanup"):
+            df, nDupl = removeDuplicatesByRowLength(df, "source_field_id")
+            logger.info("\t{0} duplicate fields removed".format(nDupl))
 
         # Filter out duplicate parameter rows and [:Measure Names] field
-        lstParam = list(df[df["data_source_name"] == "[Parameters]"]["field_id"])
-        df["field_is_param_duplicate"] = df.apply(lambda x: \
-            isParamDuplicate(lstParam, x.data_source_name, x.field_id), axis = 1)
-        nDupl2 = df.shape[0]
-        df = df[(df["field_is_param_duplicate"] == 0) & 
-            (df["field_id"] != "[:Measure Names]")]
-        nDupl2 -= df.shape[0]
-        logger.info("\t{0} duplicate parameters and/or measure names removed".format(nDupl2))
+        with trace_span("Remove duplicate parameters", "cleanup"):
+            lstParam = list(df[df["data_source_name"] == "[Parameters]"]["field_id"])
+            df["field_is_param_duplicate"] = df.apply(lambda x: \
+                isParamDuplicate(lstParam, x.data_source_name, x.field_id), axis = 1)
+            nDupl2 = df.shape[0]
+            df = df[(df["field_is_param_duplicate"] == 0) & 
+                (df["field_id"] != "[:Measure Names]")]
+            nDupl2 -= df.shape[0]
+            logger.info("\t{0} duplicate parameters and/or measure names removed".format(nDupl2))
 
         # Add a randomly generated ID field for each unique field
         baseID = getRandomReplacementBaseID(df, "field_calculation")
@@ -191,39 +232,46 @@ def process_twb(filepath, output_folder=None, is_executable=True, fPNG=True,
             fieldMappingTable(df, "source_field_id", "source_field_repl_id")
 
         # Clean up field calculations and aliases
-        lstFieldID = list(df["field_id"].unique())
-        df["field_calculation_cleaned"] = \
-            df.apply(lambda x: \
-            fieldCalculationMapping(x.field_calculation, x.data_source_name, 
-            dictFieldIDToID, lstFieldID), axis = 1)
+        with trace_span("Clean up calculations", "cleanup"):
+            lstFieldID = list(df["field_id"].unique())
+            df["field_calculation_cleaned"] = \
+                df.apply(lambda x: \
+                trace_call(x.source_field_id, "calculation", 
+                fieldCalculationMapping, x.field_calculation, x.data_source_name, 
+                dictFieldIDToID, lstFieldID), axis = 1)
 
         # Map standardized sheet names (including square brackets) to sheet IDs
-        df["field_worksheets"] = df["field_worksheets"].apply(
-            lambda lst: [f"[{x}]" for x in lst] \
-                if isinstance(lst, list) and lst else lst
-        )
-        dictSheetToID = sheetMappingTable(df, "field_worksheets")
-        df["field_worksheets_id"] = df["field_worksheets"].apply(lambda x: 
-            sheetMapping(x, dictSheetToID))
+        with trace_span("Map sheets", "cleanup"):
+            df["field_worksheets"] = df["field_worksheets"].apply(
+                lambda lst: [f"[{x}]" for x in lst] \
+                    if isinstance(lst, list) and lst else lst
+            )
+            dictSheetToID = sheetMappingTable(df, "field_worksheets")
+            df["field_worksheets_id"] = df["field_worksheets"].apply(lambda x: 
+                sheetMapping(x, dictSheetToID))
 
         # Get list of field dependencies
-        lstSourceFields = list(df["source_field_repl_id"].unique())
-        df["field_calculation_dependencies"] = \
-            df["field_calculation_cleaned"].apply(lambda x: \
-                fieldCalculationDependencies(lstSourceFields, x))
+        with trace_span("Parse calculation dependencies", "cleanup"):
+            lstSourceFields = list(df["source_field_repl_id"].unique())
+            df["field_calculation_dependencies"] = \
+                df["field_calculation_cleaned"].apply(lambda x: \
+                    fieldCalculationDependencies(lstSourceFields, x))
 
         # Calculate type of field
-        df["field_category"] = df.apply(lambda x: \
-            fieldCategory(x.source_field_label, x.field_calculation_cleaned), axis = 1)
+        with trace_span("Categorize fields", "cleanup"):
+            df["field_category"] = df.apply(lambda x: \
+                fieldCategory(x.source_field_label, x.field_calculation_cleaned), axis = 1)
 
         pdict["progress"] = 9
-        pdict["current_task"] = stepLog("Processing dependencies")
+        pdict["current_task"] = stepLog(metrics.stage("Processing dependencies"))
         if check_cancel(): return "Cancelled"
 
         # Get full list of backward dependencies
+        dictIDToField = dict(zip(df.source_field_repl_id, df.source_field_label))
         shared_cache = {}
         df["field_backward_dependencies"] = df["source_field_repl_id"].apply(
-            lambda x: backwardDependencies(df, x, _cache=shared_cache)
+            lambda x: trace_call(dictIDToField[x], "closure (backward)", 
+                backwardDependencies, df, x, _cache=shared_cache)
         )
 
         # Get full list of forward dependencies using exploded version of df (faster)
@@ -234,7 +282,8 @@ def process_twb(filepath, output_folder=None, is_executable=True, fPNG=True,
         shared_cache = {}
         df["field_forward_dependencies"] = \
             df.apply(lambda x: \
-                forwardDependencies(dfExplode, x.source_field_repl_id, 
+                trace_call(x.source_field_label, "closure (forward)", 
+                forwardDependencies, dfExplode, x.source_field_repl_id, 
                 x.field_worksheets_id, _cache=shared_cache), axis = 1)
 
         # Only keep unique dependencies with their max level
@@ -270,7 +319,7 @@ def process_twb(filepath, output_folder=None, is_executable=True, fPNG=True,
             nodes = df.apply(lambda x: \
                 addFieldNode(x.source_field_repl_id, x.source_field_label, 
                     x.field_category, shapes, fillcolors, colors, 
-                    x.field_calculation_cleaned), 
+                    x.field_calculation_cleaned if fTooltips else ""), 
                     axis = 1)
             lstNodes = []
             for node in nodes: lstNodes += node
@@ -324,9 +373,19 @@ def process_twb(filepath, output_folder=None, is_executable=True, fPNG=True,
         df2["dependency_level"] = df2["dependency_level"].astype(int)
 
         pdict["progress"] = 12
-        pdict["current_task"] = stepLog("Saving table results")
+        pdict["current_task"] = stepLog(metrics.stage("Saving table results"))
         if check_cancel(): return "Cancelled"
 
+        # Zip the output files while they are written (per-user for Dash, 
+        # shared for Flask)
+        zip_filename = sanitize_filename(inpFileName) + ' Files.zip'
+        zip_base = outFileDirectory if user_id else UPLOAD_FOLDER
+        zip_path = os.path.join(zip_base, zip_filename)
+        deferred = deferred and not is_executable
+        if not is_executable and fZip and not deferred:
+            archiver = ZipArchiver(folder_path=outFileDirectory, 
+                output_zip_path=zip_path)
+
         outSheetDirectory = os.path.join(outFileDirectory, 'Fields')
         outFilePath = os.path.join(outSheetDirectory, inpFileName + '.xlsx')       
 
@@ -359,16 +418,18 @@ def process_twb(filepath, output_folder=None, is_executable=True, fPNG=True,
         if not os.path.isdir(outFileDirectory):
             os.makedirs(outFileDirectory)
 
-        with pd.ExcelWriter(outFilePath) as writer:
-            df.to_excel(writer, sheet_name = "fields", index = False)
-            df2.to_excel(writer, sheet_name = "dependencies", index = False)
-
-        outParquetPath = os.path.join(outSheetDirectory, 'fields.parquet')
+        if not deferred:
+            metrics.stage("Excel export")
+            tExcel = time.perf_counter()
+            writeExcel({"fields": df, "dependencies": df2}, outFilePath)
+            logger.info("\tExcel export took {0:.1f}s".format(
+                time.perf_counter() - tExcel))
+            if archiver: archiver.add(outFilePath)
+            metrics.stage("Saving Parquet files")
 
-        df.to_parquet(outParquetPath, engine="pyarrow", index=False)
         outParquetPath = os.path.join(outSheetDirectory, 'dependencies.parquet')
 
-        df2.to_parquet(outParquetPath, engine="pyarrow", index=False)
+        writeParquet(df2, outParquetPath)
 
         # Get list of unique sheets
         lstSheets = list(df2_original[df2_original.dependency_category == "Sheet"]
@@ -380,6 +441,12 @@ def process_twb(filepath, output_folder=None, is_executable=True, fPNG=True,
         nTot = nField + nSheet
         # counter within graph creation
         current_progress = 0
+        # graph info (render status, edge counts, render time) per graph
+        dictGraphs = {}
+        outGraphDirectory = os.path.join(outFileDirectory, 'Graphs')
+        if fGraphStore and nTot:
+            store = GraphStore(os.path.join(outGraphDirectory, GRAPH_STORE_FILE), 
+                gMaster)
 
         # progress bar bounds
         start_progress = 15
@@ -391,7 +458,10 @@ def process_twb(filepath, output_folder=None, is_executable=True, fPNG=True,
 
             pdict["progress"] = start_progress
             pdict["current_task"] = \
-                stepLog(f"Creating field dependency graphs per source")
+                stepLog(metrics.stage("Creating field dependency graphs per source"))
+
+            # Index the edges per source field once
+            dictFieldEdges = fieldEdgeIndex(df2_original)
 
             # Use tqdm for progress bar if executable, else simple progress
             iterator = tqdm(df_original.iterrows(), total=nField) if is_executable else df_original.iterrows()
@@ -399,8 +469,15 @@ def process_twb(filepath, output_folder=None, is_executable=True, fPNG=True,
             # Create dependency graphs per field
             for _, row in iterator:
                 if check_cancel(): return "Cancelled"
-                visualizeFieldDependencies(df_original, row.source_field_repl_id, 
-                    row.source_field_label, gMaster, outPath, fPNG)
+                with trace_span(row.source_field_label, "graph") as span:
+                    info = visualizeFieldDependencies(dictFieldEdges, 
+                        row.source_field_repl_id, row.source_field_label, 
+                        gMaster, outPath, fPNG and not deferred, store=store)
+                    span.update(status=info["status"], 
+                        n_edges=info["n_edges_reduced"])
+                dictGraphs[row.source_field_repl_id] = info
+                if archiver:
+                    for f in info["files"]: archiver.add(f)
 
                 if not is_executable:
                     current_progress += 1
@@ -410,10 +487,14 @@ def process_twb(filepath, output_folder=None, is_executable=True, fPNG=True,
         if fDepSheets:
             # Create output folder if it doesn't exist yet
             outPath = os.path.join(outFileDirectory, 'Graphs', 'Sheets')
-            if not os.path.isdir(outPath): os.makedirs(outPath)
+            if not store and not os.path.isdir(outPath): os.makedirs(outPath)
 
             pdict["current-task"] = \
-                stepLog(f"Creating sheet dependency graphs")
+                stepLog(metrics.stage("Creating sheet dependency graphs"))
+
+            # Group the edges per sheet once
+            dictSheetEdges = sheetEdgeTable(df2_original)
+            dictIDToSheet = {v: k for k, v in dictSheetToID.items()}
 
             # Use tqdm for progress bar if executable, else simple progress
             iterator = tqdm(lstSheets, total=nSheet) if is_executable else lstSheets
@@ -421,39 +502,154 @@ def process_twb(filepath, output_folder=None, is_executable=True, fPNG=True,
             # Create dependency graphs per sheet
             for sh in iterator:
                 if check_cancel(): return "Cancelled"
-                visualizeSheetDependencies(df2_original, sh, gMaster, outPath, fPNG)
+                with trace_span(dictIDToSheet.get(sh, sh), "graph", id=sh) as span:
+                    info = visualizeSheetDependencies(dictSheetEdges, sh, gMaster, 
+                        outPath, fPNG and not deferred, store=store)
+                    span.update(status=info["status"], 
+                        n_edges=info["n_edges_reduced"])
+                dictGraphs[sh] = info
+                if archiver:
+                    for f in info["files"]: archiver.add(f)
                 if not is_executable:
                     current_progress += 1
                     pdict["progress"] = \
                         int(start_progress + (current_progress / nTot) * progress_range)
         
-        zip_filename = sanitize_filename(inpFileName) + ' Files.zip'
+        # Store the calculations once instead of as tooltips
+        if nTot and not fTooltips:
+            dictCalc = {k: v for k, v in zip(df_original.source_field_repl_id, 
+                df_original.field_calculation_cleaned) if v}
+            outCalcPath = os.path.join(outGraphDirectory, CALCULATIONS_FILE)
+            os.makedirs(outGraphDirectory, exist_ok=True)
+            with open(outCalcPath, "w", encoding="utf-8") as f:
+                json.dump(dictCalc, f, ensure_ascii=False)
+            if archiver: archiver.add(outCalcPath)
+
+        # Export the per-graph files from the graph store unless deferred
+        outStorePath = None
+        if store:
+            store.close()
+            outStorePath = store.path
+            store = None
+            if archiver: archiver.add(outStorePath)
+            if not deferred:
+                pdict["current_task"] = stepLog(
+                    metrics.stage("Exporting dependency graphs"))
+                dictExport = export_graphs(outGraphDirectory, fPNG)
+                for x in dictExport:
+                    dictGraphs[x].update(dictExport[x])
+                    if archiver:
+                        for f in dictExport[x]["files"]: archiver.add(f)
+
+        # Count the tables and graphs created
+        metrics.stage("Storing results")
+        metrics.add_counts(data_sources=int(df["source_label"].nunique()),
+            fields=int(df.shape[0]), dependencies=int(df2.shape[0]), 
+            sheets=len(dictSheetToID))
+        metrics.add_graphs(dictGraphs)
+
+        # Report degraded graphs and store field results including their status
+        dictRender = {x: dictGraphs[x]["status"] for x in dictGraphs}
+        lstDegraded = [x for x in dictRender 
+            if dictRender[x] not in ("ok", None)]
+        if lstDegraded:
+            dictIDToLabel = {v: k for k, v in dictLabelToID.items()}
+            logger.warning("\t{0} graphs degraded after a layout timeout: {1}"
+                .format(len(lstDegraded), ", ".join(
+                    dictIDToLabel.get(x, x) for x in lstDegraded)))
+        df["graph_render_status"] = df["source_field_repl_id"].map(dictRender)
+
+        # Report effect of the transitive reduction
+        if GRAPH_TRANSITIVE_REDUCTION and dictGraphs:
+            nEdges = sum(x["n_edges"] for x in dictGraphs.values())
+            nReduced = sum(x["n_edges_reduced"] for x in dictGraphs.values())
+            tRender = sum(x["render_time"] for x in dictGraphs.values())
+            logger.info("\tTransitive reduction removed {0} of {1} edges "
+                "({2:.1%}), total SVG render time {3:.1f}s".format(
+                nEdges - nReduced, nEdges, 
+                (nEdges - nReduced) / nEdges if nEdges else 0, tRender))
+            lstFull = [x for x in dictGraphs.values() 
+                if x["render_time_full"] is not None]
+            if lstFull:
+                tSaved = sum(x["render_time_full"] - x["render_time"] 
+                    for x in lstFull)
+                logger.info("\tRender time saved by transitive reduction: "
+                    "{0:.1f}s over {1} graphs".format(tSaved, len(lstFull)))
+        outParquetPath = os.path.join(outSheetDirectory, 'fields.parquet')
+        writeParquet(df, outParquetPath)
+
+        # Store all tables in a single indexed database
+        dfEdges = df2.assign(
+            dependency_from_id = df2_original["dependency_from"], 
+            dependency_to_id = df2_original["dependency_to"])
+        dfSheets = pd.DataFrame({"sheet_id": list(dictSheetToID.values()), 
+            "sheet_label": list(dictSheetToID.keys())})
+        nSheetFields = dfEdges[dfEdges["dependency_category"] == "Sheet"]\
+            .groupby("dependency_to_id")["dependency_from_id"].nunique()
+        dfSheets["n_fields"] = dfSheets["sheet_id"].map(nSheetFields)\
+            .fillna(0).astype(int)
+        outDatabasePath = os.path.join(outSheetDirectory, DATABASE_FILE)
+        write_database(outDatabasePath, df, dfEdges, dfSheets)
+        if archiver: archiver.add(outDatabasePath)
+
+        # List the artifacts to build on request
+        if deferred:
+            lstPNG = None
+            if fPNG:
+                lstPNG = [(f, x["status"]) for x in dictGraphs.values() 
+                    for f in x["files"] 
+                    if f.endswith(".dot") and x["status"] != "placeholder"]
+            create_manifest(outFileDirectory, outFilePath, zip_path, lstPNG,
+                outStorePath)
+
         # Set the filename for download once processing is complete
         pdict['foldername'] = outFileDirectory
         pdict['filename'] = zip_filename
         pdict['progress'] = 90
 
         if is_executable: 
+            metrics.finish(outFileDirectory)
+            if trace:
+                trace.close(os.path.join(outFileDirectory, TRACE_FILE))
+                trace = None
             input("Done! Press Enter to exit...")
+            stepLog(f"Processing finished succesfully!")
         else:
-            # Zip the output files (per-user for Dash, shared for Flask)
-            zip_base = outFileDirectory if user_id else UPLOAD_FOLDER
-            zip_path = os.path.join(zip_base, zip_filename)
-            zip_folder(folder_path=outFileDirectory, output_zip_path=zip_path)
-
-            # Clean up and close the logger
-            for handler in logger.handlers[:]:
-                handler.close()
-                logger.removeHandler(handler)
+            # Add the remaining output files and finalize the zip file
+            if archiver:
+                metrics.stage("Finalizing zip file")
+                archiver.close()
+                archiver = None
+
+            # Write the stage metrics (see shared.metrics) and trace
+            metrics.finish(outFileDirectory)
+            if trace:
+                trace.close(os.path.join(outFileDirectory, TRACE_FILE))
+                trace = None
+
+            # Log the final step, then write the remaining records and
+            # close the job log
+            stepLog(f"Processing finished succesfully!")
+            if job_log:
+                job_log.close()
+                job_log = None
 
             # Ensure progress is 100%
             pdict['progress'] = 100
 
         # Return success indicator
-        stepLog(f"Processing finished succesfully!")
         return None
     
     except Exception as e:
         logger.exception("An error occurred during workbook processing")
         error_msg = f"{type(e).__name__}: {e}"
         return error_msg
+
+    finally:
+        # Discard incomplete zip file after cancellation or errors
+        if archiver: archiver.abort()
+        if store: store.close()
+        # Stage metrics up to the cancellation or error
+        if metrics: metrics.finish(outFileDirectory)
+        if trace: trace.close(os.path.join(outFileDirectory, TRACE_FILE))
+        if job_log: job_log.close()
@@ -0,0 +1,96 @@
+"""
+sessionstore.py
+
+This module keeps large per-session payloads of the Dash app (such as the
+DOT source and node attributes of the selected graph) on the server, so
+that the browser only needs to hold a small handle to them.
+
+Entries are stored per session ID and evicted in least recently used
+order once a session holds more than SESSION_MAX_ENTRIES entries, or once
+the estimated size of the entries of all sessions exceeds
+SESSION_STORE_BUDGET. The store lives in the memory of the server
+process, so callers should be able to rebuild an entry when its handle is
+not found (e.g. after a restart, an eviction or on another worker
+process).
+"""
+import sys
+import uuid
+import threading
+from collections import OrderedDict
+
+SESSION_MAX_ENTRIES = 4 # entries kept per session
+SESSION_STORE_BUDGET = 128 * 1024**2 # bytes of entries kept in total
+
+def payload_size(data):
+    """Return the estimated size in bytes of a payload (nested dicts,
+    lists and strings)."""
+    size = sys.getsizeof(data)
+    if isinstance(data, dict):
+        size += sum(payload_size(k) + payload_size(v)
+            for k, v in data.items())
+    elif isinstance(data, (list, tuple)):
+        size += sum(payload_size(x) for x in data)
+    return size
+
+class SessionStore:
+    """
+    Server-side store of payloads per session.
+
+    Args:
+        max_entries (int, optional): Maximum number of entries per session.
+            Defaults to SESSION_MAX_ENTRIES.
+        budget (int, optional): Maximum estimated number of bytes of the
+            entries of all sessions. Defaults to SESSION_STORE_BUDGET.
+    """
+    def __init__(self, max_entries=SESSION_MAX_ENTRIES,
+                 budget=SESSION_STORE_BUDGET):
+        self.max_entries = max_entries
+        self.budget = budget
+        self.nbytes = 0
+        # (session ID, handle) -> (payload, size) in least recently used order
+        self._entries = OrderedDict()
+        # session ID -> handles in least recently used order
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _remove(self, session_id, handle):
+        _, size = self._entries.pop((session_id, handle))
+        self.nbytes -= size
+        handles = self._sessions[session_id]
+        del handles[handle]
+        if not handles:
+            del self._sessions[session_id]
+
+    def put(self, session_id, data):
+        """Store a payload for a session and return its handle."""
+        handle = uuid.uuid4().hex
+        size = payload_size(data)
+        with self._lock:
+            self._entries[(session_id, handle)] = (data, size)
+            self.nbytes += size
+            handles = self._sessions.setdefault(session_id, OrderedDict())
+            handles[handle] = None
+            while len(handles) > self.max_entries:
+                self._remove(session_id, next(iter(handles)))
+            # evict the least recently used entries of any session
+            while len(self._entries) > 1 and self.nbytes > self.budget:
+                self._remove(*next(iter(self._entries)))
+        return handle
+
+    def get(self, session_id, handle):
+        """Return the payload of a handle (None if not found)."""
+        with self._lock:
+            key = (session_id, handle)
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            self._sessions[session_id].move_to_end(handle)
+            return self._entries[key][0]
+
+    def clear(self, session_id):
+        """Remove all payloads of a session."""
+        with self._lock:
+            for handle in list(self._sessions.get(session_id, ())):
+                self._remove(session_id, handle)
+
+session_store = SessionStore()
@@ -0,0 +1,163 @@
+"""
+tracing.py
+
+This module records a timeline of a processing run as a Chrome trace
+(Trace Event JSON, loadable in Perfetto or about:tracing), to find the
+stragglers within a job, e.g. the few graphs that take most of the render
+time of a workbook.
+
+Tracing is scoped like the job logs (see `shared.logging`): creating a
+`Trace` makes it the active trace of the current context until it is
+closed. Code records spans with `trace_span` or `trace_call`, which do
+nothing when no trace is active, so the instrumented code paths cost a
+context variable lookup per span when tracing is off. Each span carries
+the process and thread that ran it, so that work of background threads
+(e.g. the zip archiver) is shown in lanes of its own.
+"""
+import os
+import json
+import time
+import threading
+import contextvars
+
+TRACE_FILE = "trace.json"
+
+# trace of the current context (see Trace)
+_current_trace = contextvars.ContextVar("trace", default=None)
+
+class _Span:
+    """Span of a trace, recorded when the `with` block ends."""
+    def __init__(self, trace, name, cat, args):
+        self._trace = trace
+        self._name = name
+        self._cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self.args
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self._trace.add(self._name, self._cat, self._start,
+            time.perf_counter(), **self.args)
+        return False
+
+class _NullSpan:
+    """Span used when no trace is active."""
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class Trace:
+    """
+    Chrome trace of a run, the active trace of the current context until
+    it is closed.
+
+    Args:
+        name (str, optional): Name of the traced process shown in the
+            timeline (e.g. the workbook name). Defaults to None.
+    """
+    def __init__(self, name=None):
+        self.events = []
+        self._start = time.perf_counter()
+        self._pid = os.getpid()
+        self._threads = set()
+        self._lock = threading.Lock()
+        if name:
+            self.events.append({"name": "process_name", "ph": "M",
+                "pid": self._pid, "tid": 0, "args": {"name": name}})
+        self._token = _current_trace.set(self)
+
+    def _ts(self, t):
+        """Convert a `time.perf_counter` value to trace microseconds."""
+        return round((t - self._start) * 1e6, 1)
+
+    def _tid(self):
+        """Return the current thread ID, naming its lane on first use."""
+        tid = threading.get_native_id()
+        with self._lock:
+            if tid not in self._threads:
+                self._threads.add(tid)
+                self.events.append({"name": "thread_name", "ph": "M",
+                    "pid": self._pid, "tid": tid,
+                    "args": {"name": threading.current_thread().name}})
+        return tid
+
+    def add(self, name, cat, start, end, **args):
+        """
+        Record a span of the current thread.
+
+        Args:
+            name (str): Name of the span.
+            cat (str): Category (e.g. "stage", "closure" or "render").
+            start (float): Start time (`time.perf_counter`).
+            end (float): End time (`time.perf_counter`).
+            **args: Details shown with the span.
+        """
+        self.events.append({"name": name, "cat": cat, "ph": "X",
+            "ts": self._ts(start), "dur": self._ts(end) - self._ts(start),
+            "pid": self._pid, "tid": self._tid(), "args": args})
+
+    def counter(self, name, **values):
+        """Record the values of a counter (e.g. memory) at this time."""
+        self.events.append({"name": name, "ph": "C",
+            "ts": self._ts(time.perf_counter()), "pid": self._pid,
+            "tid": self._tid(), "args": values})
+
+    def close(self, path=None):
+        """
+        Deactivate the trace and write it.
+
+        Args:
+            path (str, optional): Path of the trace file. Defaults to None
+                (not written).
+
+        Returns:
+            str: Path of the trace file (None if not written).
+        """
+        if self._token is not None:
+            try:
+                _current_trace.reset(self._token)
+            except ValueError: # closed in another context
+                pass
+            self._token = None
+        if not path or not os.path.isdir(os.path.dirname(path) or "."):
+            return None
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events,
+                "displayTimeUnit": "ms"}, f)
+        return path
+
+def current_trace():
+    """Return the active trace of the current context (None if off)."""
+    return _current_trace.get()
+
+def trace_span(name, cat, **args):
+    """
+    Return a context manager recording a span in the active trace.
+
+    The context manager yields the span's details, which can be extended
+    within the `with` block (e.g. with the result of the traced work).
+
+    Args:
+        name (str): Name of the span.
+        cat (str): Category of the span.
+        **args: Details shown with the span.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _NULL_SPAN
+    return _Span(trace, name, cat, args)
+
+def trace_call(name, cat, func, *args, **kwargs):
+    """Call a function, recording the call as a span in the active trace."""
+    if _current_trace.get() is None:
+        return func(*args, **kwargs)
+    with trace_span(name, cat):
+        return func(*args, **kwargs)
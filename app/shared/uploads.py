@@ -0,0 +1,267 @@
+"""
+uploads.py
+
+This module stores workbooks uploaded in chunks (see the /upload routes of
+the Dash app), so that an upload is written straight to disk instead of
+being passed through the browser callbacks as a base64 string.
+
+An upload is created with its file name and size, after which its chunks
+are appended in order while the SHA-256 hash of the file is computed on
+the fly. An interrupted upload can be resumed from the number of bytes
+received. Completed files are stored once per content hash (the file ID)
+in the `content` folder, and linked into the uploader's folder under their
+original file name, so that duplicate uploads are detected and not stored
+twice. Uploads without activity for UPLOAD_EXPIRY seconds (e.g. abandoned
+by the browser) are removed when a new upload is created.
+
+Layout within the upload folder:
+
+- `<user_id>/partial/<upload_id>` (+ `.json`): uploads in progress
+- `content/<sha256>`: completed files, one per distinct content
+- `<user_id>/<sha256>/<file name>`: completed files of a user
+"""
+import os
+import glob
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+
+UPLOAD_CHUNK_SIZE = 8 * 1024**2 # bytes per uploaded chunk
+UPLOAD_MAX_SIZE = 1024**3 # maximum size in bytes of an uploaded workbook
+UPLOAD_EXTENSIONS = (".twb", ".twbx")
+BLOCK_SIZE = 1024**2 # bytes read at a time from a request body or file
+UPLOAD_EXPIRY = 24 * 3600 # seconds after which an inactive upload is removed
+
+# running hash per upload ID: (bytes hashed, hash object)
+_hashes = {}
+_locks = {}
+_locks_guard = threading.Lock()
+
+def _lock(upload_id):
+    with _locks_guard:
+        return _locks.setdefault(upload_id, threading.Lock())
+
+def _check_id(value):
+    """Raise a ValueError unless an ID is safe to use as a path component."""
+    if not value or not value.replace("-", "").isalnum():
+        raise ValueError(f"Invalid ID: {value}")
+
+def _partial_path(upload_dir, user_id, upload_id):
+    _check_id(user_id)
+    _check_id(upload_id)
+    return os.path.join(upload_dir, user_id, "partial", upload_id)
+
+def _read_meta(path):
+    if not os.path.isfile(path + ".json"):
+        return None
+    with open(path + ".json", encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_meta(path, meta):
+    with open(path + ".json.tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(path + ".json.tmp", path + ".json")
+
+def _status(upload_id, meta):
+    return {"upload_id": upload_id, "filename": meta["filename"],
+        "size": meta["size"], "received": meta["received"],
+        "chunk_size": UPLOAD_CHUNK_SIZE}
+
+def create_upload(upload_dir, user_id, filename, size):
+    """
+    Create a new upload.
+
+    Args:
+        upload_dir (str): Upload folder.
+        user_id (str): Session ID of the uploader.
+        filename (str): Name of the uploaded file.
+        size (int): Size of the file in bytes.
+
+    Returns:
+        dict: Upload status (upload_id, filename, size, received and
+        chunk_size).
+
+    Raises:
+        ValueError: If the file type or size is not allowed.
+    """
+    filename = os.path.basename(filename or "")
+    if not filename.lower().endswith(UPLOAD_EXTENSIONS):
+        raise ValueError(f"Unsupported file type: {filename}")
+    if not isinstance(size, int) or not 0 < size <= UPLOAD_MAX_SIZE:
+        raise ValueError(f"Unsupported file size: {size}")
+
+    expire_uploads(upload_dir)
+    upload_id = uuid.uuid4().hex
+    path = _partial_path(upload_dir, user_id, upload_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+    meta = {"filename": filename, "size": size, "received": 0,
+        "updated": time.time()}
+    _write_meta(path, meta)
+    return _status(upload_id, meta)
+
+def expire_uploads(upload_dir, max_age=None):
+    """
+    Remove the uploads of all users without activity (created or chunk
+    received) for more than max_age seconds, and the running hashes and
+    locks of uploads that no longer exist.
+
+    Args:
+        upload_dir (str): Upload folder.
+        max_age (float, optional): Maximum inactivity in seconds. Defaults
+            to None (UPLOAD_EXPIRY).
+
+    Returns:
+        int: Number of uploads removed.
+    """
+    cutoff = time.time() - (UPLOAD_EXPIRY if max_age is None else max_age)
+    removed = 0
+    for meta_path in glob.glob(os.path.join(upload_dir, "*", "partial", "*.json")):
+        path = meta_path[:-len(".json")]
+        with _lock(os.path.basename(path)):
+            try:
+                updated = _read_meta(path).get("updated",
+                    os.path.getmtime(meta_path))
+            except (OSError, ValueError, AttributeError): # removed or broken
+                updated = 0
+            if updated >= cutoff:
+                continue
+            for f in (path, meta_path):
+                if os.path.exists(f):
+                    os.remove(f)
+            removed += 1
+
+    with _locks_guard:
+        for upload_id, lock in list(_locks.items()):
+            if lock.locked() or glob.glob(os.path.join(upload_dir, "*", 
+                "partial", glob.escape(upload_id) + ".json")):
+                continue
+            del _locks[upload_id]
+            _hashes.pop(upload_id, None)
+    return removed
+
+def upload_status(upload_dir, user_id, upload_id):
+    """Return the status of an upload (None if unknown)."""
+    meta = _read_meta(_partial_path(upload_dir, user_id, upload_id))
+    return _status(upload_id, meta) if meta else None
+
+def _hasher(path, upload_id, received):
+    """
+    Return a copy of the running hash of an upload, rehashing the file if
+    needed. The cached hash is only replaced once a chunk is complete, so
+    an interrupted chunk leaves it at the bytes received before.
+    """
+    hashed, h = _hashes.get(upload_id, (None, None))
+    if hashed != received:
+        # e.g. resumed in another process: hash the bytes received so far
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+                h.update(block)
+        return h
+    return h.copy()
+
+def write_chunk(upload_dir, user_id, upload_id, offset, stream):
+    """
+    Append a chunk to an upload while hashing it.
+
+    Args:
+        upload_dir (str): Upload folder.
+        user_id (str): Session ID of the uploader.
+        upload_id (str): Upload ID.
+        offset (int): Position of the chunk in the file, which must equal
+            the number of bytes received so far.
+        stream: File-like object with the chunk data (e.g. a request body).
+
+    Returns:
+        tuple: (accepted, status) where accepted is False if the offset
+        does not match (the status tells where to resume), and status is
+        the upload status (None if the upload is unknown).
+
+    Raises:
+        ValueError: If the chunk exceeds the chunk size or the file size.
+    """
+    path = _partial_path(upload_dir, user_id, upload_id)
+    with _lock(upload_id):
+        meta = _read_meta(path)
+        if meta is None:
+            return False, None
+        if offset != meta["received"]:
+            return False, _status(upload_id, meta)
+
+        h = _hasher(path, upload_id, meta["received"])
+        limit = min(UPLOAD_CHUNK_SIZE, meta["size"] - offset)
+        n = 0
+        with open(path, "r+b") as f:
+            f.seek(offset)
+            f.truncate() # drop the rest of an interrupted chunk
+            while True:
+                block = stream.read(BLOCK_SIZE)
+                if not block:
+                    break
+                n += len(block)
+                if n > limit:
+                    f.truncate(offset)
+                    raise ValueError("Chunk exceeds the chunk or file size")
+                f.write(block)
+                h.update(block)
+
+        meta["received"] = offset + n
+        meta["updated"] = time.time()
+        _write_meta(path, meta)
+        _hashes[upload_id] = (meta["received"], h)
+        return True, _status(upload_id, meta)
+
+def complete_upload(upload_dir, user_id, upload_id):
+    """
+    Store a fully received upload under its content hash.
+
+    Args:
+        upload_dir (str): Upload folder.
+        user_id (str): Session ID of the uploader.
+        upload_id (str): Upload ID.
+
+    Returns:
+        dict: File ID (SHA-256 hash), file name and whether the content had
+        already been uploaded ("duplicate"), or None if the upload is
+        unknown or incomplete.
+    """
+    path = _partial_path(upload_dir, user_id, upload_id)
+    with _lock(upload_id):
+        meta = _read_meta(path)
+        if meta is None or meta["received"] != meta["size"]:
+            return None
+        file_id = _hasher(path, upload_id, meta["received"]).hexdigest()
+
+        content_path = os.path.join(upload_dir, "content", file_id)
+        os.makedirs(os.path.dirname(content_path), exist_ok=True)
+        duplicate = os.path.exists(content_path)
+        if duplicate:
+            os.remove(path)
+        else:
+            os.replace(path, content_path)
+        os.remove(path + ".json")
+        _hashes.pop(upload_id, None)
+    with _locks_guard:
+        _locks.pop(upload_id, None)
+
+    # link the content into the user's folder under the original name
+    user_path = os.path.join(upload_dir, user_id, file_id, meta["filename"])
+    if not os.path.exists(user_path):
+        os.makedirs(os.path.dirname(user_path), exist_ok=True)
+        try:
+            os.link(content_path, user_path)
+        except OSError: # e.g. no hard links on this file system
+            shutil.copyfile(content_path, user_path)
+    return {"file_id": file_id, "filename": meta["filename"],
+        "duplicate": duplicate}
+
+def uploaded_file(upload_dir, user_id, file_id, filename):
+    """Return the path of a completed upload of a user (None if missing)."""
+    _check_id(user_id)
+    _check_id(file_id)
+    path = os.path.join(upload_dir, user_id, file_id, os.path.basename(filename))
+    return path if os.path.isfile(path) else None
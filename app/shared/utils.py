@@ -1,6 +1,7 @@
 # import fixes
 import os
 import re
+import json
 from pathlib import Path
 
 STATIC_FOLDER = os.path.join('web', 'static')
@@ -20,6 +21,14 @@ DEBUG_MODE = False
 SELECTED_NODE_PENWIDTH = 6
 SELECTED_EDGE_PENWIDTH = 6
 MESSAGE_NO_DATA = "(no data available)"
+WRITE_ZIP_FILE = False # also write zip file to disk (downloads are streamed)
+DOWNLOAD_TYPES = ["svg", "png", "dot", "json", "xlsx", "sqlite"] # file type filters for downloads
+DEFERRED_ARTIFACTS = True # build xlsx, png and zip files only when downloaded
+GRAPH_STORE = True # store graphs in a single file, DOT generated on demand
+INLINE_TOOLTIPS = False # calculations as graph tooltips (else stored once)
+TRACE_JOBS = False # write a Chrome trace (trace.json) of every processing run
+CALCULATIONS_FILE = "calculations.json" # calculations per node ID (in Graphs)
+JOB_STATE_FILE = os.path.join('web', 'jobstate.sqlite') # job state shared by web processes (None: in memory)
 
 def get_app_version():
     """Return the app version from VERSION file"""
@@ -56,6 +65,14 @@ def read_dot_file(base_dir, subfolder, filename):
     with open(path, "r", encoding="utf-8") as f:
         return f.read()
     
+def read_calculations(base_dir):
+    """Return the calculation per node ID stored in a graphs folder (if any)."""
+    path = os.path.join(base_dir, CALCULATIONS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
 def sanitize_filename(filename: str) -> str:
     """Remove potentially unsafe characters like '#' from filenames."""
     # Replace unsafe characters with underscores
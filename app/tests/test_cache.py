@@ -0,0 +1,91 @@
+"""Tests of the result table cache in shared.cache."""
+import os
+import json
+from shared.common import pd
+from shared.cache import CachedTables, StoredTables, TableCache, \
+    TABLE_COLUMNS
+from shared.database import DATABASE_FILE, write_database
+from shared.utils import CALCULATIONS_FILE
+
+def write_tables(folder, database=True):
+    """Write small field and dependency tables to a folder."""
+    df_fields = pd.DataFrame({
+        "source_field_repl_id": ["f1", "f2", "f3"],
+        "source_label": ["Orders", "Orders", "Parameters"],
+        "field_category": ["Field", "Calculated Field", "Parameter"],
+        "field_datatype": ["string", "real", "integer"],
+        "field_role": ["dimension", "measure", "measure"],
+        "n_worksheet_dependencies": [1, 0, 0],
+        "field_calculation": [None, "[Region] + 1", None],
+    })
+    df_edges = pd.DataFrame({
+        "source_field_repl_id": ["f2", "f2", "f1"],
+        "dependency_from": ["Sales", "Sales", "Region"],
+        "dependency_to": ["Region", "Sheet 1", "Sheet 1"],
+        "dependency_from_id": ["f2", "f2", "f1"],
+        "dependency_to_id": ["f1", "s1", "s1"],
+        "dependency_level": [-1, 1, 1],
+        "dependency_category": ["Field", "Sheet", "Sheet"],
+    })
+    df_fields.to_parquet(os.path.join(folder, "fields.parquet"), index=False)
+    df_edges.to_parquet(os.path.join(folder, "dependencies.parquet"),
+        index=False)
+    if database:
+        write_database(os.path.join(folder, DATABASE_FILE), df_fields,
+            df_edges, pd.DataFrame({"sheet_id": ["s1"]}))
+
+def lookups(tables):
+    """Return the results of the lookups of the Dash callbacks."""
+    return [
+        tables.rows("fields", "source_field_repl_id", "f2"),
+        tables.rows("fields", "source_field_repl_id", "Sheet 1"),
+        tables.rows("dependencies", "source_field_repl_id", "f2"),
+        tables.rows("dependencies", "dependency_to", "Sheet 1"),
+    ]
+
+def test_table_cache_reuses_tables(tmp_path):
+    write_tables(tmp_path)
+    cache = TableCache()
+    tables = cache.get(str(tmp_path))
+    assert isinstance(tables, CachedTables)
+    assert cache.get(str(tmp_path)) is tables
+    cache.invalidate(str(tmp_path))
+    assert cache.get(str(tmp_path)) is not tables
+
+def test_table_cache_looks_up_large_tables_on_disk(tmp_path):
+    for database in (True, False):
+        folder = tmp_path / str(database)
+        folder.mkdir()
+        write_tables(folder, database)
+        cached = TableCache().get(str(folder))
+        stored = TableCache(budget=0).get(str(folder))
+        assert isinstance(stored, StoredTables)
+        for a, b in zip(lookups(cached), lookups(stored)):
+            assert list(a.columns) == list(b.columns)
+            assert len(a) == len(b)
+            assert a["source_field_repl_id"].tolist() == \
+                b["source_field_repl_id"].tolist()
+        assert len(stored.table("fields")) == 3
+
+def test_tables_read_used_columns_only(tmp_path):
+    write_tables(tmp_path)
+    for budget in (None, 0):
+        cache = TableCache() if budget is None else TableCache(budget)
+        tables = cache.get(str(tmp_path))
+        for table, columns in TABLE_COLUMNS.items():
+            assert list(tables.table(table).columns) == columns
+        assert list(tables.table("fields", ["field_role"]).columns) == \
+            ["field_role"]
+
+def test_calculations_are_cached_per_file_version(tmp_path):
+    assert TableCache().calculations(str(tmp_path)) == {}
+    path = tmp_path / CALCULATIONS_FILE
+    path.write_text(json.dumps({"n1": "SUM([Sales])"}), encoding="utf-8")
+    cache = TableCache()
+    calcs = cache.calculations(str(tmp_path))
+    assert calcs == {"n1": "SUM([Sales])"}
+    assert cache.calculations(str(tmp_path)) is calcs
+    path.write_text(json.dumps({"n1": "AVG([Sales])"}), encoding="utf-8")
+    os.utime(path, (0, 0))
+    assert cache.calculations(str(tmp_path)) == {"n1": "AVG([Sales])"}
+    assert len(cache._entries) == 1
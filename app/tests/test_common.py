@@ -0,0 +1,68 @@
+"""Tests of the graph helpers in shared.common."""
+from shared.common import limitGraphEdges, transitiveReduction
+
+def reachable(edges):
+    """Return the set of (node, reachable node) pairs of a graph."""
+    children = {}
+    for p, c in edges:
+        children.setdefault(p, set()).add(c)
+    res = set()
+    for start in {n for e in edges for n in e}:
+        todo = list(children.get(start, ()))
+        seen = set()
+        while todo:
+            n = todo.pop()
+            if n not in seen:
+                seen.add(n)
+                todo.extend(children.get(n, ()))
+        res |= {(start, n) for n in seen}
+    return res
+
+def test_transitive_reduction_drops_implied_edges():
+    edges = [("a", "b"), ("b", "c"), ("a", "c"), ("c", "d"), ("a", "d")]
+    assert transitiveReduction(edges) == [("a", "b"), ("b", "c"), ("c", "d")]
+
+def test_transitive_reduction_keeps_order_and_removes_duplicates():
+    edges = [("b", "c"), ("a", "b"), ("b", "c")]
+    assert transitiveReduction(edges) == [("b", "c"), ("a", "b")]
+
+def test_transitive_reduction_cycle_keeps_edges_leaving_cycle():
+    edges = [("w", "p"), ("p", "c"), ("p", "w")]
+    assert transitiveReduction(edges) == edges
+
+def test_transitive_reduction_cycle_preserves_reachability():
+    edges = [("a", "b"), ("b", "c"), ("c", "b"), ("a", "c"), ("c", "d"), 
+        ("a", "d"), ("d", "e"), ("e", "d"), ("b", "e")]
+    res = transitiveReduction(edges)
+    assert reachable(res) == reachable(edges)
+    # implied by a -> b -> c -> d
+    assert ("a", "d") not in res
+    # edges between the same two cycles are kept
+    assert ("c", "d") in res and ("b", "e") in res
+    # edges within the cycles are kept
+    for e in [("b", "c"), ("c", "b"), ("d", "e"), ("e", "d")]:
+        assert e in res
+
+def test_transitive_reduction_self_loop():
+    edges = [("a", "a"), ("a", "b"), ("b", "c"), ("a", "c")]
+    assert transitiveReduction(edges) == [("a", "a"), ("a", "b"), ("b", "c")]
+
+def test_limit_graph_edges_collapsed_hubs_within_hubs():
+    edges = [("r", x) for x in "abcd"] + \
+        [(x, x + str(i)) for x in "abcd" for i in range(4)]
+    res, summaries, notes = limitGraphEdges(edges, "r", hub_fanout=2)
+    nodes = {n for e in res for n in e}
+    assert nodes == {"r", "a", "b", "a0", "a1", "b0", "b1"}
+    # no summaries of hubs that were collapsed themselves
+    assert sorted(summaries) == [("a", "downstream", 2),
+        ("b", "downstream", 2), ("r", "downstream", 10)]
+    assert all(s[0] in nodes for s in summaries)
+    assert notes[0] == "Graph truncated: 7 of 21 nodes shown"
+    assert not any(x.startswith(("c:", "d:")) for x in notes)
+
+def test_limit_graph_edges_hub_neighbour_shown_via_other_path():
+    edges = [("r", x) for x in "abc"] + [("a", "c")]
+    res, summaries, _ = limitGraphEdges(edges, "r", hub_fanout=2)
+    # c is still reached via a, so nothing is omitted behind r
+    assert {n for e in res for n in e} == {"r", "a", "b", "c"}
+    assert summaries == []
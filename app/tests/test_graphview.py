@@ -0,0 +1,31 @@
+"""Tests of the graph view in shared.graphview."""
+from shared.common import pydot, graphSidecar
+from shared.graphview import GraphView
+
+def make_graph():
+    """Return a small graph a -> b -> c, a -> d and its DOT source."""
+    G = pydot.Dot(graph_type="digraph")
+    for n in "abcd":
+        G.add_node(pydot.Node(f'"{n}"', label=n.upper()))
+    for src, dst in [("a", "b"), ("b", "c"), ("a", "d")]:
+        G.add_edge(pydot.Edge(f'"{src}"', f'"{dst}"', tooltip=" "))
+    return G, G.to_string()
+
+def test_graph_view_uses_sidecar_adjacency():
+    G, dot_text = make_graph()
+    view = GraphView(dot_text, graphSidecar(G, '"a"')["adjacency"])
+    assert view._spans is None # no scan of the DOT source for paths
+    assert view.find_path("a", "c") == (["a", "b", "c"], "Downstream")
+    assert view.find_path("c", "a") == (["a", "b", "c"], "Upstream")
+    assert view.find_path("d", "c") == (["c"], None)
+    assert view._spans is None
+
+def test_graph_view_highlight_matches_scanned_view():
+    G, dot_text = make_graph()
+    view = GraphView(dot_text, graphSidecar(G, '"a"')["adjacency"])
+    scanned = GraphView(dot_text)
+    assert scanned.children == view.children
+    path, _ = view.find_path("a", "c")
+    res = view.highlight(path, 5, 3)
+    assert res == scanned.highlight(path, 5, 3)
+    assert res.count("penwidth=5") == 3 and res.count("penwidth=3") == 2
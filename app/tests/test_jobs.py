@@ -0,0 +1,111 @@
+"""Tests of the job scheduler in shared.jobs."""
+import pytest
+from shared.common import progress_data
+from shared.jobs import JobExecutor
+from shared.jobstate import MemoryJobState
+
+def job(job_id, owner, running=False, memory=0):
+    """Return a row of the job table."""
+    return {"job_id": job_id, "owner": owner, "memory": memory,
+        "host": "h", "running": running}
+
+def ids(jobs):
+    return [x["job_id"] for x in jobs]
+
+class FakeProcess:
+    """Job process that is never started (the scheduler is tested only)."""
+    def __init__(self, target, args, daemon):
+        self.started = False
+
+    def start(self):
+        self.started = True
+
+    def is_alive(self):
+        return self.started
+
+    def join(self, timeout=None):
+        pass
+
+class FakeEvent:
+    def set(self):
+        pass
+
+class FakeContext:
+    Process = FakeProcess
+    Event = FakeEvent
+
+@pytest.fixture
+def executor(monkeypatch):
+    """Return a factory of executors on a private in-memory job state."""
+    monkeypatch.setattr(progress_data, "backend", MemoryJobState())
+
+    def make(**kwargs):
+        ex = JobExecutor(**kwargs)
+        ex._ctx = FakeContext()
+        ex._queue = object() # no relay thread
+        return ex
+    return make
+
+def submit(ex, job_id, owner, memory=0):
+    progress_data[job_id] = {}
+    ex.submit(job_id, None, {}, progress_data[job_id], owner=owner,
+        memory=memory)
+
+def running(ex):
+    return sorted(k for k, x in ex._jobs.items()
+        if x["process"] and x["process"].started)
+
+def test_admission_order_round_robin():
+    jobs = [job("A1", "A"), job("A2", "A"), job("A3", "A"), job("B1", "B"),
+        job("C1", "C"), job("C2", "C")]
+    order = JobExecutor._admission_order(jobs, {})
+    assert ids(order) == ["A1", "B1", "C1", "A2", "C2", "A3"]
+
+def test_admission_order_least_recently_served_first():
+    jobs = [job("A1", "A"), job("B1", "B"), job("C1", "C")]
+    order = JobExecutor._admission_order(jobs, {"A": 2, "B": 1})
+    # C was never admitted, A most recently
+    assert ids(order) == ["C1", "B1", "A1"]
+
+def test_admission_order_owners_with_running_job_last():
+    jobs = [job("A1", "A", running=True), job("A2", "A"), job("B1", "B"),
+        job("B2", "B")]
+    order = JobExecutor._admission_order(jobs, {"B": 5})
+    assert ids(order) == ["B1", "A2", "B2"]
+
+def test_one_running_job_per_owner(executor):
+    ex = executor(max_workers=4, memory_budget=10**6)
+    for job_id, owner in [("A1", "A"), ("A2", "A"), ("B1", "B")]:
+        submit(ex, job_id, owner)
+    assert running(ex) == ["A1", "B1"]
+    assert ex.queue_position("A2") == 1
+    assert progress_data["A2"]["queue_position"] == 1
+
+    ex._end("A1", None)
+    assert running(ex) == ["A2", "B1"]
+    assert ex.queue_position("A2") == 0
+
+def test_max_workers(executor):
+    ex = executor(max_workers=2, memory_budget=10**6)
+    for owner in "ABC":
+        submit(ex, owner + "1", owner)
+    assert running(ex) == ["A1", "B1"]
+    ex._end("B1", None)
+    assert running(ex) == ["A1", "C1"]
+
+def test_memory_hold_back(executor):
+    ex = executor(max_workers=4, memory_budget=100)
+    submit(ex, "A1", "A", memory=60)
+    submit(ex, "B1", "B", memory=50)
+    submit(ex, "C1", "C", memory=30)
+    # B1 would exceed the budget and is next in line, so C1 waits too
+    assert running(ex) == ["A1"]
+    assert ex.queue_position("B1") == 1 and ex.queue_position("C1") == 2
+
+    ex._end("A1", None)
+    assert running(ex) == ["B1", "C1"]
+
+def test_single_job_admitted_above_memory_budget(executor):
+    ex = executor(max_workers=4, memory_budget=100)
+    submit(ex, "A1", "A", memory=500)
+    assert running(ex) == ["A1"]
@@ -0,0 +1,15 @@
+"""Tests of the job state backends in shared.jobstate."""
+from shared.jobstate import MemoryJobState, ProgressEntry, SQLiteJobState
+
+def test_progress_entry_writes_after_changes_by_others(tmp_path):
+    for backend in (MemoryJobState(),
+                    SQLiteJobState(str(tmp_path / "jobstate.sqlite"))):
+        entry = ProgressEntry(backend, "u1")
+        entry["queue_position"] = 1
+        # e.g. another process replaces the entry or changes the field
+        backend.set("u1", {"status": "running"})
+        entry["queue_position"] = 1
+        assert backend.get("u1") == {"status": "running", "queue_position": 1}
+        backend.update("u1", {"queue_position": 2})
+        entry["queue_position"] = 1
+        assert entry["queue_position"] == 1
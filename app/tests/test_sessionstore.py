@@ -0,0 +1,30 @@
+"""Tests of the server-side session store in shared.sessionstore."""
+from shared.sessionstore import SessionStore, payload_size
+
+def test_session_store_limits_entries_per_session():
+    store = SessionStore(max_entries=2)
+    handles = [store.put("s1", {"dot": str(i)}) for i in range(3)]
+    other = store.put("s2", {"dot": "x"})
+    assert store.get("s1", handles[0]) is None
+    assert store.get("s1", handles[2]) == {"dot": "2"}
+    assert store.get("s2", other) == {"dot": "x"}
+    assert store.get("s2", handles[2]) is None
+
+def test_session_store_evicts_least_recently_used_across_sessions():
+    data = {"dot": "x" * 1000, "attrs": {"n1": {"label": "Sales"}}}
+    store = SessionStore(budget=3 * payload_size(data))
+    handles = [store.put(f"s{i}", data) for i in range(3)]
+    store.get("s0", handles[0]) # s1 is now the least recently used
+    store.put("s3", data)
+    assert store.get("s1", handles[1]) is None
+    assert store.get("s0", handles[0]) is not None
+    assert len(store._sessions) == 3
+    assert store.nbytes <= store.budget
+
+def test_session_store_clear():
+    store = SessionStore()
+    handle = store.put("s1", {"dot": "x"})
+    store.clear("s1")
+    store.clear("s2")
+    assert store.get("s1", handle) is None
+    assert store.nbytes == 0 and not store._sessions
@@ -0,0 +1,75 @@
+"""Tests of the chunked uploads in shared.uploads."""
+import io
+import time
+import hashlib
+import pytest
+from shared import uploads
+from shared.uploads import complete_upload, create_upload, upload_status, \
+    write_chunk
+
+class BrokenStream:
+    """Request body that fails after some bytes (e.g. a dropped connection)."""
+    def __init__(self, data, fail_after):
+        self._stream = io.BytesIO(data[:fail_after])
+
+    def read(self, n):
+        block = self._stream.read(n)
+        if not block:
+            raise OSError("connection reset")
+        return block
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(uploads, "BLOCK_SIZE", 4)
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 16)
+
+def test_upload_in_chunks(tmp_path, small_blocks):
+    data = bytes(range(40))
+    status = create_upload(str(tmp_path), "u1", "book.twb", len(data))
+    upload_id = status["upload_id"]
+    for offset in range(0, len(data), 16):
+        accepted, status = write_chunk(str(tmp_path), "u1", upload_id,
+            offset, io.BytesIO(data[offset:offset + 16]))
+        assert accepted and status["received"] == min(offset + 16, len(data))
+    res = complete_upload(str(tmp_path), "u1", upload_id)
+    assert res["file_id"] == hashlib.sha256(data).hexdigest()
+    assert not res["duplicate"]
+
+def test_resume_after_interrupted_chunk(tmp_path, small_blocks):
+    data = bytes(range(100, 140))
+    upload_id = create_upload(str(tmp_path), "u1", "book.twb",
+        len(data))["upload_id"]
+    write_chunk(str(tmp_path), "u1", upload_id, 0, io.BytesIO(data[:16]))
+
+    # the second chunk fails after some blocks were written and hashed
+    with pytest.raises(OSError):
+        write_chunk(str(tmp_path), "u1", upload_id, 16,
+            BrokenStream(data[16:32], 10))
+    assert upload_status(str(tmp_path), "u1", upload_id)["received"] == 16
+
+    for offset in (16, 32):
+        accepted, _ = write_chunk(str(tmp_path), "u1", upload_id, offset,
+            io.BytesIO(data[offset:offset + 16]))
+        assert accepted
+    res = complete_upload(str(tmp_path), "u1", upload_id)
+    assert res["file_id"] == hashlib.sha256(data).hexdigest()
+    with open(tmp_path / "content" / res["file_id"], "rb") as f:
+        assert f.read() == data
+
+def test_inactive_uploads_expire(tmp_path, small_blocks, monkeypatch):
+    data = bytes(range(20))
+    old = create_upload(str(tmp_path), "u1", "old.twb", len(data))["upload_id"]
+    write_chunk(str(tmp_path), "u1", old, 0, io.BytesIO(data[:16]))
+    assert old in uploads._hashes and old in uploads._locks
+
+    new = create_upload(str(tmp_path), "u2", "new.twb", len(data))["upload_id"]
+    assert upload_status(str(tmp_path), "u1", old)["received"] == 16
+
+    # a new upload (of any user) removes the uploads without activity
+    monkeypatch.setattr(uploads, "UPLOAD_EXPIRY", 0)
+    time.sleep(0.01)
+    create_upload(str(tmp_path), "u2", "other.twb", len(data))
+    assert upload_status(str(tmp_path), "u1", old) is None
+    assert upload_status(str(tmp_path), "u2", new) is None
+    assert not list((tmp_path / "u1" / "partial").iterdir())
+    assert old not in uploads._hashes and old not in uploads._locks
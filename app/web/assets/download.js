@@ -0,0 +1,87 @@
+/*
+ * download.js
+ *
+ * Downloads the results of the "btn-download" button once the deferred
+ * artifacts (Excel file, PNG images, exported graphs) are built. The
+ * artifacts are built by a job on the server, started with a POST to the
+ * download's /prepare route; the button shows the build progress polled
+ * from /artifact/<session>/progress and fetches the download once the
+ * build has ended.
+ */
+(function () {
+    var POLL_INTERVAL = 500; // ms between progress requests
+    var LABEL = "Download Results";
+    var busy = false;
+
+    function label(text) {
+        window.dash_clientside.set_props("btn-download", {children: text});
+    }
+
+    function sleep(ms) {
+        return new Promise(function (resolve) { setTimeout(resolve, ms); });
+    }
+
+    async function send(method, url) {
+        var response = await fetch(url, {method: method});
+        var data = await response.json().catch(function () { return {}; });
+        if (!response.ok) {
+            throw new Error(data.error || response.statusText);
+        }
+        return data;
+    }
+
+    function percent(progress) {
+        var values = Object.values(progress || {});
+        if (!values.length) {
+            return 0;
+        }
+        return Math.floor(values.reduce(function (a, b) { return a + b; }, 0) /
+            values.length);
+    }
+
+    async function download(href) {
+        if (busy) {
+            return;
+        }
+        busy = true;
+        var url = new URL(href, window.location.href);
+        var session = url.pathname.split("/")[2];
+        var prepare = url.pathname + "/prepare" + url.search;
+        var progress = "/artifact/" + session + "/progress";
+        try {
+            var status = await send("POST", prepare);
+            while (status.status !== "ready") {
+                if (status.status === "failed") {
+                    throw new Error(status.error || "build failed");
+                }
+                if (status.status !== "building") {
+                    // build ended (or cancelled): check what is still missing
+                    status = await send("POST", prepare);
+                    if (status.status === "building" || status.status === "ready") {
+                        continue;
+                    }
+                    throw new Error(status.error || "build " + status.status);
+                }
+                label("Preparing download (" + percent(status.progress) + "%)");
+                await sleep(POLL_INTERVAL);
+                status = await send("GET", progress);
+            }
+            label(LABEL);
+            window.location.href = url.href;
+        } catch (err) {
+            label("Download failed: " + err.message + " (click to retry)");
+        } finally {
+            busy = false;
+        }
+    }
+
+    document.addEventListener("click", function (e) {
+        var button = e.target.closest && e.target.closest("#btn-download");
+        if (!button || !button.getAttribute("href")) {
+            return;
+        }
+        e.preventDefault();
+        e.stopPropagation();
+        download(button.getAttribute("href"));
+    });
+})();
@@ -0,0 +1,52 @@
+/*
+ * progress.js
+ *
+ * Subscribes the Dash app to the progress of the session's job, pushed by
+ * the server as server-sent events (/progress/stream/<session-id>), instead
+ * of polling. Every event is written to the "progress-event" store, which
+ * triggers the update_progress callback, so the callback only runs when
+ * the progress changes. The stream is closed once the job has ended.
+ */
+(function () {
+    var FINAL_STATUSES = ["finished", "cancelled", "exited"];
+    var RESET_DELAY = 3000; // ms before the progress bar is reset after finishing
+    var source = null;
+
+    function publish(data) {
+        window.dash_clientside.set_props("progress-event", {data: data});
+    }
+
+    function close() {
+        if (source) {
+            source.close();
+            source = null;
+        }
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        progress: {
+            subscribe: function (started, userId) {
+                close();
+                if (!started || !userId) {
+                    return null;
+                }
+                var url = "/progress/stream/" + encodeURIComponent(userId);
+                source = new EventSource(url);
+                source.onmessage = function (e) {
+                    var data = JSON.parse(e.data);
+                    publish(data);
+                    if (FINAL_STATUSES.indexOf(data.status) >= 0) {
+                        // avoid the automatic reconnect of EventSource
+                        close();
+                        if (data.status === "finished") {
+                            setTimeout(function () {
+                                publish(Object.assign({reset: true}, data));
+                            }, RESET_DELAY);
+                        }
+                    }
+                };
+                return url;
+            }
+        }
+    });
+})();
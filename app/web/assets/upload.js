@@ -0,0 +1,149 @@
+/*
+ * upload.js
+ *
+ * Uploads a workbook selected in (or dropped on) the "upload-drop" area in
+ * chunks to the /upload routes of the server, instead of passing it through
+ * the Dash callbacks as a base64 string. Failed chunks are retried from the
+ * number of bytes the server has received, and selecting the same file
+ * again resumes an interrupted upload. Once stored, the file ID and name
+ * are written to the "upload-file" store.
+ */
+(function () {
+    var RETRIES = 5; // attempts per chunk
+    var RETRY_DELAY = 1000; // ms, doubled after every failed attempt
+    var session = null;
+    var uploads = {}; // file key -> upload ID of unfinished uploads
+    var busy = false;
+
+    function setProps(id, props) {
+        window.dash_clientside.set_props(id, props);
+    }
+
+    function info(text) {
+        setProps("browse-info", {children: text});
+    }
+
+    function sleep(ms) {
+        return new Promise(function (resolve) { setTimeout(resolve, ms); });
+    }
+
+    // Send a request and return the JSON body (also for 409 = resume status)
+    async function send(method, url, body, type) {
+        var headers = type ? {"Content-Type": type} : {};
+        var response = await fetch(url, {method: method, body: body, headers: headers});
+        var data = await response.json().catch(function () { return {}; });
+        if (!response.ok && response.status !== 409) {
+            var error = new Error(data.error || response.statusText);
+            error.status = response.status;
+            throw error;
+        }
+        return data;
+    }
+
+    // Send a chunk, returning the upload status (retried after failures)
+    async function sendChunk(url, offset, chunk) {
+        var delay = RETRY_DELAY;
+        for (var attempt = 1; ; attempt++) {
+            try {
+                return await send("PUT", url + "?offset=" + offset, chunk,
+                    "application/octet-stream");
+            } catch (err) {
+                if (attempt >= RETRIES || (err.status && err.status < 500)) {
+                    throw err;
+                }
+                await sleep(delay);
+                delay *= 2;
+                try {
+                    // resume from the bytes the server has received
+                    return await send("GET", url);
+                } catch (ignored) {}
+            }
+        }
+    }
+
+    async function upload(file) {
+        if (!session || busy) {
+            return;
+        }
+        busy = true;
+        var base = "/upload/" + encodeURIComponent(session);
+        var key = [file.name, file.size, file.lastModified].join(":");
+        try {
+            var status = null;
+            if (uploads[key]) {
+                status = await send("GET", base + "/" + uploads[key]).catch(
+                    function () { return null; });
+            }
+            if (!status || !status.upload_id) {
+                status = await send("POST", base, JSON.stringify(
+                    {filename: file.name, size: file.size}), "application/json");
+            }
+            uploads[key] = status.upload_id;
+            var url = base + "/" + status.upload_id;
+            while (status.received < file.size) {
+                info("Uploading " + file.name + " (" +
+                    Math.floor(100 * status.received / file.size) + "%)");
+                var chunk = file.slice(status.received,
+                    status.received + status.chunk_size);
+                status = await sendChunk(url, status.received, chunk);
+            }
+            info("Storing " + file.name);
+            var result = await send("POST", url + "/complete");
+            delete uploads[key];
+            setProps("upload-file", {data: result});
+        } catch (err) {
+            info("Upload of " + file.name + " failed: " + err.message +
+                " (select the file again to resume)");
+        } finally {
+            busy = false;
+        }
+    }
+
+    function enabled(target) {
+        var fieldset = target.closest("#upload-zip");
+        return fieldset && !fieldset.disabled;
+    }
+
+    document.addEventListener("click", function (e) {
+        var area = e.target.closest && e.target.closest("#upload-drop");
+        if (!area || !enabled(area)) {
+            return;
+        }
+        e.preventDefault();
+        var input = document.createElement("input");
+        input.type = "file";
+        input.accept = ".twb,.twbx";
+        input.onchange = function () {
+            if (input.files.length) {
+                upload(input.files[0]);
+            }
+        };
+        input.click();
+    });
+
+    document.addEventListener("dragover", function (e) {
+        if (e.target.closest && e.target.closest("#upload-drop")) {
+            e.preventDefault();
+        }
+    });
+
+    document.addEventListener("drop", function (e) {
+        var area = e.target.closest && e.target.closest("#upload-drop");
+        if (!area) {
+            return;
+        }
+        e.preventDefault();
+        if (enabled(area) && e.dataTransfer.files.length) {
+            upload(e.dataTransfer.files[0]);
+        }
+    });
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        upload: {
+            setSession: function (userId) {
+                session = userId;
+                return userId;
+            }
+        }
+    });
+})();
@@ -8,11 +8,13 @@ This application allows users to upload or select sample Tableau workbooks,
 which are then processed in the background. The resulting metadata is
 visualized as interactive dependency graphs, KPI summaries, and detailed
 information panels. The UI is fully reactive and supports multi-user,
-per-session processing through isolated task threads.
+per-session processing through isolated worker processes (see 
+`shared.jobs`).
 
 Key Features:
 
-- Upload local Tableau workbooks or choose from bundled sample workbooks.
+- Upload local Tableau workbooks (in resumable chunks) or choose from bundled
+  sample workbooks.
 - Background processing of TWB/TWBX files with per-session progress tracking.
 - Optional PNG generation in addition to the default SVG output.
 - Interactive dependency graph viewer with node selection, highlighting,
@@ -20,12 +22,13 @@ Key Features:
 - KPI cards summarizing the workbook’s structure (fields, calcs, sheets, LODs).
 - Downloadable output folder containing cleaned DOT graphs, metadata tables,
   and optional PNG exports.
-- Session-aware cancel functionality that cleanly interrupts long-running tasks.
+- Session-aware cancel functionality that terminates long-running tasks.
 
 Configuration:
 
 The application organizes files into dedicated folders:
-- Uploaded files → `static/uploads/<session-id>/`
+- Uploaded files → `static/uploads/<session-id>/<file-id>/` (chunked uploads,
+  stored once per content hash in `static/uploads/content/`, see `shared.uploads`)
 - Processed output → `static/output/<session-id>/`
 - Sample workbooks → `static/sample/`
 
@@ -36,21 +39,33 @@ Usage:
 Run this module to start the Dash development server.
 """
 
-import base64
-import threading
+import json
 import psutil
-from dash import no_update, Dash, html, dcc, Output, Input, State
+from dash import no_update, Dash, html, dcc, Output, Input, State, \
+    ClientsideFunction
 import dash_bootstrap_components as dbc
 from dash.exceptions import PreventUpdate
 from dash import callback_context as ctx
 import dash_interactive_graphviz
+from flask import Response, abort, jsonify, request, send_file, \
+    stream_with_context
 import time
 import re
 from shared.utils import *
 from shared.processing import process_twb
-from shared.common import progress_data, pd, COL_FILL_MAIN_FIELD, COL_FILL_SHEET
-import networkx as nx
-import pydot
+from shared.artifacts import ARTIFACT_KINDS, build_artifacts, download_kinds, \
+    ensure_artifact, pending_artifacts
+from shared.cache import table_cache
+from shared.graphview import get_graph_view
+from shared.sessionstore import session_store
+from shared.jobs import JOB_MEMORY_BASE, job_executor, estimate_job_memory
+from shared.jobstate import SQLiteJobState
+from shared.uploads import create_upload, upload_status, write_chunk, \
+    complete_upload, uploaded_file
+from shared.graphstore import has_graph_store, list_folders, list_graphs, \
+    read_dot_source, read_sidecar
+from shared.common import progress_data, pd, stream_zip, \
+    COL_FILL_MAIN_FIELD, COL_FILL_SHEET
 import uuid
 
 # --- initialize folders ---
@@ -58,9 +73,9 @@ os.makedirs(STATIC_FOLDER, exist_ok=True)
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
-# --- module-level state ---
-_processing_threads = {}
-_stop_events = {}
+# --- job state shared by all web (gunicorn worker) processes ---
+if JOB_STATE_FILE:
+    progress_data.use(SQLiteJobState(JOB_STATE_FILE))
 
 # --- other initializations ---
 sample_files = sorted(SAMPLE_FOLDER.glob("*.twb*"), key=lambda f: f.name.casefold())
@@ -74,6 +89,202 @@ server = app.server
 process = psutil.Process(os.getpid())
 print(f"Memory usage after initializing application: {process.memory_info().rss / 1024**2:.2f} MB")
 
+# ---------- Server routes ----------
+def finished_entry(user_id):
+    """Return the progress entry of a finished session (404 otherwise)."""
+    entry = progress_data.get(user_id)
+    if not entry or entry.get("status") != "finished" \
+        or not entry.get("foldername"):
+        abort(404)
+    return entry
+
+def artifact_status(user_id, kinds=None):
+    """Return the build status of a session's artifacts as JSON data.
+
+    The status is "ready" if the given artifact kinds are built, "building"
+    while a build job of the session is active, and otherwise the result
+    ("finished", "failed" or "cancelled") of the last build job.
+    """
+    entry = progress_data.get(user_id) or {}
+    build = entry.get("artifact_build") or {}
+    status = build.get("status")
+    if kinds is not None and entry.get("foldername") and \
+        not pending_artifacts(entry["foldername"], kinds):
+        status = "ready"
+    return {"status": status, "error": build.get("error"),
+        "progress": entry.get("artifacts", {})}
+
+def prepare_artifacts(user_id, entry, kinds):
+    """Build the missing artifacts of a session in a job process.
+
+    Returns the build status (see `artifact_status`). Artifacts are never
+    built in the web process: the build job is queued like a processing
+    job of the session, and a request during an active build only returns
+    its status.
+    """
+    pending = pending_artifacts(entry["foldername"], kinds)
+    if not pending:
+        return artifact_status(user_id, kinds)
+
+    job_id = f"{user_id}-artifacts"
+    if not job_executor.is_active(job_id):
+        def on_done(msg):
+            progress_data[user_id]["artifact_build"] = {"kinds": pending,
+                "status": "cancelled" if msg == "Cancelled" else
+                "failed" if msg else "finished", "error": msg}
+
+        entry["artifact_build"] = {"kinds": pending, "status": "building",
+            "error": None}
+        try:
+            job_executor.submit(job_id, build_artifacts, dict(
+                out_dir=entry["foldername"],
+                kinds=pending,
+                user_id=user_id,
+            ), entry, on_done, owner=user_id, memory=JOB_MEMORY_BASE)
+        except ValueError: # submitted by a concurrent request
+            pass
+    return artifact_status(user_id, kinds)
+
+def download_exts():
+    """Return the file types of the `types` query parameter (400 if invalid)."""
+    exts = [x for x in request.args.get("types", "").lower().split(",") if x]
+    if any(x not in DOWNLOAD_TYPES for x in exts):
+        abort(400)
+    return exts
+
+@server.route("/download/<user_id>")
+def download_results(user_id):
+    """Stream a zip file of a session's output folder.
+
+    The archive is built on the fly while the response is sent, so no zip
+    file is written to disk. The optional `types` query parameter limits
+    the archive to the given file types, e.g. `?types=svg,dot`. Deferred
+    artifacts (Excel file, PNG images) that are included but not built yet
+    are built by a job first (see `POST /download/<user_id>/prepare`), in
+    which case the build status is returned (202).
+    """
+    entry = finished_entry(user_id)
+    exts = download_exts()
+
+    kinds = download_kinds(exts)
+    if pending_artifacts(entry["foldername"], kinds):
+        return jsonify(prepare_artifacts(user_id, entry, kinds)), 202
+
+    return Response(
+        stream_with_context(stream_zip(entry["foldername"], exts)),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{entry["filename"]}"'},
+    )
+
+@server.route("/download/<user_id>/prepare", methods=["POST"])
+def prepare_download(user_id):
+    """Start building the deferred artifacts of a download (same `types`
+    parameter as the download) and return the build status.
+
+    The download button waits on `/artifact/<user_id>/progress` until the
+    build has ended before fetching the download (see assets/download.js).
+    """
+    entry = finished_entry(user_id)
+    status = prepare_artifacts(user_id, entry, download_kinds(download_exts()))
+    return jsonify(status), 200 if status["status"] == "ready" else 202
+
+@server.route("/artifact/<user_id>/<kind>")
+def download_artifact(user_id, kind):
+    """Download a single artifact.
+
+    Kinds: "xlsx" (Excel file), "zip" (zip file written to disk), "png"
+    (PNG images) and "graphs" (SVG/DOT files exported from the graph 
+    store), the latter two streamed as a zip file. An artifact that is not
+    built yet is built by a job first, in which case the build status is
+    returned (202).
+    """
+    entry = finished_entry(user_id)
+    if kind not in ARTIFACT_KINDS:
+        abort(400)
+
+    if pending_artifacts(entry["foldername"], [kind]):
+        return jsonify(prepare_artifacts(user_id, entry, [kind])), 202
+    path = ensure_artifact(entry["foldername"], kind)
+    if path is None:
+        abort(404)
+    if kind in ("png", "graphs"):
+        exts = ["png"] if kind == "png" else ["svg", "dot"]
+        name = entry["filename"].replace(".zip", f" ({kind.upper()}).zip")
+        return Response(
+            stream_with_context(stream_zip(path, exts)),
+            mimetype="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{name}"'},
+        )
+    return send_file(os.path.abspath(path), as_attachment=True)
+
+@server.route("/artifact/<user_id>/progress")
+def artifact_progress(user_id):
+    """Return the artifact build status of a session: the status of the
+    last build job, its error message and the progress (0-100) per
+    artifact kind."""
+    return jsonify(artifact_status(user_id))
+
+@server.route("/progress/stream/<user_id>")
+def progress_stream(user_id):
+    """Stream the job progress of a session as server-sent events.
+
+    An event is only sent when the progress, task, status or queue position
+    changes (see `ProgressData.events`), and the stream ends once the job
+    has finished, failed or been cancelled.
+    """
+    return Response(
+        stream_with_context(progress_data.events(user_id)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@server.route("/upload/<user_id>", methods=["POST"])
+def upload_create(user_id):
+    """Create a chunked upload from its JSON file name and size.
+
+    The chunks are then sent with `PUT /upload/<user_id>/<upload_id>?offset=N`
+    and the upload is stored with `POST .../complete` (see assets/upload.js).
+    """
+    info = request.get_json(silent=True) or {}
+    try:
+        return jsonify(create_upload(UPLOAD_FOLDER, user_id, 
+            info.get("filename"), info.get("size"))), 201
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+@server.route("/upload/<user_id>/<upload_id>", methods=["GET", "PUT"])
+def upload_chunk(user_id, upload_id):
+    """Return the status of an upload (GET) or append a chunk to it (PUT).
+
+    The request body of a chunk is written to disk as it is received. A
+    chunk whose offset does not match the bytes received so far is refused
+    (409) with the status from which to resume.
+    """
+    try:
+        if request.method == "GET":
+            status = upload_status(UPLOAD_FOLDER, user_id, upload_id)
+            accepted = True
+        else:
+            offset = request.args.get("offset", type=int)
+            accepted, status = write_chunk(UPLOAD_FOLDER, user_id, upload_id, 
+                offset, request.stream)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    if status is None:
+        abort(404)
+    return jsonify(status), 200 if accepted else 409
+
+@server.route("/upload/<user_id>/<upload_id>/complete", methods=["POST"])
+def upload_complete(user_id, upload_id):
+    """Store a fully received upload and return its file ID (content hash)."""
+    try:
+        result = complete_upload(UPLOAD_FOLDER, user_id, upload_id)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    if result is None:
+        abort(409)
+    return jsonify(result)
+
 # ---------- Layout ----------
 app.layout = dbc.Container(
     [
@@ -116,17 +327,20 @@ app.layout = dbc.Container(
                                 children=[
                                     html.Div(
                                         [
-                                            dcc.Upload(
+                                            # chunked upload to the server (see assets/upload.js)
+                                            html.Fieldset(
                                                 id="upload-zip",
-                                                children=html.Div(["Drag & Drop or ", html.A("Browse for Workbook")]),
-                                                accept=".twb,.twbx",
-                                                multiple=False,
-                                                style={
-                                                    "width": "100%", "height": "60px", "lineHeight": "60px",
-                                                    "borderWidth": "1px", "borderStyle": "dashed",
-                                                    "borderRadius": "5px", "textAlign": "center",
-                                                    "marginBottom": "10px",
-                                                },
+                                                children=html.Div(
+                                                    ["Drag & Drop or ", html.A("Browse for Workbook")],
+                                                    id="upload-drop",
+                                                    style={
+                                                        "width": "100%", "height": "60px", "lineHeight": "60px",
+                                                        "borderWidth": "1px", "borderStyle": "dashed",
+                                                        "borderRadius": "5px", "textAlign": "center",
+                                                        "marginBottom": "10px", "cursor": "pointer",
+                                                    },
+                                                ),
+                                                style={"border": "0", "margin": "0", "padding": "0", "minWidth": "0"},
                                             ),
                                             html.Div(
                                                 id="browse-info",
@@ -193,6 +407,18 @@ app.layout = dbc.Container(
                         className="mb-1",
                     ),
 
+                    # time, CPU and peak memory per processing stage
+                    html.Div(
+                        id="stage-metrics",
+                        style={
+                            "padding": "2px 8px",
+                            "fontFamily": "monospace",
+                            "color": "#666",
+                            "fontSize": "0.75rem",
+                        },
+                        className="mb-1",
+                    ),
+
                     dbc.Button(
                         "Download Results",
                         id="btn-download",
@@ -266,13 +492,16 @@ app.layout = dbc.Container(
                     # path to the graphs folder and currently selected file
                     dcc.Store(id="dot-root-store"),
                     dcc.Store(id="df-root-store"),
-                    dcc.Store(id="dot-store"),
-                    dcc.Store(id="attrs-store"),
+                    dcc.Store(id="dot-store"), # handle to server-side graph
                     dcc.Store(id="main-node-store"),
-                    # polling interval
-                    dcc.Interval(id="progress-poller", interval=2000, disabled=True),
+                    # progress events pushed by the server (see assets/progress.js)
+                    dcc.Store(id="progress-event"),
+                    dcc.Store(id="progress-subscription"),
                     # stores for some of the callback outputs
                     dcc.Store(id="file-ready"),
+                    # file ID and name of the uploaded workbook
+                    dcc.Store(id="upload-file"),
+                    dcc.Store(id="upload-session"),
                     dcc.Store(id="processing-started"),
                     # store selected sample file
                     dcc.Store(id="sample-file-store", data={}),
@@ -671,60 +900,58 @@ def assign_session_id(current_id):
         return str(uuid.uuid4())
     raise PreventUpdate
 
+# Pass the session ID to the chunked upload script
+app.clientside_callback(
+    ClientsideFunction(namespace="upload", function_name="setSession"),
+    Output("upload-session", "data"),
+    Input("session-id", "data"),
+)
+
 @app.callback(
     Output("file-ready", "data"),
-    Output("upload-zip", "filename"),
     Output("sample-file-store", "data"),
     Input("file-tabs", "active_tab"),
-    Input("upload-zip", "contents"),
-    State("upload-zip", "filename"),
+    Input("upload-file", "data"),
     Input("sample-file-dropdown", "value"),
     State("sample-file-store", "data"),
-    State("session-id", "data"),
     prevent_initial_call=True
 )
-def handle_file_selection(active_tab, upload_contents, upload_filename, 
-                          sample_path, sample_filename, user_id):
+def handle_file_selection(active_tab, upload_file, sample_path, sample_filename):
     """
     Handle both sample selection and user uploads depending on the active tab.
     No file copying is needed for samples since they are served directly
-    from the static/sample folder.
+    from the static/sample folder, and uploads are already stored on the
+    server by the upload routes (only their file ID is passed around).
     """
     # sample tab: simply register the selected sample file
     if active_tab == "tab-sample":
         if sample_path:
             sample_basename = os.path.basename(sample_path)
-            return True, upload_filename, sample_basename
-        return upload_filename is not None, upload_filename, None
-
-    # upload tab: decode uploaded file if provided
-    if active_tab == "tab-upload" and upload_contents and upload_filename:
-        user_upload_folder = os.path.join(UPLOAD_FOLDER, user_id)
-        os.makedirs(user_upload_folder, exist_ok=True)
-        dest_path = os.path.join(user_upload_folder, upload_filename)
-        if not os.path.exists(dest_path):
-            _, content_string = upload_contents.split(",", 1)
-            with open(dest_path, "wb") as f:
-                f.write(base64.b64decode(content_string))
-        return True, upload_filename, sample_filename
+            return True, sample_basename
+        return upload_file is not None, None
+
+    # upload tab: the uploaded file is ready once its file ID is known
+    if active_tab == "tab-upload" and upload_file:
+        return True, sample_filename
 
     raise PreventUpdate
 
 @app.callback(
     Output("browse-info", "children"),
-    Input("upload-zip", "contents"),
-    State('upload-zip', 'filename')
+    Input("upload-file", "data"),
 )
-def show_info(_, f):
-    """Display selected filename from upload component (if available)"""
-    if f is None:
+def show_info(upload_file):
+    """Display the uploaded filename (if available)"""
+    if upload_file is None:
         return "No file selected"
-    return f"Selected file: {f}"
+    if upload_file.get("duplicate"):
+        return f"Selected file: {upload_file['filename']} (already uploaded)"
+    return f"Selected file: {upload_file['filename']}"
 
 @app.callback(
     Output("processing-started", "data"),
     Input("btn-process", "n_clicks"),
-    State("upload-zip", "filename"),
+    State("upload-file", "data"),
     State("sample-file-store", "data"),
     State("file-ready", "data"),
     State("file-tabs", "active_tab"),
@@ -732,7 +959,7 @@ def show_info(_, f):
     State("session-id", "data"),
     prevent_initial_call=True
 )
-def start_processing(_, upload_filename, sample_filename, 
+def start_processing(_, upload_file, sample_filename, 
                      file_ready, active_tab, include_png, user_id):
     """
     Triggered by the 'Process ZIP' button.
@@ -744,74 +971,84 @@ def start_processing(_, upload_filename, sample_filename,
     
     # get file name based on active tab
     if active_tab == "tab-upload":
-        if not upload_filename:
+        if not upload_file:
+            raise PreventUpdate
+        filename = upload_file["filename"]
+        filepath = uploaded_file(UPLOAD_FOLDER, user_id, 
+            upload_file["file_id"], filename)
+        if filepath is None:
             raise PreventUpdate
-        filename = upload_filename
-        input_folder = os.path.join(UPLOAD_FOLDER, user_id)
     elif active_tab == "tab-sample":
         if not sample_filename:
             raise PreventUpdate
         filename = sample_filename
-        input_folder = str(SAMPLE_FOLDER)
-
-    # calculate file path and relative path used in download links (public URL)
-    filepath = os.path.join(input_folder, filename)
-
-    def worker():
-        msg = process_twb(
-            filepath=filepath, 
-            output_folder=OUTPUT_FOLDER, 
-            is_executable=False,
-            fPNG=include_png,
-            stop_event=_stop_events[user_id],
-            user_id=user_id,
-        )
+        filepath = os.path.join(str(SAMPLE_FOLDER), filename)
 
-        progress_data[user_id]["show_dots"] = False
+    # a session runs one job at a time (the button is disabled while running)
+    if job_executor.is_active(user_id):
+        raise PreventUpdate
+
+    def on_done(msg):
+        # final state written at once (pushed as a single progress event)
+        entry = {"show_dots": False, "progress": 100}
 
         # early exit in case of an error or cancellation
         if msg:
-            progress_data[user_id]["output_file"] = None
+            entry["output_file"] = None
             if msg == "Cancelled":
-                progress_data[user_id]["current_task"] = f"Processing cancelled for {filename}"
-                progress_data[user_id]["status"] = "cancelled"
+                entry["current_task"] = f"Processing cancelled for {filename}"
+                entry["status"] = "cancelled"
             else:
-                progress_data[user_id]["current_task"] = f"Processing failed for {filename}: {msg}"
-                progress_data[user_id]["status"] = "exited"
-            progress_data[user_id]["progress"] = 100
-            return
-
-        progress_data[user_id]["current_task"] = f"Finished processing {filename}"
-        # store timestamp for deactivation of polling
-        progress_data[user_id]["status"] = "finished"
-        progress_data[user_id]["finished_at"] = time.time()
-        progress_data[user_id]["progress"] = 100
-
-    # make sure we have an event for this user
-    if user_id not in _stop_events:
-        _stop_events[user_id] = threading.Event()
-    else:
-        # if user reruns: make sure previous stop is cleared
-        _stop_events[user_id].clear()
-
-    # create and start user-specific worker
-    t = threading.Thread(
-        target=worker,
-        # won't block app when stopped/restarted (silently killed)
-        daemon=True,
-    )
-    t.start()
-    _processing_threads[user_id] = t
+                entry["current_task"] = f"Processing failed for {filename}: {msg}"
+                entry["status"] = "exited"
+        else:
+            entry["current_task"] = f"Finished processing {filename}"
+            # store timestamp for the progress bar reset
+            entry["status"] = "finished"
+            entry["finished_at"] = time.time()
+        progress_data[user_id].update(entry)
+
+    # evict cached tables and graphs of the session's previous results
+    table_cache.invalidate(os.path.join(OUTPUT_FOLDER, user_id))
+    session_store.clear(user_id)
+
+    # progress entry updated by the job process (see prepare_progress_entry)
+    progress_data[user_id] = {"progress": 0, "filename": None, 
+        "current_task": f"Preparing to process {os.path.splitext(filename)[0]}",
+        "show_dots": True, "status": "running"}
+
+    # queue the job for a worker process (never run in the web server process)
+    job_executor.submit(user_id, process_twb, dict(
+        filepath=filepath, 
+        output_folder=OUTPUT_FOLDER, 
+        is_executable=False,
+        fPNG=include_png,
+        user_id=user_id,
+        fZip=WRITE_ZIP_FILE,
+        deferred=DEFERRED_ARTIFACTS,
+        fGraphStore=GRAPH_STORE,
+        fTooltips=INLINE_TOOLTIPS,
+        fTrace=TRACE_JOBS,
+    ), progress_data[user_id], on_done, owner=user_id, 
+        memory=estimate_job_memory(filepath))
 
     print(f"Processing started for user {user_id}")
 
     # no data returned but store write action will trigger update_progress
     return True
 
+# Subscribe to the progress stream of the session when processing starts
+app.clientside_callback(
+    ClientsideFunction(namespace="progress", function_name="subscribe"),
+    Output("progress-subscription", "data"),
+    Input("processing-started", "data"),
+    State("session-id", "data"),
+    prevent_initial_call=True
+)
+
 @app.callback(
     Output("progress", "value"),
     Output("progress", "label"),
-    Output("progress-poller", "disabled"),
     Output("processing-status", "children"),
     Output("btn-process", "disabled"),
     Output("btn-download", "disabled"),
@@ -826,8 +1063,8 @@ def start_processing(_, upload_filename, sample_filename,
     Output("btn-cancel", "style"),
     Output("btn-cancel", "disabled"),
     Output("include-png-checkbox", "disabled"),
-    Input("progress-poller", "n_intervals"), # initially None
-    Input("processing-started", "data"), # will (re)activate the poller
+    Input("progress-event", "data"), # pushed on progress changes
+    Input("processing-started", "data"),
     Input("btn-cancel", "n_clicks"),
     State("file-tabs", "active_tab"),
     State("session-id", "data"),
@@ -838,7 +1075,7 @@ def update_progress(*args):
     active_tab = args[-2]
     user_id = args[-1]
 
-    # Animate dots
+    # Animate dots (advanced by progress events of the same task)
     current_task = progress_data[user_id].get("current_task", "")
     prev_task = progress_data[user_id].get("previous_task", "")
     progress_data[user_id]["dot_count"] = 0 if current_task != prev_task \
@@ -847,15 +1084,19 @@ def update_progress(*args):
     dots = "." * progress_data[user_id]["dot_count"] if progress_data[user_id].get("show_dots") else ""
     current_task += dots
 
+    # Show the queue position while the job waits for admission
+    position = progress_data[user_id].get("queue_position")
+    if position:
+        current_task = f"Waiting in queue (position {position}){dots}"
+
     # Base UI state while processing
     pct = progress_data[user_id].get("progress", 0)
     label = f"{pct}%" if pct >= 5 else ""
     btn_disabled = True
     out_file = progress_data[user_id].get("filename")
     out_folder = progress_data[user_id].get("foldername")
-    output_folder_url = out_folder and os.path.relpath(out_folder, start="web")
-    # Build href only if output file and folder exist
-    href = out_file and output_folder_url and os.path.join(output_folder_url, out_file)
+    # Build href only if output file and folder exist (streamed download)
+    href = out_file and out_folder and f"/download/{user_id}"
     # keep outputs unchanged during processing (None would still trigger callbacks)
     graphs_folder = no_update
     tables_folder = no_update
@@ -863,7 +1104,6 @@ def update_progress(*args):
     finished_at = progress_data[user_id].get("finished_at")
     status = progress_data[user_id].get("status")
     style_cancel = {"visibility": "visible"}
-    poller_disabled = False
     cancel_disabled = False
     upload_tab_disabled = (active_tab == "tab-sample")
     sample_tab_disabled = not upload_tab_disabled
@@ -871,20 +1111,14 @@ def update_progress(*args):
     # Handle cancel button click
     trigger_ids = [t["prop_id"].split(".")[0] for t in ctx.triggered]
     if "btn-cancel" in trigger_ids:
-        t = _processing_threads.get(user_id)
-        ev = _stop_events.get(user_id)
-        if t and t.is_alive():
-            if ev:
-                ev.set()
-            t.join(timeout=3)
-            if t.is_alive():
-                print(f"[{user_id[:8]}] Warning: background thread still running after timeout.")
-                progress_data[user_id]["status"] = "cancelling"
-                progress_data[user_id]["show_dots"] = True
-            else:
-                print(f"[{user_id[:8]}] Thread stopped cleanly after cancel request.")
+        if status == "running":
+            progress_data[user_id]["status"] = "cancelling"
+            progress_data[user_id]["show_dots"] = True
+            # cancel flag reaches the job from any web process; the job 
+            # process is terminated if it does not stop in time
+            job_executor.cancel(user_id)
         else:
-            print(f"[{user_id[:8]}] No active thread to cancel.")
+            print(f"[{user_id[:8]}] No active job to cancel.")
 
         # display a temporary 'cancelling' status
         current_task = "Cancelling..."
@@ -895,14 +1129,10 @@ def update_progress(*args):
         # Early exit → reset immediately
         pct = 0
         label = ""
-        poller_disabled = True
         btn_disabled = False
         upload_tab_disabled = False
         sample_tab_disabled = False
         style_cancel = {"visibility": "hidden"}
-        # Clean up finished or cancelled threads/events
-        _processing_threads.pop(user_id, None)
-        _stop_events.pop(user_id, None)
     elif status == "cancelling":
         # persist cancelling status until worker stops (for slow environments)
         current_task = "Cancelling" + dots
@@ -913,20 +1143,15 @@ def update_progress(*args):
         if time.time() - finished_at >= 3:
             pct = 0
             label = ""
-            poller_disabled = True
             btn_disabled = False
             style["visibility"] = "visible"
             upload_tab_disabled = False
             sample_tab_disabled = False
             graphs_folder = os.path.join(out_folder, "Graphs")
             tables_folder = os.path.join(out_folder, "Fields")
-            # Clean up after successful completion
-            _processing_threads.pop(user_id, None)
-            _stop_events.pop(user_id, None)
     return (
         pct,
         label,
-        poller_disabled,
         current_task,
         btn_disabled,
         btn_disabled,
@@ -943,6 +1168,36 @@ def update_progress(*args):
         btn_disabled,
     )
 
+@app.callback(
+    Output("stage-metrics", "children"),
+    Input("progress-event", "data"),
+    State("session-id", "data"),
+    prevent_initial_call=True
+)
+def show_stage_metrics(event, user_id):
+    """Show the wall time, CPU time and peak memory per processing stage."""
+    entry = progress_data.get(user_id) or {}
+    metrics = entry.get("metrics")
+    if not metrics:
+        return None
+
+    cell = {"padding": "0 6px"}
+    num = {**cell, "textAlign": "right"}
+    rows = [html.Tr([html.Td(x["stage"], style=cell),
+        html.Td(f"{x['wall_time']:.1f}s", style=num),
+        html.Td(f"{x['cpu_time']:.1f}s", style=num),
+        html.Td(f"{x['peak_rss_mb']:.0f} MB", style=num)])
+        for x in metrics["stages"]]
+    # running stage with its elapsed time so far
+    if metrics.get("current_stage"):
+        elapsed = time.time() - metrics["current_stage_started"]
+        rows.append(html.Tr([html.Td(metrics["current_stage"] + "...", style=cell),
+            html.Td(f"{elapsed:.1f}s", style=num), html.Td("", style=num),
+            html.Td("", style=num)]))
+    header = html.Tr([html.Th(x, style=num if x != "Stage" else cell) 
+        for x in ["Stage", "Time", "CPU", "Peak"]])
+    return html.Table([html.Thead(header), html.Tbody(rows)])
+
 # Output data -> Folder dropdown
 @app.callback(
     Output("folder-dropdown", "options"),
@@ -953,7 +1208,8 @@ def update_folder_dropdown(base_dir):
     if not base_dir:
         raise PreventUpdate
 
-    folders = list_subfolders(base_dir)
+    folders = list_folders(base_dir) if has_graph_store(base_dir) \
+        else list_subfolders(base_dir)
 
     # Sort alphabetically, but push "Sheets" and "Parameters" to the end
     folders.sort(key=lambda x: (x in ["Sheets", "Parameters"], x.casefold()))
@@ -975,7 +1231,9 @@ def update_file_dropdown(base_dir, selected_folder):
     if not selected_folder:
         return [], None
 
-    files = list_dot_files(base_dir, selected_folder)
+    files = list_graphs(base_dir, selected_folder) \
+        if has_graph_store(base_dir) \
+        else list_dot_files(base_dir, selected_folder)
     files.sort(key=str.casefold)
 
     options = [{"label": f, "value": f} for f in files]
@@ -983,28 +1241,12 @@ def update_file_dropdown(base_dir, selected_folder):
     # Auto-select first file if available
     return options, files[0] if files else None
 
-# File -> load and parse .dot source
-@app.callback(
-    Output("dot-store", "data"),
-    Output("attrs-store", "data"),
-    Output("main-node-store", "data"),
-    Input("file-dropdown", "value"),
-    Input("layout-dropdown", "value"),
-    State("dot-root-store", "data"),
-    State("folder-dropdown", "value"),
-)
-def load_dot_source(selected_file, layout, base_dir, selected_folder):
-    """Load the selected .dot file, parse its node attributes, and identify the main node as [id, label]."""
-    if not selected_file or not selected_folder:
-        raise PreventUpdate
-
-    path = os.path.join(base_dir, selected_folder, f"{selected_file}.dot")
-    if not os.path.exists(path):
-        raise PreventUpdate
-
-    with open(path, "r", encoding="utf-8") as f:
-        dot_text = f.read()
+def parse_dot_nodes(dot_text):
+    """Parse node attributes from DOT source and detect the main node.
 
+    Fallback for graphs without a sidecar JSON file. The main node is the
+    first node with the fill color of a main field or sheet.
+    """
     # --- robust, line-anchored parse of node attributes ---
     node_pattern = r'^\s*"([^"]+)"\s*\[(.*?)\]\s*;'
     attr_pattern = r'(\w+)=("([^"\\]|\\.)*"|[^,\]]+)'  # value is quoted or runs until comma or ']'
@@ -1037,16 +1279,94 @@ def load_dot_source(selected_file, layout, base_dir, selected_folder):
         if fill in (COL_FILL_MAIN_FIELD, COL_FILL_SHEET) and main_node is None:
             main_node = [node_id, attrs.get("label", node_id), fill]
 
+    return node_attrs, main_node
+
+def read_graph(base_dir, selected_folder, selected_file, layout):
+    """Load a graph with its node attributes (from the sidecar JSON, else parsed from DOT) and main node as [id, label, fill].
+
+    Returns a dict with keys "dot", "attrs", "main_node" and "adjacency" (None without sidecar), or None if the graph does not exist.
+    """
+    if has_graph_store(base_dir):
+        # generate DOT source from the graph store
+        dot_text = read_dot_source(base_dir, selected_folder, selected_file)
+        if dot_text is None:
+            return None
+        sidecar = read_sidecar(base_dir, selected_folder, selected_file)
+    else:
+        path = os.path.join(base_dir, selected_folder, f"{selected_file}.dot")
+        if not os.path.exists(path):
+            return None
+
+        with open(path, "r", encoding="utf-8") as f:
+            dot_text = f.read()
+
+        sidecar = None
+        sidecar_path = os.path.splitext(path)[0] + ".json"
+        if os.path.exists(sidecar_path):
+            with open(sidecar_path, "r", encoding="utf-8") as f:
+                sidecar = json.load(f)
+
+    # ---- precomputed node attributes and main node (if available) ----
+    adjacency = None
+    if sidecar:
+        node_attrs = sidecar["nodes"]
+        main_node = sidecar["main_node"]
+        adjacency = sidecar.get("adjacency")
+    else:
+        node_attrs, main_node = parse_dot_nodes(dot_text)
+
+    # ---- calculations stored once per node ID (instead of tooltips) ----
+    # (parsed once per graphs folder, see TableCache)
+    calculations = table_cache.calculations(base_dir)
+    for node_id, attrs in node_attrs.items():
+        if node_id in calculations:
+            attrs["tooltip"] = calculations[node_id]
+
 	# ---- apply layout direction (TB or LR) ----
-    try:
-        lines = dot_text.splitlines()
-        if len(lines) > 1 and lines[1].strip().startswith("rankdir="):
-            lines[1] = f"rankdir={layout};"
-            dot_text = "\n".join(lines)
-    except Exception:
-        pass
+    # (graph attribute line, possibly preceded by truncation comments)
+    dot_text = re.sub(r"^rankdir=\w+;", f"rankdir={layout};", dot_text,
+                      count=1, flags=re.MULTILINE)
 
-    return dot_text, node_attrs, main_node
+    return {"dot": dot_text, "attrs": node_attrs, "main_node": main_node,
+            "adjacency": adjacency}
+
+# File -> load graph into the server-side session store
+@app.callback(
+    Output("dot-store", "data"),
+    Output("main-node-store", "data"),
+    Input("file-dropdown", "value"),
+    Input("layout-dropdown", "value"),
+    State("dot-root-store", "data"),
+    State("folder-dropdown", "value"),
+    State("session-id", "data"),
+)
+def load_dot_source(selected_file, layout, base_dir, selected_folder, user_id):
+    """Load the selected graph into the server-side session store.
+
+    The browser only receives a small handle to the graph and its main node
+    as [id, label, fill]; the DOT source and node attributes stay on the server.
+    """
+    if not selected_file or not selected_folder:
+        raise PreventUpdate
+
+    graph = read_graph(base_dir, selected_folder, selected_file, layout)
+    if graph is None:
+        raise PreventUpdate
+
+    handle = {"base_dir": base_dir, "folder": selected_folder,
+              "file": selected_file, "layout": layout}
+    handle["id"] = session_store.put(user_id, graph)
+    return handle, graph["main_node"]
+
+def get_graph(user_id, handle):
+    """Return the graph of a handle, reloading it if it is no longer stored."""
+    if not handle:
+        return None
+    graph = session_store.get(user_id, handle["id"])
+    if graph is None:
+        graph = read_graph(handle["base_dir"], handle["folder"],
+                           handle["file"], handle["layout"])
+    return graph
 
 @app.callback(
     Output("network-title", "children"),
@@ -1059,24 +1379,21 @@ def update_main_node(main_node, df_root):
         return "Dependency Graph", None
 
     try:
-        # --- Load data ---
-        df = pd.read_parquet(os.path.join(df_root, "fields.parquet"))
-        df_dep = pd.read_parquet(os.path.join(df_root, "dependencies.parquet"))
-
         # --- Identify main field/sheet ---
         main_id, main_label, _ = main_node
-        row_field = df.loc[df["source_field_repl_id"] == main_id]
+        tables = table_cache.get(df_root)
+        row_field = tables.rows("fields", "source_field_repl_id", main_id)
 
         # Determine category
         if len(row_field) == 1:
             # field or parameter
             rec = row_field.iloc[0]
             cat = rec["field_category"]
-            rows_dep = df_dep.loc[df_dep["source_field_repl_id"] == main_id]
+            rows_dep = tables.rows("dependencies", "source_field_repl_id", main_id)
         elif len(row_field) == 0:
             # sheet
             rec = None
-            rows_dep = df_dep.loc[df_dep["dependency_to"] == main_label]
+            rows_dep = tables.rows("dependencies", "dependency_to", main_label)
             cat = "Sheet"
 
         html_bw, html_fw = None, None
@@ -1140,7 +1457,7 @@ def update_main_node(main_node, df_root):
             metadata_section = html.Div(MESSAGE_NO_DATA)
 
     except Exception as e:
-        print(f"Error processing parquet files in update_main_node: {e}")
+        print(f"Error reading field data in update_main_node: {e}")
         raise PreventUpdate
     
     # ---- assemble info sections ----
@@ -1173,11 +1490,14 @@ def clear_selected_node(*_):
     Input("dot-store", "data"),
     Input("gv", "selected"),
     State("main-node-store", "data"),
-    State("attrs-store", "data"),
     State("df-root-store", "data"),
+    State("session-id", "data"),
 )
-def update_graph_and_info(dot_source, selected, main_node, node_attrs, df_root):
+def update_graph_and_info(handle, selected, main_node, df_root, user_id):
     """Render DOT graph + info: highlight path and show metadata, dependency chain."""
+    graph = get_graph(user_id, handle)
+    dot_source = graph["dot"] if graph else None
+    node_attrs = graph["attrs"] if graph else None
     if not dot_source or not main_node or not ctx.triggered:
         msg_none = html.Div(html.I(MESSAGE_NO_DATA), style={"marginTop": "10px"})
         msg_calc = html.Div(html.I(MESSAGE_NO_DATA), style={"marginTop": "10px"})
@@ -1191,8 +1511,6 @@ def update_graph_and_info(dot_source, selected, main_node, node_attrs, df_root):
         msg_calc = html.Div(html.I("(no calculation path available)"), style={"marginTop": "10px"})
         return dot_source, msg_none, msg_calc
     
-    new_dot = dot_source
-
     # ---- normalize ----
     if isinstance(selected, list) and selected:
         selected = selected[0]
@@ -1201,76 +1519,21 @@ def update_graph_and_info(dot_source, selected, main_node, node_attrs, df_root):
     attrs = node_attrs.get(selected, {})
     label_selected = attrs.get("label", selected)
 
-    # ---- parse DOT + compute path ----
-    path, direction = None, None
-    try:
-        graphs = pydot.graph_from_dot_data(dot_source)
-        if graphs:
-            G = nx.nx_pydot.from_pydot(graphs[0])
-
-            if nx.has_path(G, main_id, selected):
-                path = nx.shortest_path(G, source=main_id, target=selected)
-                direction = "Downstream"
-                direction_label = "Downstream Consumer"
-            elif nx.has_path(G, selected, main_id):
-                path = nx.shortest_path(G, source=selected, target=main_id)
-                direction = "Upstream"
-                direction_label = "Upstream Source"
-            else:
-                path = [selected]
-    except Exception:
-        pass  # ignore layout/path errors
+    # ---- compute path on the cached graph view (sidecar adjacency) ----
+    view = get_graph_view(dot_source, graph.get("adjacency"))
+    path, direction = view.find_path(main_id, selected)
+    direction_label = {"Downstream": "Downstream Consumer", 
+                       "Upstream": "Upstream Source"}.get(direction, "Selected Element")
 
-    # ---- highlight nodes and edges ----
-    if path:
-        # --- highlight nodes ---
-        for node_id in path:
-            node_escaped = re.escape(node_id)
-            node_pat = rf'("{node_escaped}"\s*\[)(.*?)(\]\s*;)'
-
-            def bump_node_attrs(m):
-                before, attrs, after = m.group(1), m.group(2), m.group(3)
-                a = attrs
-                if re.search(r'\bpenwidth\s*=', a):
-                    a = re.sub(r'\bpenwidth\s*=\s*[0-9]+(?:\.[0-9]+)?', 
-                               f'penwidth={SELECTED_NODE_PENWIDTH}', a, count=1)
-                else:
-                    a = a.strip()
-                    if a and not a.endswith(','):
-                        a += ', '
-                    a += f'penwidth={SELECTED_NODE_PENWIDTH}'
-                return before + a + after
-
-            new_dot = re.sub(node_pat, bump_node_attrs, new_dot, count=1, flags=re.DOTALL)
-
-        # --- highlight edges along the path ---
-        for i in range(len(path) - 1):
-            src, tgt = path[i], path[i + 1]
-            edge_pat = rf'("{re.escape(src)}"\s*->\s*"{re.escape(tgt)}"\s*\[)(.*?)(\]\s*;)'
-
-            def bump_edge_attrs(m):
-                before, attrs, after = m.group(1), m.group(2), m.group(3)
-                a = attrs
-                if re.search(r'\bpenwidth\s*=', a):
-                    a = re.sub(r'\bpenwidth\s*=\s*[0-9]+(?:\.[0-9]+)?', 
-                               f'penwidth={SELECTED_EDGE_PENWIDTH}', a, count=1)
-                else:
-                    a = a.strip()
-                    if a and not a.endswith(','):
-                        a += ', '
-                    a += f'penwidth={SELECTED_EDGE_PENWIDTH}'
-                    
-                return before + a + after
-
-            new_dot = re.sub(edge_pat, bump_edge_attrs, new_dot, count=1, flags=re.DOTALL)
-
-    # ---- metadata from fields.parquet ----
+    # ---- highlight nodes and edges along the path (single pass) ----
+    new_dot = view.highlight(path, SELECTED_NODE_PENWIDTH, SELECTED_EDGE_PENWIDTH)
+
+    # ---- metadata from field table ----
     metadata_section = html.Div("Node information not available.")
     try:
-        parquet_path = os.path.join(df_root, "fields.parquet")
-        if os.path.exists(parquet_path):
-            df = pd.read_parquet(parquet_path)
-            row = df.loc[df["source_field_repl_id"] == selected]
+        if os.path.isdir(df_root):
+            row = table_cache.get(df_root).rows("fields", 
+                "source_field_repl_id", selected)
 
             if len(row) == 1:
                 rec = row.iloc[0]
@@ -1301,7 +1564,7 @@ def update_graph_and_info(dot_source, selected, main_node, node_attrs, df_root):
             else:
                 metadata_section = html.Div(f"Multiple records found for node ID: {selected}")
     except Exception as e:
-        metadata_section = html.Div(f"Error reading fields.parquet: {e}")
+        metadata_section = html.Div(f"Error reading field data: {e}")
 
     # ---- dependency & calc path text ----
     path_text = "No direct dependency path found."
@@ -1368,10 +1631,12 @@ def update_kpi(df_root):
         raise PreventUpdate
     
     try:
-        parquet_path_field = os.path.join(df_root, "fields.parquet")
-        parquet_path_sheet = os.path.join(df_root, "dependencies.parquet")
-        df = pd.read_parquet(parquet_path_field)
-        df_dep = pd.read_parquet(parquet_path_sheet)
+        tables = table_cache.get(df_root)
+        df = tables.table("fields", 
+            columns=["field_category", "n_worksheet_dependencies"])
+        df_dep = tables.table("dependencies", 
+            columns=["source_field_repl_id", "dependency_from", 
+                     "dependency_to", "dependency_category"])
 
         # field stats
         fields = (df["field_category"] == "Field").sum()
@@ -10,9 +10,11 @@ queried via a dedicated endpoint.
 Key Features:
 
 The application allows users to upload Tableau workbooks via a web form and 
-processes these workbooks in the background using the `process_twb` function. 
+processes these workbooks in background worker processes using the 
+`process_twb` function. 
 It also includes progress tracking for ongoing processing tasks, enabling 
-users to access progress information through the `/progress` endpoint.
+users to access progress information through the `/progress` endpoint or
+as pushed updates through the `/progress/stream` endpoint.
 
 Configuration:
 
@@ -23,10 +25,14 @@ Usage:
 Run this module to start the Flask development server.
 """
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, \
+    stream_with_context
 from shared.processing import process_twb
 from shared.common import os, progress_data
-import threading
+from shared.jobs import job_executor, estimate_job_memory
+from shared.jobstate import SQLiteJobState
+from shared.utils import JOB_STATE_FILE
+import uuid
 
 app = Flask(__name__)
 
@@ -37,6 +43,10 @@ if not os.path.exists(UPLOAD_FOLDER):
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+# Share the job state (progress) between all web (gunicorn worker) processes
+if JOB_STATE_FILE:
+    progress_data.use(SQLiteJobState(JOB_STATE_FILE))
+
 # Global flag controlling PNG generation
 generate_png = False  # default state
 
@@ -46,7 +56,7 @@ def index():
     Render the index page and handle file uploads.
 
     If a file is uploaded, it is saved to the upload folder, and the 
-    processing function is started in a separate thread to maintain 
+    processing function is started in a worker process to maintain 
     responsiveness of the application.
 
     Returns:
@@ -74,12 +84,9 @@ def index():
             progress_data['progress'] = 0
             progress_data['filename'] = None
 
-            # Start a new thread to run the processing function in the background
+            # Run the processing function in a worker process (see shared.jobs)
             # This allows the Flask app to remain responsive
-            thread = threading.Thread(
-                target=run_processing, args=(filepath, generate_png)
-            )
-            thread.start()
+            run_processing(filepath, generate_png, request.remote_addr)
 
     return render_template("index.html", generate_png=generate_png)
 
@@ -89,35 +96,60 @@ def progress():
     Return the current progress of the file processing.
 
     This function responds with a JSON object containing the current 
-    processing progress and the filename being processed.
+    processing progress, the filename being processed and the position
+    of the job in the queue (0 once running).
 
     Returns:
-        jsonify: A JSON response containing progress and filename.
+        jsonify: A JSON response containing progress, filename and queue 
+        position.
+    """
+    return jsonify(progress=progress_data.get('progress', 0), filename=progress_data.get('filename'),
+                   queue_position=progress_data.get('queue_position'))
+
+@app.route("/progress/stream", methods=["GET"])
+def progress_stream():
     """
-    return jsonify(progress=progress_data['progress'], filename=progress_data['filename'])
+    Stream the processing progress as server-sent events.
 
-def run_processing(filepath, generate_png):
+    An event with the progress, filename and queue position is only sent
+    when one of them changes, and the stream ends once the progress 
+    reaches 100%.
+
+    Returns:
+        Response: An event stream response.
+    """
+    return Response(
+        stream_with_context(progress_data.events(
+            fields=["progress", "filename", "queue_position"])),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def run_processing(filepath, generate_png, owner=None):
     """
     Processes a Tableau workbook file in the background.
 
-    This function calls the `process_twb` function to handle the 
-    processing of the specified Tableau workbook file. The processing 
-    is done using the filepath provided as an argument, with a 
-    predefined upload folder and a flag indicating the executable state.
+    This function submits the `process_twb` function as a job to the 
+    job executor, which runs it in a worker process and relays its 
+    progress to `progress_data`. The processing is done using the 
+    filepath provided as an argument, with a predefined upload folder 
+    and a flag indicating the executable state.
 
     Args:
         filepath (str): The path to the Tableau workbook file to be processed.
         generate_png (bool): Flag indicating whether or not PNG files are generated
+        owner (str, optional): Client submitting the job, used for fair 
+            scheduling across clients. Defaults to None.
 
     Returns:
         None
     """
-    process_twb(
+    job_executor.submit(uuid.uuid4().hex, process_twb, dict(
         filepath=filepath, 
         output_folder=app.config['UPLOAD_FOLDER'], 
         is_executable=False,
         fPNG=generate_png
-    )
+    ), progress_data, owner=owner, memory=estimate_job_memory(filepath))
 
 if __name__ == "__main__":
     # Debug mode for development, 0.0.0.0 to allow external access (Docker)